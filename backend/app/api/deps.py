@@ -1,5 +1,6 @@
 """Dependency injection for FastAPI routes."""
 from typing import Generator
+from fastapi import HTTPException, status
 
 from app.services.chat import ChatService
 from app.services.ingest import IngestService
@@ -7,11 +8,17 @@ from app.db.vector_store import get_vector_store
 from app.core.config import settings
 
 def get_chat_service() -> ChatService:
-    """Provide ChatService instance for dependency injection."""
-    vector_store = get_vector_store()
-    return ChatService(vector_store=vector_store, model_name=settings.LLM_MODEL)
+    """Provide ChatService instance backed by the warm model registry."""
+    try:
+        vector_store = get_vector_store()
+        return ChatService(vector_store=vector_store, model_name=settings.LLM_MODEL)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
 
 def get_ingest_service() -> IngestService:
-    """Provide IngestService instance for dependency injection."""
-    vector_store = get_vector_store()
-    return IngestService(vector_store=vector_store) 
\ No newline at end of file
+    """Provide IngestService instance backed by the warm model registry."""
+    try:
+        vector_store = get_vector_store()
+        return IngestService(vector_store=vector_store)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)) 
\ No newline at end of file
@@ -1,19 +1,28 @@
 """API routes definition for chat and document operations."""
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Header, status
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Iterator, List, Optional, Dict, Any, Tuple
+import json
+import logging
 
-from app.models.schema import ChatRequest, ChatResponse, IngestResponse
+from app.models.schema import ChatRequest, ChatResponse, DeleteDocumentResponse, IngestJobStatus, Message
 from app.services.chat import ChatService
 from app.services.ingest import IngestService
+from app.services.ingest_jobs import ingest_jobs
 from app.api.deps import get_chat_service, get_ingest_service
 from app.core.config import settings
+from app.core.inference import InferenceRejected
+from app.core.registry import registry
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Request/Response models
-class UploadHandbookResponse(IngestResponse):
+class UploadHandbookResponse(IngestJobStatus):
     """Response model for handbook upload."""
-    count: int
+    status_url: str
 
 class ChatRequestModel(ChatRequest):
     """Request model for chat endpoint."""
@@ -34,27 +43,92 @@ async def verify_api_key(x_api_key: str = Header(..., description="API Key")):
         )
     return x_api_key
 
-@router.post("/upload-handbook", response_model=UploadHandbookResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/upload-handbook", response_model=UploadHandbookResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_handbook(
     file: UploadFile = File(...),
+    document_id: Optional[str] = Form(None, description="Document this file is a new version of"),
     api_key: str = Depends(verify_api_key),
     ingest_service: IngestService = Depends(get_ingest_service)
 ):
-    """Upload and process a student handbook PDF."""
+    """
+    Upload a student handbook PDF and queue its ingestion.
+    
+    Returns at once with the job's status; poll `status_url` until the job
+    has succeeded or failed. A new version of an ingested document, given by
+    `document_id` or else found by identical file contents, only has its
+    changed pages embedded; new contents without a `document_id` are a new
+    document.
+    """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only PDF files are supported"
         )
     
-    result = await ingest_service.process_file(file)
+    job = await ingest_service.process_file(file, document_id=document_id)
     
-    return {
-        "status": "ok", 
-        "document_id": result["document_id"],
-        "num_chunks": result["num_chunks"],
-        "count": result["num_chunks"]
-    }
+    return {**job.to_dict(), "status_url": f"/api/ingest-jobs/{job.id}"}
+
+@router.get("/ingest-jobs/{job_id}", response_model=IngestJobStatus)
+async def get_ingest_job(
+    job_id: str,
+    api_key: str = Depends(verify_api_key)
+):
+    """Report the stage, progress and timings of an ingestion job."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ingestion job not found"
+        )
+    
+    return job.to_dict()
+
+@router.delete("/documents/{document_id}", response_model=DeleteDocumentResponse)
+async def delete_document(
+    document_id: str,
+    api_key: str = Depends(verify_api_key),
+    ingest_service: IngestService = Depends(get_ingest_service)
+):
+    """Delete an uploaded document's chunks from the vector store."""
+    # Takes the index write lock and syncs the log, so not on the event loop
+    found, deleted = await run_in_threadpool(ingest_service.delete_document, document_id)
+    if not found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    return {"status": "ok", "document_id": document_id, "deleted_chunks": deleted}
+
+def convert_history(history: Optional[List[Dict[str, str]]]) -> List[Message]:
+    """Convert the raw request history into chat messages, skipping malformed entries."""
+    messages = []
+    if history:
+        for msg in history:
+            if isinstance(msg, dict) and "role" in msg and "content" in msg:
+                messages.append(Message(role=msg["role"], content=msg["content"]))
+    return messages
+
+def format_sse(event: str, data: Any) -> str:
+    """Format a single server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chat_events(events: Iterator[Tuple[str, Any]]) -> Iterator[str]:
+    """Translate ChatService.stream_chat output into server-sent events."""
+    try:
+        for event, payload in events:
+            if event == "token":
+                yield format_sse("token", {"token": payload})
+            elif event == "sources":
+                yield format_sse("sources", {"sources": payload})
+        yield format_sse("done", {})
+    except InferenceRejected as e:
+        # Waited too long for a worker after the stream had started
+        yield format_sse("error", {"detail": str(e), "status_code": e.status_code, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.error(f"Error streaming chat response: {str(e)}")
+        yield format_sse("error", {"detail": "Failed to generate chat response"})
 
 @router.post("/chat", response_model=ChatResponseModel)
 async def chat(
@@ -63,12 +137,7 @@ async def chat(
     chat_service: ChatService = Depends(get_chat_service)
 ):
     """Process a chat message and return a response."""
-    # Convert history format if provided
-    history = []
-    if request.history:
-        for msg in request.history:
-            if isinstance(msg, dict) and "role" in msg and "content" in msg:
-                history.append({"role": msg["role"], "content": msg["content"]})
+    history = convert_history(request.history)
     
     # Call the chat service
     result = await chat_service.query(request.message, history)
@@ -79,7 +148,42 @@ async def chat(
         "sources": result.get("sources", [])
     }
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequestModel,
+    api_key: str = Depends(verify_api_key),
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    Stream a chat response as server-sent events.
+    
+    Emits a `token` event for every decoded chunk while the model generates,
+    a `sources` event with the formatted sources, and a final `done` event.
+    An `error` event replaces the remaining events if generation fails.
+    Refused with 429 before the stream starts when the inference queue is
+    full. A request that then waits too long for a worker is refused with
+    an `error` event carrying `status_code` 503 and `retry_after`, since
+    the stream has already started.
+    """
+    history = convert_history(request.history)
+    
+    # Queues generation now, so a refusal is still a plain HTTP error response
+    events = chat_service.stream_chat(request.message, [(msg.role, msg.content) for msg in history])
+    
+    return StreamingResponse(
+        stream_chat_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/health")
 async def health_check():
-    """Check if the API is running."""
-    return {"status": "healthy"} 
\ No newline at end of file
+    """Check if the API is running and report readiness per component."""
+    components = registry.health()
+    if registry.ready:
+        return {"status": "healthy", "components": components}
+    
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "unavailable", "components": components}
+    ) 
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Bounded in-process caches with LRU eviction, TTL expiry and hit/miss counters."""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result",
+    ["cache", "result"]
+)
+CACHE_EVICTIONS = Counter(
+    "cache_evictions_total",
+    "Entries evicted because the cache was full",
+    ["cache"]
+)
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Number of entries currently held by the cache",
+    ["cache"]
+)
+
+_MISSING = object()
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry."""
+
+    def __init__(self, name: str, max_size: int = 1024, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            name: Cache name used as the Prometheus label
+            max_size: Maximum number of entries before the least recently used is evicted
+            ttl_seconds: Seconds an entry stays valid, or None to never expire
+        """
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None, count_miss: bool = True) -> Any:
+        """
+        Return the cached value for key, or default if missing or expired.
+
+        With count_miss False a miss is not counted, for a pre-check that is
+        followed by a counted lookup of the same key.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+                    return value
+                del self._entries[key]
+                CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+
+            if count_miss:
+                self.misses += 1
+                CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full."""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                CACHE_EVICTIONS.labels(cache=self.name).inc()
+            CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live value without touching counters or recency."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                return default
+            return value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry; hit/miss counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            CACHE_ENTRIES.labels(cache=self.name).set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters useful for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -23,9 +23,70 @@ class Settings(BaseSettings):
     # Default to a small, free Hugging Face model
     LLM_MODEL: str = os.getenv("LLM_MODEL", "google/flan-t5-small")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Documents are embedded in length-sorted batches; with EMBEDDING_WORKERS > 1, sets of at
+    # least EMBEDDING_MIN_PARALLEL_TEXTS documents are split across that many processes
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "1"))
+    EMBEDDING_MIN_PARALLEL_TEXTS: int = int(os.getenv("EMBEDDING_MIN_PARALLEL_TEXTS", "256"))
+    
+    # Seconds to wait for the next token before a streaming response is aborted
+    STREAM_TOKEN_TIMEOUT: float = float(os.getenv("STREAM_TOKEN_TIMEOUT", "60"))
+    
+    # Concurrent chat prompts are generated together: a batch closes at GENERATION_MAX_BATCH_SIZE
+    # prompts or GENERATION_BATCH_WINDOW seconds after its first prompt (1 disables batching)
+    GENERATION_MAX_BATCH_SIZE: int = int(os.getenv("GENERATION_MAX_BATCH_SIZE", "8"))
+    GENERATION_BATCH_WINDOW: float = float(os.getenv("GENERATION_BATCH_WINDOW", "0.05"))
+    # Most tokens generated per answer
+    GENERATION_MAX_NEW_TOKENS: int = int(os.getenv("GENERATION_MAX_NEW_TOKENS", "256"))
+    
+    # Chat generation and query embedding run on INFERENCE_WORKERS threads; with that many
+    # running and INFERENCE_MAX_QUEUE waiting, requests get 429, and a request that waited
+    # over INFERENCE_QUEUE_TIMEOUT seconds gets 503. Workers mostly wait for their batch, so
+    # there are as many as prompts in a batch unless set
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", os.getenv("GENERATION_MAX_BATCH_SIZE", "8")))
+    INFERENCE_MAX_QUEUE: int = int(os.getenv("INFERENCE_MAX_QUEUE", "16"))
+    INFERENCE_QUEUE_TIMEOUT: float = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "30"))
     
     # Vector store settings
     VECTOR_STORE_PATH: str = os.getenv("VECTOR_STORE_PATH", "data/faiss_index")
+    # Memory-map the FAISS index and docstore read-only, so worker processes share one copy
+    VECTOR_STORE_MMAP: bool = os.getenv("VECTOR_STORE_MMAP", "true").lower() in ("1", "true", "yes")
+    # Uploads are appended as segments; above this many segments, or this share of
+    # deleted rows, a background compaction merges them into one
+    VECTOR_STORE_MAX_SEGMENTS: int = int(os.getenv("VECTOR_STORE_MAX_SEGMENTS", "8"))
+    VECTOR_STORE_COMPACT_DELETED_RATIO: float = float(os.getenv("VECTOR_STORE_COMPACT_DELETED_RATIO", "0.2"))
+    # FAISS index type: flat, ivf_flat, hnsw, ivf_pq or sq8. Segments start flat and are
+    # trained into this type once they have enough vectors, usually when compacted.
+    VECTOR_INDEX_TYPE: str = os.getenv("VECTOR_INDEX_TYPE", "flat")
+    VECTOR_INDEX_NLIST: int = int(os.getenv("VECTOR_INDEX_NLIST", "0"))  # 0 picks about 4 * sqrt(vectors)
+    VECTOR_INDEX_NPROBE: int = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+    VECTOR_INDEX_HNSW_M: int = int(os.getenv("VECTOR_INDEX_HNSW_M", "32"))
+    VECTOR_INDEX_EF_CONSTRUCTION: int = int(os.getenv("VECTOR_INDEX_EF_CONSTRUCTION", "40"))
+    VECTOR_INDEX_EF_SEARCH: int = int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64"))
+    VECTOR_INDEX_PQ_M: int = int(os.getenv("VECTOR_INDEX_PQ_M", "0"))  # 0 picks dimension / 8
+    
+    # Ingestion jobs: uploads processed at once, and queued or running before uploads get 429
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "1"))
+    INGEST_MAX_PENDING_JOBS: int = int(os.getenv("INGEST_MAX_PENDING_JOBS", "8"))
+    INGEST_JOB_HISTORY: int = int(os.getenv("INGEST_JOB_HISTORY", "100"))
+    # Larger uploads are refused with 413
+    INGEST_MAX_UPLOAD_BYTES: int = int(os.getenv("INGEST_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+    # Ingestion pipeline: page extraction processes (1 extracts in a thread, one job at a time,
+    # as pdfium is not thread-safe), pages per extraction task, capacity of the page and chunk
+    # queues between stages, and chunks embedded per batch
+    INGEST_PARSE_WORKERS: int = int(os.getenv("INGEST_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    INGEST_PAGES_PER_TASK: int = int(os.getenv("INGEST_PAGES_PER_TASK", "4"))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+    
+    # Query embedding cache settings
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+    EMBEDDING_CACHE_TTL: float = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+    
+    # Answer cache settings
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    ANSWER_CACHE_SIMILARITY: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
     
     # Optional OpenAI settings (not required)
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
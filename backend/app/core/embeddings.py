@@ -0,0 +1,207 @@
+"""Local sentence-transformers embedding engine with length-sorted batches and a process pool."""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+EMBEDDED_TEXTS = Counter(
+    "embedding_texts_total",
+    "Texts embedded for ingestion"
+)
+EMBEDDING_DURATION = Histogram(
+    "embedding_duration_seconds",
+    "Time to embed one set of documents"
+)
+EMBEDDING_THROUGHPUT = Gauge(
+    "embedding_texts_per_second",
+    "Texts per second of the most recent set of documents"
+)
+
+# Model loaded once by each pool worker
+_worker_model = None
+
+def _init_worker(model_name: str, threads: int):
+    """Load the model in a pool worker, with its share of the CPU threads."""
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _encode_in_worker(texts: List[str], normalize: bool) -> np.ndarray:
+    """Embed one batch in a pool worker."""
+    return _worker_model.encode(texts, batch_size=len(texts), normalize_embeddings=normalize,
+                                convert_to_numpy=True, show_progress_bar=False)
+
+class EmbeddingEngine(Embeddings):
+    """
+    Local embedding model shared by ingestion, the vector store and query retrieval.
+
+    Documents are sorted by length and cut into batches of `batch_size`, so
+    each batch pads to texts of about the same length, and the vectors are
+    returned in the input order. With more than one worker, large sets of
+    documents are embedded by a pool of processes that each load the model
+    once and split the CPU cores between them. Queries are always embedded
+    in-process, without the pool's round trip.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, workers: int = 1,
+                 min_parallel_texts: int = 256, normalize: bool = False):
+        """
+        Initialize the engine. The model is loaded on first use.
+
+        Args:
+            model_name: sentence-transformers model name or local path
+            batch_size: Texts per model call
+            workers: Embedding processes for large sets of documents, 1 to embed in-process
+            min_parallel_texts: Smallest number of documents sent to the pool
+            normalize: Scale vectors to unit length
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.min_parallel_texts = min_parallel_texts
+        self.normalize = normalize
+        self._model = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "EmbeddingEngine":
+        """Create an engine from the EMBEDDING_* settings."""
+        return cls(
+            model_name=settings.EMBEDDING_MODEL,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            workers=settings.EMBEDDING_WORKERS,
+            min_parallel_texts=settings.EMBEDDING_MIN_PARALLEL_TEXTS,
+        )
+
+    @property
+    def model(self):
+        """The in-process SentenceTransformer model."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def load(self):
+        """Load the in-process model, and start the worker processes, now instead of on first use."""
+        if self.workers > 1:
+            warm_up = [["warm up"]] * self.workers
+            list(self._get_pool().map(_encode_in_worker, warm_up, repeat(self.normalize)))
+        return self.model
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                # Spawned rather than forked: forking a process with torch's thread pool running can deadlock
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, threads),
+                )
+                logger.info(f"Started {self.workers} embedding workers with {threads} threads each")
+            return self._pool
+
+    def encode(self, texts: List[str], progress: Optional[Callable[[int], None]] = None) -> np.ndarray:
+        """
+        Embed texts in length-sorted batches.
+
+        Args:
+            texts: Texts to embed
+            progress: Called with the number of texts embedded so far after each batch
+
+        Returns:
+            float32 array with one row per text, in input order
+        """
+        return self.encode_with_stats(texts, progress)[0]
+
+    def encode_with_stats(self, texts: List[str],
+                          progress: Optional[Callable[[int], None]] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Embed texts like encode, also returning the run's statistics.
+
+        Returns:
+            (vectors, stats) with texts, batches, workers, seconds and chunks_per_second of this call
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32), {}
+
+        start_time = time.time()
+        # Same preprocessing as LangChain's HuggingFaceEmbeddings, so stored vectors stay comparable
+        texts = [text.replace("\n", " ") for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = [
+            [texts[i] for i in order[first:first + self.batch_size]]
+            for first in range(0, len(order), self.batch_size)
+        ]
+
+        workers = self.workers if self.workers > 1 and len(texts) >= self.min_parallel_texts else 1
+        if workers > 1:
+            batch_results = self._get_pool().map(_encode_in_worker, batches, repeat(self.normalize))
+        else:
+            batch_results = (
+                self.model.encode(batch, batch_size=len(batch), normalize_embeddings=self.normalize,
+                                  convert_to_numpy=True, show_progress_bar=False)
+                for batch in batches
+            )
+
+        results = []
+        done = 0
+        for result in batch_results:
+            results.append(result)
+            done += len(result)
+            if progress is not None:
+                progress(done)
+
+        sorted_vectors = np.concatenate(results).astype(np.float32, copy=False)
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+
+        seconds = time.time() - start_time
+        stats = {
+            "texts": len(texts),
+            "batches": len(batches),
+            "workers": workers,
+            "seconds": seconds,
+            "chunks_per_second": len(texts) / seconds if seconds > 0 else float(len(texts)),
+        }
+        EMBEDDED_TEXTS.inc(len(texts))
+        EMBEDDING_DURATION.observe(seconds)
+        EMBEDDING_THROUGHPUT.set(stats["chunks_per_second"])
+        logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches on {workers} worker(s) "
+                    f"in {seconds:.2f} seconds ({stats['chunks_per_second']:.1f} chunks/s)")
+        return vectors, stats
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents for the vector store."""
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query in-process."""
+        vector = self.model.encode(text.replace("\n", " "), normalize_embeddings=self.normalize,
+                                   convert_to_numpy=True, show_progress_bar=False)
+        return vector.tolist()
+
+    def close(self):
+        """Shut down the worker processes."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
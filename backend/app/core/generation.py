@@ -0,0 +1,195 @@
+"""Dynamic micro-batching of text generation requests for the shared Hugging Face pipeline."""
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+import logging
+import queue
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+GENERATION_BATCH_SIZE = Histogram(
+    "generation_batch_size",
+    "Prompts generated together in one batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+GENERATION_BATCH_WAIT = Histogram(
+    "generation_batch_wait_seconds",
+    "Time prompts waited for their batch to start",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+GENERATION_BATCH_DURATION = Histogram(
+    "generation_batch_duration_seconds",
+    "Time to generate one batch",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+GENERATION_TOKENS = Counter(
+    "generation_tokens_total",
+    "Tokens generated"
+)
+GENERATION_TOKENS_PER_SECOND = Gauge(
+    "generation_tokens_per_second",
+    "Tokens per second of the most recent batch"
+)
+
+class _Request:
+    """A prompt waiting for its batch."""
+
+    __slots__ = ("prompt", "future", "enqueued_at")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+class GenerationBatcher:
+    """
+    Collects concurrent prompts into batches for one pipeline call.
+
+    The first waiting prompt opens a batch, which closes once it holds
+    `max_batch_size` prompts or `window` seconds after that prompt
+    arrived, whichever comes first; prompts that queued up while the
+    previous batch was generating are taken at once. A single scheduler
+    thread runs the batches, so on CPU every core works on one batched
+    forward pass instead of several requests competing for them. Callers
+    block in `generate()` until their own text is ready.
+    """
+
+    def __init__(self, llm, tokenizer=None, max_batch_size: int = 8, window: float = 0.05,
+                 max_new_tokens: int = 256):
+        """
+        Initialize the batcher. The scheduler thread starts on first use.
+
+        Args:
+            llm: Hugging Face text-generation pipeline
+            tokenizer: The pipeline's tokenizer, used to count generated tokens
+            max_batch_size: Most prompts generated together, 1 to generate each on its caller's thread
+            window: Seconds the first prompt of a batch waits for others
+            max_new_tokens: Most tokens generated per prompt. Prompts in a batch are padded to
+                the longest, so a total max_length would shorten the answers to short prompts
+        """
+        self.llm = llm
+        self.tokenizer = tokenizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window)
+        self.max_new_tokens = max_new_tokens
+        self.last_batch: Dict[str, Any] = {}
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @classmethod
+    def from_settings(cls, settings, llm, tokenizer=None) -> "GenerationBatcher":
+        """Create a batcher from the GENERATION_* settings."""
+        return cls(
+            llm,
+            tokenizer=tokenizer,
+            max_batch_size=settings.GENERATION_MAX_BATCH_SIZE,
+            window=settings.GENERATION_BATCH_WINDOW,
+            max_new_tokens=settings.GENERATION_MAX_NEW_TOKENS,
+        )
+
+    def generate(self, prompt: str) -> str:
+        """
+        Generate text for a prompt as part of the next batch.
+
+        Returns:
+            The pipeline's generated_text for the prompt, prompt included
+
+        Raises:
+            RuntimeError: If the batcher is closed
+        """
+        request = _Request(prompt)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Generation batcher is closed")
+            if self.max_batch_size > 1:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._schedule, name="generation-batcher", daemon=True)
+                    self._thread.start()
+                self._queue.put(request)
+        if self.max_batch_size == 1:
+            self._run_batch([request])
+        return request.future.result()
+
+    def _schedule(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = first.enqueued_at + self.window
+            while len(batch) < self.max_batch_size:
+                try:
+                    # Past the deadline, still take whatever is already waiting
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Request]):
+        """Generate a batch and hand every request its result or the error."""
+        start_time = time.monotonic()
+        for request in batch:
+            GENERATION_BATCH_WAIT.observe(start_time - request.enqueued_at)
+
+        prompts = [request.prompt for request in batch]
+        try:
+            outputs = self.llm(prompts, batch_size=len(prompts), max_new_tokens=self.max_new_tokens)
+            texts = [output[0]["generated_text"] for output in outputs]
+        except Exception as e:
+            logger.error(f"Error generating batch of {len(batch)}: {str(e)}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        seconds = time.monotonic() - start_time
+        tokens = sum(self._count_new_tokens(prompt, text) for prompt, text in zip(prompts, texts))
+        self.last_batch = {
+            "size": len(batch),
+            "seconds": seconds,
+            "tokens": tokens,
+            "tokens_per_second": tokens / seconds if seconds > 0 else 0.0,
+            "max_wait_seconds": start_time - batch[0].enqueued_at,
+        }
+        GENERATION_BATCH_SIZE.observe(len(batch))
+        GENERATION_BATCH_DURATION.observe(seconds)
+        GENERATION_TOKENS.inc(tokens)
+        GENERATION_TOKENS_PER_SECOND.set(self.last_batch["tokens_per_second"])
+        logger.info(f"Generated a batch of {len(batch)} in {seconds:.2f} seconds "
+                    f"({self.last_batch['tokens_per_second']:.1f} tokens/s)")
+
+        for request, text in zip(batch, texts):
+            request.future.set_result(text)
+
+    def _count_new_tokens(self, prompt: str, text: str) -> int:
+        generated = text[len(prompt):] if text.startswith(prompt) else text
+        if self.tokenizer is None:
+            return len(generated.split())
+        return len(self.tokenizer.encode(generated, add_special_tokens=False))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the batching limits, waiting prompts and the most recent batch."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window": self.window,
+            "waiting": self._queue.qsize(),
+            "last_batch": dict(self.last_batch),
+        }
+
+    def close(self):
+        """Stop the scheduler thread once the waiting prompts are generated."""
+        with self._lock:
+            self._closed = True
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread = None
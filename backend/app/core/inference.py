@@ -0,0 +1,170 @@
+"""Dedicated executor for model inference, off the event loop, with a bounded wait queue."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import math
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "inference_queue_depth",
+    "Inference tasks waiting for a worker"
+)
+INFERENCE_ACTIVE = Gauge(
+    "inference_active_tasks",
+    "Inference tasks running on a worker"
+)
+INFERENCE_QUEUE_WAIT = Histogram(
+    "inference_queue_wait_seconds",
+    "Time inference tasks waited for a worker",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+INFERENCE_DURATION = Histogram(
+    "inference_duration_seconds",
+    "Time inference tasks ran on a worker",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+INFERENCE_REJECTED = Counter(
+    "inference_rejected_total",
+    "Inference tasks refused because the queue was full or they waited too long",
+    ["reason"]
+)
+
+class InferenceRejected(Exception):
+    """Raised when an inference task is refused; carries the HTTP status and a Retry-After hint."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        """Initialize with the status code and seconds the client should wait before retrying."""
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class InferenceExecutor:
+    """
+    Runs generation and query embedding on a fixed number of worker threads.
+
+    Handlers await `run()` instead of calling the models directly, so the
+    event loop stays free for other requests, health checks and metrics
+    while a model is busy. At most `max_queue` tasks wait for a worker:
+    further tasks are refused at once with 429 instead of piling up, and a
+    task that waited longer than `queue_timeout` is refused with 503 when
+    its turn comes, since its client has most likely given up.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 16, queue_timeout: float = 30.0):
+        """
+        Initialize the executor. Worker threads start on first use.
+
+        Args:
+            workers: Inference tasks run at the same time
+            max_queue: Tasks that may wait for a worker before new ones are refused
+            queue_timeout: Seconds a task may wait for a worker before it is refused
+        """
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queued = 0
+        self._active = 0
+        self._average_seconds = 1.0  # Moving average of task durations, for Retry-After
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "InferenceExecutor":
+        """Create an executor from the INFERENCE_* settings."""
+        return cls(
+            workers=settings.INFERENCE_WORKERS,
+            max_queue=settings.INFERENCE_MAX_QUEUE,
+            queue_timeout=settings.INFERENCE_QUEUE_TIMEOUT,
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained."""
+        backlog = self._queued + self._active
+        return max(1, math.ceil(self._average_seconds * backlog / self.workers))
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Queue `fn(*args, **kwargs)` on a worker thread.
+
+        Returns:
+            Future with the result
+
+        Raises:
+            InferenceRejected: With status 429 if every worker is busy and max_queue tasks are waiting
+        """
+        with self._lock:
+            if self._queued + self._active >= self.workers + self.max_queue:
+                INFERENCE_REJECTED.labels(reason="queue_full").inc()
+                raise InferenceRejected("Too many requests are waiting for the model, try again later",
+                                        status_code=429, retry_after=self.retry_after())
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+            self._queued += 1
+            INFERENCE_QUEUE_DEPTH.set(self._queued)
+            future = self._executor.submit(self._run, time.monotonic(), fn, args, kwargs)
+
+        def cancelled(done: Future):
+            # A task cancelled before it started never reaches _run to leave the queue
+            if done.cancelled():
+                with self._lock:
+                    self._queued -= 1
+                    INFERENCE_QUEUE_DEPTH.set(self._queued)
+
+        future.add_done_callback(cancelled)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` on a worker thread and await its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _run(self, queued_at: float, fn: Callable[..., Any], args, kwargs) -> Any:
+        waited = time.monotonic() - queued_at
+        INFERENCE_QUEUE_WAIT.observe(waited)
+        with self._lock:
+            self._queued -= 1
+            INFERENCE_QUEUE_DEPTH.set(self._queued)
+            if waited > self.queue_timeout:
+                INFERENCE_REJECTED.labels(reason="timeout").inc()
+                raise InferenceRejected(f"Waited {waited:.0f} seconds for the model, try again later",
+                                        status_code=503, retry_after=self.retry_after())
+            self._active += 1
+            INFERENCE_ACTIVE.set(self._active)
+
+        start_time = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds = time.monotonic() - start_time
+            INFERENCE_DURATION.observe(seconds)
+            with self._lock:
+                self._active -= 1
+                INFERENCE_ACTIVE.set(self._active)
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+
+    def stats(self) -> dict:
+        """Return queue depth, running tasks and the average task duration."""
+        return {
+            "workers": self.workers,
+            "queued": self._queued,
+            "active": self._active,
+            "max_queue": self.max_queue,
+            "average_seconds": self._average_seconds,
+        }
+
+    def shutdown(self):
+        """Stop the workers; tasks that have not started are cancelled."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        # Outside the lock: cancelling runs the done callbacks, which take it
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+inference_executor = InferenceExecutor.from_settings(settings)
@@ -0,0 +1,177 @@
+"""Process-wide registry of warm models and the shared vector store."""
+from typing import Any, Dict, Optional
+import gc
+import logging
+import threading
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Holds the embedding model, LLM pipeline and VectorStore for the whole process.
+
+    Components are loaded once by `load()` (called from the FastAPI startup hook)
+    and shared by every ChatService, IngestService and VectorStore instance.
+    Accessing a component before `load()` loads it on demand, so scripts and
+    one-off services keep working outside the web application. A component
+    that failed to load is retried the next time it is accessed.
+    """
+
+    COMPONENTS = ("embedding_model", "llm", "vector_store")
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.RLock()
+        self._embedding_model = None
+        self._tokenizer = None
+        self._llm = None
+        self._generator = None
+        self._vector_store = None
+        self._status: Dict[str, str] = {name: "not_loaded" for name in self.COMPONENTS}
+        self._errors: Dict[str, str] = {}
+
+    def load(self) -> Dict[str, str]:
+        """
+        Load every component that is not already ready.
+
+        Failures are recorded per component instead of raised, so the API can
+        still start and report what is missing through the health endpoint.
+
+        Returns:
+            Dict mapping component name to its status
+        """
+        for name in self.COMPONENTS:
+            try:
+                self._ensure(name)
+            except RuntimeError:
+                # Already logged and recorded in _ensure
+                pass
+        return self.health()
+
+    def close(self):
+        """Release all components so their memory can be reclaimed."""
+        with self._lock:
+            if self._vector_store is not None:
+                self._vector_store.close()
+            self._vector_store = None
+            if self._embedding_model is not None:
+                self._embedding_model.close()
+            if self._generator is not None:
+                self._generator.close()
+            self._generator = None
+            self._llm = None
+            self._tokenizer = None
+            self._embedding_model = None
+            self._status = {name: "closed" for name in self.COMPONENTS}
+            self._errors = {}
+        gc.collect()
+        logger.info("Model registry closed")
+
+    def health(self) -> Dict[str, str]:
+        """Return the readiness of each component."""
+        with self._lock:
+            return {
+                name: f"error: {self._errors[name]}" if name in self._errors else self._status[name]
+                for name in self.COMPONENTS
+            }
+
+    @property
+    def ready(self) -> bool:
+        """True when every component is loaded."""
+        return all(status == "ready" for status in self.health().values())
+
+    @property
+    def embedding_model(self):
+        """Shared local EmbeddingEngine, a LangChain Embeddings implementation."""
+        self._ensure("embedding_model")
+        return self._embedding_model
+
+    @property
+    def tokenizer(self):
+        """Tokenizer belonging to the shared LLM pipeline."""
+        self._ensure("llm")
+        return self._tokenizer
+
+    @property
+    def llm(self):
+        """Shared Hugging Face text-generation pipeline."""
+        self._ensure("llm")
+        return self._llm
+
+    @property
+    def generator(self):
+        """GenerationBatcher that batches concurrent prompts for the shared LLM pipeline."""
+        self._ensure("llm")
+        return self._generator
+
+    @property
+    def vector_store(self):
+        """Shared VectorStore instance."""
+        self._ensure("vector_store")
+        return self._vector_store
+
+    def _ensure(self, name: str):
+        """Load a component if needed, raising RuntimeError if it is unavailable."""
+        if self._status[name] == "ready":
+            return
+
+        with self._lock:
+            if self._status[name] == "ready":
+                return
+            if self._status[name] == "closed":
+                raise RuntimeError(f"Model registry is closed, {name} is unavailable")
+
+            loader = getattr(self, f"_load_{name}")
+            try:
+                logger.info(f"Loading {name}...")
+                loader()
+                self._status[name] = "ready"
+                self._errors.pop(name, None)
+                logger.info(f"Loaded {name}")
+            except Exception as e:
+                self._status[name] = "error"
+                self._errors[name] = str(e)
+                logger.error(f"Error loading {name}: {str(e)}")
+                raise RuntimeError(f"Failed to load {name}: {str(e)}")
+
+    def _load_embedding_model(self):
+        """Load the local sentence-transformers embedding engine."""
+        from app.core.embeddings import EmbeddingEngine
+
+        engine = EmbeddingEngine.from_settings(settings)
+        engine.load()
+        self._embedding_model = engine
+
+    def _load_llm(self):
+        """Load the tokenizer, text-generation pipeline and generation batcher."""
+        from transformers import pipeline, AutoTokenizer
+        from app.core.generation import GenerationBatcher
+
+        self._tokenizer = AutoTokenizer.from_pretrained(settings.LLM_MODEL)
+        self._llm = pipeline(
+            "text-generation",
+            model=settings.LLM_MODEL,
+            tokenizer=self._tokenizer,
+            max_length=1024,
+            temperature=0.3,
+            top_k=50,
+            top_p=0.95,
+            do_sample=True,
+        )
+        # Batched prompts are padded: decoder-only models need a pad token and must pad on the
+        # left, so every prompt ends right where generation starts
+        if self._tokenizer.pad_token is None:
+            self._tokenizer.pad_token = self._tokenizer.eos_token
+        if not self._llm.model.config.is_encoder_decoder:
+            self._tokenizer.padding_side = "left"
+        self._generator = GenerationBatcher.from_settings(settings, self._llm, self._tokenizer)
+
+    def _load_vector_store(self):
+        """Load the FAISS-backed vector store using the shared embedding model."""
+        from app.db.vector_store import VectorStore
+
+        self._vector_store = VectorStore(embedding_model=self.embedding_model)
+
+registry = ModelRegistry()
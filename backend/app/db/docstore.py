@@ -0,0 +1,99 @@
+"""Memory-mapped document store keyed by FAISS row."""
+from typing import Iterable, Tuple
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+from langchain.schema import Document
+
+DOCSTORE_FILE = "docstore.bin"
+
+# File layout: magic, record count n, n + 1 little-endian int64 record offsets
+# (relative to the end of the table), then one UTF-8 JSON record per row
+MAGIC = b"CGDOCS01"
+HEADER = struct.Struct("<8sQ")
+
+
+class MmapDocstore:
+    """
+    Read-only docstore for a FAISS index, backed by one memory-mapped file.
+
+    Records are looked up by FAISS row number through the offset table, so
+    opening the store is constant time and only the records of the returned
+    hits are ever decoded. Every process that opens the same file shares its
+    pages through the OS page cache.
+    """
+
+    def __init__(self, folder_path: str):
+        """
+        Open the docstore in a FAISS index directory.
+
+        Args:
+            folder_path: Directory containing docstore.bin
+        """
+        self.path = os.path.join(folder_path, DOCSTORE_FILE)
+        with open(self.path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a docstore file")
+        self._offsets = np.frombuffer(self._buffer, dtype="<i8", count=count + 1, offset=HEADER.size)
+        self._records_start = HEADER.size + self._offsets.nbytes
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get(self, row: int) -> Tuple[str, Document]:
+        """
+        Decode the record of one FAISS row.
+
+        Args:
+            row: FAISS row number
+
+        Returns:
+            (docstore id, Document) tuple
+        """
+        start = self._records_start + int(self._offsets[row])
+        end = self._records_start + int(self._offsets[row + 1])
+        record = json.loads(self._buffer[start:end])
+        return record["id"], Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    @staticmethod
+    def write(folder_path: str, records: Iterable[Tuple[str, Document]]) -> str:
+        """
+        Write a docstore file for the records of an index, in FAISS row order.
+
+        The file is written under a temporary name and renamed into place, so
+        processes that have the previous file mapped keep reading it safely.
+
+        Args:
+            folder_path: FAISS index directory
+            records: (docstore id, Document) tuples, one per FAISS row
+
+        Returns:
+            Path of the written file
+        """
+        encoded = [
+            json.dumps(
+                {"id": str(doc_id), "page_content": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False,
+                default=str,
+            ).encode("utf-8")
+            for doc_id, doc in records
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+        np.cumsum([len(record) for record in encoded], out=offsets[1:])
+
+        path = os.path.join(folder_path, DOCSTORE_FILE)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(encoded)))
+            f.write(offsets.tobytes())
+            for record in encoded:
+                f.write(record)
+        os.replace(tmp_path, path)
+        return path
+
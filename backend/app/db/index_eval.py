@@ -0,0 +1,119 @@
+"""
+Compare FAISS index types on the vector store's vectors.
+
+Reports, per index type: build time, memory, recall@k against exact flat
+search, and p50/p99 single-query latency. Query vectors are held out from
+the indexed vectors. With --synthetic N, clustered random vectors are used
+instead, to see how the index types scale past the current corpus.
+
+Run from backend/:
+
+    python -m app.db.index_eval [--index-path data/campus_guide] [--types flat,hnsw,...]
+                                [--k 5] [--queries 200] [--nprobe 8] [--ef-search 64] [--synthetic N]
+"""
+import argparse
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.db.index_types import INDEX_TYPES, IndexParams, build_index, index_memory_bytes
+from app.db.segments import SegmentedIndex
+
+
+def load_vectors(index_path: str) -> np.ndarray:
+    """Read the live vectors of every segment of the vector store."""
+    state = SegmentedIndex(index_path, IndexParams()).state
+    if not state.segments:
+        raise SystemExit(f"{index_path} has no vectors; use --synthetic")
+
+    vectors = []
+    for segment in state.segments:
+        mask, _ = state.deleted.get(segment.name, (None, 0))
+        vectors.append(np.asarray(segment.vectors() if mask is None else segment.vectors()[~mask]))
+    return np.concatenate(vectors)
+
+
+def synthetic_vectors(count: int, dimension: int = 384, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Unit-length vectors drawn around random cluster centres, like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=count)] + 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def evaluate(index_type: str, base: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int,
+             params: IndexParams) -> dict:
+    """Build one index type and measure it against the exact neighbours."""
+    params = IndexParams(index_type, params.nlist, params.nprobe, params.hnsw_m,
+                         params.ef_construction, params.ef_search, params.pq_m)
+    start = time.perf_counter()
+    index = build_index(base, params)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    found = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        found += len(set(ids[0]) & set(expected))
+
+    return {
+        "type": index_type,
+        "description": params.factory_string(base.shape[1], len(base)),
+        "build_s": build_seconds,
+        "memory_mb": index_memory_bytes(index) / 2**20,
+        "recall": found / truth.size,
+        "p50_ms": np.percentile(latencies, 50) * 1000,
+        "p99_ms": np.percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare FAISS index types: recall@k, latency and memory")
+    parser.add_argument("--index-path", default="data/campus_guide", help="vector store directory")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="comma-separated index types")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200, help="vectors held out as queries")
+    parser.add_argument("--nprobe", type=int, default=settings.VECTOR_INDEX_NPROBE)
+    parser.add_argument("--ef-search", type=int, default=settings.VECTOR_INDEX_EF_SEARCH)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N clustered random vectors instead")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.synthetic) if args.synthetic else load_vectors(args.index_path)
+    if len(vectors) <= args.queries:
+        print(f"Only {len(vectors)} vectors, need more than --queries {args.queries}")
+        return 1
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(vectors))
+    queries, base = vectors[order[:args.queries]], vectors[order[args.queries:]]
+
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, args.k)
+
+    params = IndexParams.from_settings(settings, index_type="flat")
+    params.nprobe = args.nprobe
+    params.ef_search = args.ef_search
+
+    print(f"{len(base)} vectors of dimension {base.shape[1]}, {len(queries)} queries, k={args.k}, "
+          f"nprobe={args.nprobe}, efSearch={args.ef_search}\n")
+    print(f"{'type':<9} {'index':<16} {'build s':>8} {'memory MB':>10} {f'recall@{args.k}':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for index_type in args.types.split(","):
+        try:
+            row = evaluate(index_type.strip(), base, queries, truth, args.k, params)
+        except Exception as e:
+            print(f"{index_type:<9} skipped: {e}")
+            continue
+        print(f"{row['type']:<9} {row['description']:<16} {row['build_s']:>8.2f} {row['memory_mb']:>10.1f} "
+              f"{row['recall']:>9.3f} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
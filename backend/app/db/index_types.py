@@ -0,0 +1,140 @@
+"""FAISS index types for the vector store and their training and search settings."""
+from typing import Optional
+import math
+import logging
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# flat: exact search over float32 vectors
+# ivf_flat: inverted lists over k-means cells, float32 vectors, nprobe cells searched
+# hnsw: graph search over float32 vectors, efSearch candidates explored
+# ivf_pq: inverted lists with product-quantized codes (pq_m bytes per vector)
+# sq8: exact search over 8-bit scalar-quantized vectors (a quarter of flat's memory)
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq8")
+
+# k-means wants about 39 training points per centroid; a PQ subquantizer has 256
+MIN_POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+
+
+class IndexParams:
+    """Index type and its build and query-time parameters."""
+
+    def __init__(self, index_type: str = "flat", nlist: int = 0, nprobe: int = 8, hnsw_m: int = 32,
+                 ef_construction: int = 40, ef_search: int = 64, pq_m: int = 0):
+        """
+        Initialize index parameters.
+
+        Args:
+            index_type: One of INDEX_TYPES
+            nlist: IVF cells, 0 for about 4 * sqrt(number of vectors)
+            nprobe: IVF cells searched per query
+            hnsw_m: HNSW graph neighbours per node
+            ef_construction: HNSW candidates explored while building
+            ef_search: HNSW candidates explored per query
+            pq_m: PQ sub-vectors (bytes per vector), 0 for dimension / 8
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+
+    @classmethod
+    def from_settings(cls, settings, index_type: Optional[str] = None) -> "IndexParams":
+        """Create parameters from the VECTOR_INDEX_* settings."""
+        return cls(
+            index_type=index_type or settings.VECTOR_INDEX_TYPE,
+            nlist=settings.VECTOR_INDEX_NLIST,
+            nprobe=settings.VECTOR_INDEX_NPROBE,
+            hnsw_m=settings.VECTOR_INDEX_HNSW_M,
+            ef_construction=settings.VECTOR_INDEX_EF_CONSTRUCTION,
+            ef_search=settings.VECTOR_INDEX_EF_SEARCH,
+            pq_m=settings.VECTOR_INDEX_PQ_M,
+        )
+
+    def nlist_for(self, ntotal: int) -> int:
+        """Number of IVF cells for a corpus of ntotal vectors."""
+        nlist = self.nlist or int(4 * math.sqrt(ntotal))
+        return max(1, min(nlist, ntotal // MIN_POINTS_PER_CENTROID))
+
+    def pq_m_for(self, dimension: int) -> int:
+        """Number of PQ sub-vectors, which must divide the dimension."""
+        pq_m = self.pq_m or max(1, dimension // 8)
+        while dimension % pq_m:
+            pq_m -= 1
+        return pq_m
+
+    def min_training_size(self) -> int:
+        """Vectors needed before this index type can be trained."""
+        # With the automatic nlist, 4 * sqrt(n) cells get enough points from n = (4 * 39)^2
+        ivf_size = MIN_POINTS_PER_CENTROID * self.nlist if self.nlist else (4 * MIN_POINTS_PER_CENTROID) ** 2
+        if self.index_type == "ivf_flat":
+            return ivf_size
+        if self.index_type == "ivf_pq":
+            return max(ivf_size, MIN_POINTS_PER_CENTROID * PQ_CENTROIDS)
+        if self.index_type == "sq8":
+            return PQ_CENTROIDS
+        return 1
+
+    def factory_string(self, dimension: int, ntotal: int) -> str:
+        """faiss.index_factory description of the index for ntotal vectors."""
+        if self.index_type == "ivf_flat":
+            return f"IVF{self.nlist_for(ntotal)},Flat"
+        if self.index_type == "hnsw":
+            return f"HNSW{self.hnsw_m}"
+        if self.index_type == "ivf_pq":
+            return f"IVF{self.nlist_for(ntotal)},PQ{self.pq_m_for(dimension)}"
+        if self.index_type == "sq8":
+            return "SQ8"
+        return "Flat"
+
+
+def build_index(vectors: np.ndarray, params: IndexParams):
+    """
+    Train an index of the configured type on the vectors and add them, in order.
+
+    Args:
+        vectors: float32 array of shape (n, dimension)
+        params: Index type and parameters
+
+    Returns:
+        The trained and filled FAISS index, configured for search
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ntotal, dimension = vectors.shape
+    description = params.factory_string(dimension, ntotal)
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+
+    if params.index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = params.ef_construction
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+
+    configure_search(index, params)
+    logger.info(f"Built {description} index with {ntotal} vectors")
+    return index
+
+
+def configure_search(index, params: IndexParams):
+    """Apply the query-time parameters (nprobe, efSearch) to a loaded index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(params.nprobe, ivf.nlist)
+
+    hnsw_index = faiss.downcast_index(index)
+    if isinstance(hnsw_index, faiss.IndexHNSW):
+        hnsw_index.hnsw.efSearch = params.ef_search
+
+
+def index_memory_bytes(index) -> int:
+    """Approximate memory of an index, as the size of its serialized form."""
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,638 @@
+"""Segmented, append-only vector index with a manifest, write-ahead log and tombstones."""
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+from app.db.docstore import MmapDocstore
+from app.db.index_types import IndexParams, build_index, configure_search
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+WAL_FILE = "wal.log"
+LOCK_FILE = "write.lock"
+SEGMENTS_DIR = "segments"
+
+# Fold the write-ahead log into the manifest once it holds this many records
+CHECKPOINT_RECORDS = 64
+
+# Seconds between checks for writes made by other processes
+REFRESH_INTERVAL = 1.0
+
+# Read-only mmap of the index file. IO_FLAG_MMAP_IFC (newer faiss) also maps
+# flat and IVF codes; older faiss only maps on-disk inverted lists and reads
+# flat codes into memory.
+MMAP_READ_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# Default for SegmentedIndex.add's `previous`: set the document record unconditionally
+_UNCHECKED = object()
+
+
+class StaleDocumentError(Exception):
+    """Raised when a document changed since the version a write was computed against was read."""
+
+def chunk_key(metadata: Dict) -> str:
+    """
+    Tombstone key of a chunk: its document_id, or document_id/page_sha256/ingest_job_id
+    for chunks of a fingerprinted page, so single pages can be retired and a
+    page that comes back in a later version is not hidden by the old tombstone.
+    """
+    document_id = str(metadata.get("document_id", ""))
+    page_sha256 = metadata.get("page_sha256")
+    if not page_sha256:
+        return document_id
+    return f"{document_id}/{page_sha256}/{metadata.get('ingest_job_id', '')}"
+
+def key_document_id(key: str) -> str:
+    """The document_id part of a tombstone key."""
+    return key.split("/", 1)[0]
+
+def key_page_sha256(key: str) -> str:
+    """The page fingerprint part of a tombstone key, empty for whole-document keys."""
+    parts = key.split("/")
+    return parts[1] if len(parts) > 1 else ""
+
+class Segment:
+    """
+    One immutable segment: a FAISS index, its docstore, and per row the raw
+    vector and the tombstone key (see chunk_key) of its chunk.
+    """
+
+    def __init__(self, entry: Dict, index, docstore: MmapDocstore, row_documents: np.ndarray, path: str):
+        """Initialize from an opened segment directory."""
+        self.entry = entry
+        self.name = entry["name"]
+        # Stored as document_ids: segments written before page keys hold plain document IDs
+        self.keys: List[str] = entry["document_ids"]
+        self.index = index
+        self.docstore = docstore
+        self.row_documents = row_documents  # Position in keys for every row
+        self.path = path
+
+    @property
+    def count(self) -> int:
+        return self.index.ntotal
+
+    @staticmethod
+    def staging_path(root: str, name: str) -> str:
+        """Directory a segment is written to before it is published under its name."""
+        return f"{os.path.join(root, SEGMENTS_DIR, name)}.tmp-{os.getpid()}"
+
+    @classmethod
+    def publish(cls, root: str, name: str):
+        """Move a staged segment to its final directory."""
+        os.rename(cls.staging_path(root, name), os.path.join(root, SEGMENTS_DIR, name))
+
+    @classmethod
+    def write(cls, root: str, vectors: np.ndarray, documents: Sequence[Document], params: IndexParams,
+              staged: bool = False) -> Dict:
+        """
+        Write a new segment directory and return its manifest entry.
+
+        Segments with enough vectors get the configured index type; smaller
+        ones stay flat until compaction merges them. A `staged` segment is
+        left in its staging directory for the caller to publish.
+        """
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        tmp_path = cls.staging_path(root, name)
+        os.makedirs(tmp_path)
+
+        row_keys = [chunk_key(doc.metadata) for doc in documents]
+        keys = list(dict.fromkeys(row_keys))
+        positions = {key: i for i, key in enumerate(keys)}
+        row_documents = np.array([positions[key] for key in row_keys], dtype=np.int32)
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(vectors) >= params.min_training_size():
+            index = build_index(vectors, params)
+        else:
+            index = faiss.IndexFlatL2(vectors.shape[1])
+            index.add(vectors)
+
+        faiss.write_index(index, os.path.join(tmp_path, "index.faiss"))
+        MmapDocstore.write(tmp_path, ((f"{name}:{row}", doc) for row, doc in enumerate(documents)))
+        np.save(os.path.join(tmp_path, "vectors.npy"), vectors)
+        np.save(os.path.join(tmp_path, "rows.npy"), row_documents)
+        if not staged:
+            cls.publish(root, name)
+
+        return {"name": name, "count": len(vectors), "document_ids": keys}
+
+    @classmethod
+    def open(cls, root: str, entry: Dict, params: IndexParams, mmap: bool = True) -> "Segment":
+        """Open a segment directory, memory-mapping its files if `mmap` is set."""
+        path = os.path.join(root, SEGMENTS_DIR, entry["name"])
+        index = faiss.read_index(os.path.join(path, "index.faiss"), MMAP_READ_FLAGS if mmap else 0)
+        configure_search(index, params)
+        row_documents = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        return cls(entry, index, MmapDocstore(path), row_documents, path)
+
+    def vectors(self) -> np.ndarray:
+        """The segment's raw float32 vectors, memory-mapped."""
+        return np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+
+    def deleted_rows(self, tombstones: FrozenSet[str]) -> Optional[np.ndarray]:
+        """Boolean mask of rows whose key is tombstoned, or None if there are none."""
+        dead = [i for i, key in enumerate(self.keys) if key in tombstones]
+        if not dead:
+            return None
+        return np.isin(self.row_documents, dead)
+
+    def key_rows(self) -> Dict[str, int]:
+        """Number of rows for each tombstone key."""
+        counts = np.bincount(self.row_documents, minlength=len(self.keys))
+        return {key: int(count) for key, count in zip(self.keys, counts)}
+
+
+class IndexState(NamedTuple):
+    """An immutable snapshot of the live segments, read by searches without locking."""
+    segments: Tuple[Segment, ...]
+    tombstones: FrozenSet[str]
+    deleted: Dict[str, Tuple[np.ndarray, int]]  # Segment name -> (deleted row mask, deleted rows)
+    documents: Dict[str, Dict]  # document_id -> source, fingerprint and counts of the ingested version
+
+
+class SegmentedIndex:
+    """
+    Vector index made of immutable segments listed in a manifest.
+
+    Every upload becomes a new segment, and deleting a document, or the
+    superseded pages of a re-uploaded one, adds their keys to a tombstone
+    set, so the cost of a write depends on the new document, not the
+    corpus. Writes are appended to a write-ahead log before they are
+    applied and folded into the manifest every CHECKPOINT_RECORDS records.
+
+    Compaction merges the segments into one, dropping tombstoned rows and
+    training the configured index type. It runs on a background thread once
+    there are more than `max_segments` segments or more than
+    `max_deleted_ratio` of the rows are deleted.
+
+    Searches use an immutable snapshot of the segments and never wait for
+    writes. Other processes' writes are picked up within REFRESH_INTERVAL
+    seconds.
+    """
+
+    def __init__(self, path: str, params: IndexParams, mmap: bool = True, max_segments: int = 8,
+                 max_deleted_ratio: float = 0.2):
+        """
+        Open or create a segmented index.
+
+        Args:
+            path: Index directory
+            params: Index type and parameters used for trained segments
+            mmap: Memory-map segment indexes read-only
+            max_segments: Segment count above which compaction starts
+            max_deleted_ratio: Share of deleted rows above which compaction starts
+        """
+        self.path = path
+        self.params = params
+        self.mmap = mmap
+        self.max_segments = max_segments
+        self.max_deleted_ratio = max_deleted_ratio
+
+        self.seq = 0  # Sequence number of the last applied write
+        self.wal_records = 0
+        self.compactions = 0
+        self.last_compaction_seconds = None
+        self._state = IndexState((), frozenset(), {}, {})
+        self._files_seen = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._compaction_thread = None
+
+        os.makedirs(os.path.join(path, SEGMENTS_DIR), exist_ok=True)
+        with self._locked():
+            self._load()
+            self._remove_unreferenced()
+
+    @property
+    def state(self) -> IndexState:
+        return self._state
+
+    @contextmanager
+    def _locked(self):
+        """Serialize writers within this process and, where supported, across processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.path, LOCK_FILE), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _file_signature(self):
+        signature = []
+        for name in (MANIFEST_FILE, WAL_FILE):
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def refresh(self, force: bool = False):
+        """Reload the manifest and log if another process changed them."""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < REFRESH_INTERVAL:
+            return
+        self._last_refresh = now
+        if self._file_signature() != self._files_seen:
+            with self._locked():
+                self._load()
+
+    def loaded_seq(self) -> Optional[int]:
+        """
+        Sequence number of the loaded state if it is current, else None; never waits.
+
+        Unlike refresh(), this only compares file signatures and never takes
+        the write lock or opens segments, so it is safe on the event loop. It
+        returns None when another process has written since the last load,
+        until the next refresh() catches up.
+        """
+        now = time.monotonic()
+        if now - self._last_refresh >= REFRESH_INTERVAL:
+            if self._file_signature() != self._files_seen:
+                return None
+            self._last_refresh = now
+        return self.seq
+
+    def _load(self):
+        """Read the manifest, replay the log and open the listed segments. Caller holds the lock."""
+        manifest = {"seq": 0, "segments": [], "tombstones": [], "documents": {}}
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        seq = manifest["seq"]
+        entries = list(manifest["segments"])
+        tombstones = set(manifest["tombstones"])
+        documents = dict(manifest.get("documents", {}))
+        wal_records = 0
+
+        wal_path = os.path.join(self.path, WAL_FILE)
+        if os.path.exists(wal_path):
+            with open(wal_path, "rb+") as f:
+                valid_bytes = 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append was never acknowledged;
+                        # cut it off so the next append starts on a fresh line
+                        f.truncate(valid_bytes)
+                        break
+                    valid_bytes += len(line)
+                    if record["seq"] <= seq:
+                        continue
+                    entries, tombstones = self._apply(record, entries, tombstones, documents)
+                    seq = record["seq"]
+                    wal_records += 1
+
+        opened = {segment.name: segment for segment in self._state.segments}
+        segments = tuple(
+            opened.get(entry["name"]) or Segment.open(self.path, entry, self.params, self.mmap)
+            for entry in entries
+        )
+        self.seq = seq
+        self.wal_records = wal_records
+        self._publish(segments, frozenset(tombstones), documents)
+        self._files_seen = self._file_signature()
+
+    @staticmethod
+    def _apply(record: Dict, entries: List[Dict], tombstones: set, documents: Dict[str, Dict]):
+        """Apply one log record to the segment entries and tombstones, and the documents in place."""
+        if record["op"] == "add":
+            if record["segment"] is not None:
+                entries = entries + [record["segment"]]
+            tombstones = tombstones | set(record.get("retire", ()))
+            if record.get("document_id"):
+                documents[record["document_id"]] = record["document"]
+        elif record["op"] == "delete":
+            tombstones = tombstones | set(record.get("keys", [record["document_id"]]))
+            documents.pop(record["document_id"], None)
+        elif record["op"] == "compact":
+            entries = [entry for entry in entries if entry["name"] not in record["replaced"]]
+            if record["segment"] is not None:
+                entries.insert(0, record["segment"])
+            tombstones = set(record["tombstones"])
+        return entries, tombstones
+
+    def _publish(self, segments: Tuple[Segment, ...], tombstones: FrozenSet[str], documents: Dict[str, Dict]):
+        """Swap in a new snapshot for searches."""
+        deleted = {}
+        for segment in segments:
+            mask = segment.deleted_rows(tombstones)
+            if mask is not None:
+                deleted[segment.name] = (mask, int(mask.sum()))
+        self._state = IndexState(segments, tombstones, deleted, documents)
+
+    def _commit(self, record: Dict, segments: Tuple[Segment, ...], tombstones: FrozenSet[str],
+                documents: Dict[str, Dict]):
+        """
+        Log a write, then make its snapshot visible to searches. Caller holds the lock.
+
+        If the log append fails, searches keep the state that is on disk, which
+        is also what other processes see.
+        """
+        self._append(record)
+        self._publish(segments, tombstones, documents)
+        if self.wal_records >= CHECKPOINT_RECORDS or record["op"] == "compact":
+            self._checkpoint()
+        self._files_seen = self._file_signature()
+
+    def _append(self, record: Dict):
+        """Durably append a record to the write-ahead log. Caller holds the lock."""
+        record["seq"] = self.seq + 1
+        with open(os.path.join(self.path, WAL_FILE), "a", encoding="utf-8") as f:
+            size = f.tell()
+            try:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                # Drop a partly written line, which would cut off later records on replay
+                f.truncate(size)
+                raise
+        self.seq += 1
+        self.wal_records += 1
+
+    def _checkpoint(self):
+        """Write the manifest for the current sequence number and empty the log. Caller holds the lock."""
+        state = self._state
+        manifest = {
+            "seq": self.seq,
+            "segments": [segment.entry for segment in state.segments],
+            "tombstones": sorted(state.tombstones),
+            "documents": state.documents,
+        }
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        tmp_path = f"{manifest_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+
+        # Every logged record is now covered by the manifest
+        open(os.path.join(self.path, WAL_FILE), "w").close()
+        self.wal_records = 0
+
+    def _remove_unreferenced(self):
+        """Delete segment directories left behind by crashes or compactions. Caller holds the lock."""
+        live = {segment.name for segment in self._state.segments}
+        segments_path = os.path.join(self.path, SEGMENTS_DIR)
+        for name in os.listdir(segments_path):
+            path = os.path.join(segments_path, name)
+            if ".tmp-" in name:
+                # Possibly another process's segment or compaction in progress; only clear old leftovers
+                if time.time() - os.path.getmtime(path) < 3600:
+                    continue
+            elif name in live:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+
+    def add(self, vectors: np.ndarray, documents: Sequence[Document], retire: Sequence[str] = (),
+            document_id: Optional[str] = None, document: Optional[Dict] = None,
+            previous=_UNCHECKED) -> Optional[str]:
+        """
+        Append the vectors and their documents as a new segment.
+
+        The segment, the retired keys and the document record are applied as
+        one logged write, so searches see either the old or the new version
+        of a document, never a mix. With `previous`, the write is only applied
+        if the document's record is still the one the new version was
+        computed against, checked under the write lock, so two processes
+        updating the same document cannot both retire against the same
+        version.
+
+        Args:
+            vectors: float32 array with one row per document
+            documents: Chunks, with a document_id in their metadata; may be empty
+            retire: Tombstone keys of superseded chunks to delete in the same write
+            document_id: Document whose record to set
+            document: Record of the document's ingested version
+            previous: Record the write expects the document to have, None for a new document
+
+        Returns:
+            Name of the new segment, or None if there were no documents
+
+        Raises:
+            StaleDocumentError: The document's record is no longer `previous`
+        """
+        with self._locked():
+            self._load_if_changed()
+            state = self._state
+            if previous is not _UNCHECKED and state.documents.get(document_id) != previous:
+                raise StaleDocumentError(f"Document {document_id} changed while its new version was prepared")
+            entry = None
+            segments = state.segments
+            if len(documents):
+                entry = Segment.write(self.path, vectors, documents, self.params)
+                segments = segments + (Segment.open(self.path, entry, self.params, self.mmap),)
+            record = {"op": "add", "segment": entry}
+            documents_by_id = state.documents
+            if retire:
+                record["retire"] = sorted(retire)
+            if document_id:
+                record["document_id"] = document_id
+                record["document"] = document
+                documents_by_id = {**documents_by_id, document_id: document}
+            self._commit(record, segments, state.tombstones | frozenset(retire), documents_by_id)
+
+        self._maybe_compact()
+        return entry["name"] if entry else None
+
+    def document_keys(self, document_id: str) -> Dict[str, int]:
+        """Live (not tombstoned) rows of a document, by tombstone key."""
+        self.refresh()
+        return self._live_keys(self._state, document_id)
+
+    @staticmethod
+    def _live_keys(state: IndexState, document_id: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for segment in state.segments:
+            for key, rows in segment.key_rows().items():
+                if key_document_id(key) == document_id and key not in state.tombstones:
+                    counts[key] = counts.get(key, 0) + rows
+        return counts
+
+    def delete(self, document_id: str) -> Tuple[bool, int]:
+        """
+        Tombstone every chunk of a document.
+
+        Returns:
+            (found, rows): whether the document had a record or live chunks, and the
+            number of chunks deleted, which may be 0 for a document without chunks
+        """
+        with self._locked():
+            self._load_if_changed()
+            state = self._state
+            keys = self._live_keys(state, document_id)
+            rows = sum(keys.values())
+            if rows == 0 and document_id not in state.documents:
+                return False, 0
+
+            documents = {key: value for key, value in state.documents.items() if key != document_id}
+            self._commit({"op": "delete", "document_id": document_id, "keys": sorted(keys)},
+                         state.segments, state.tombstones | frozenset(keys), documents)
+
+        self._maybe_compact()
+        return True, rows
+
+    def _load_if_changed(self):
+        """Catch up with other processes' writes before writing. Caller holds the lock."""
+        if self._file_signature() != self._files_seen:
+            self._load()
+
+    def search(self, vector: Sequence[float], top_k: int) -> List[Tuple[str, Document, float]]:
+        """
+        Search every segment and merge the results, skipping tombstoned rows.
+
+        Returns:
+            List of (chunk_id, Document, distance) tuples, closest first
+        """
+        self.refresh()
+        state = self._state
+        query = np.asarray([vector], dtype=np.float32)
+
+        candidates = []
+        for segment in state.segments:
+            mask, deleted = state.deleted.get(segment.name, (None, 0))
+            if deleted == segment.count:
+                continue
+
+            distances, rows = segment.index.search(query, min(segment.count, top_k + deleted))
+            for distance, row in zip(distances[0], rows[0]):
+                if row == -1 or (mask is not None and mask[row]):
+                    continue
+                candidates.append((float(distance), segment, int(row)))
+
+        candidates.sort(key=lambda candidate: candidate[0])
+        results = []
+        for distance, segment, row in candidates[:top_k]:
+            chunk_id, document = segment.docstore.get(row)
+            results.append((chunk_id, document, distance))
+        return results
+
+    def _maybe_compact(self):
+        """Start a background compaction if there are too many segments or deleted rows."""
+        state = self._state
+        rows = sum(segment.count for segment in state.segments)
+        deleted = sum(count for _, count in state.deleted.values())
+        if len(state.segments) <= self.max_segments and (not rows or deleted / rows <= self.max_deleted_ratio):
+            return
+
+        with self._lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self._compact_logged, name="index-compaction",
+                                                       daemon=True)
+            self._compaction_thread.start()
+
+    def _compact_logged(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Error compacting vector index: {str(e)}")
+
+    def compact(self) -> bool:
+        """
+        Merge all segments into one without the tombstoned rows.
+
+        The merged segment is built without holding the write lock, so uploads
+        and deletes continue meanwhile. Segments added during the build are
+        kept as they are. It is written to a staging directory, which
+        startup cleanup leaves alone, and published under the lock together
+        with the compact record.
+
+        Returns:
+            True if the segments were merged
+        """
+        with self._locked():
+            self._load_if_changed()
+            snapshot = self._state
+        if len(snapshot.segments) <= 1 and not snapshot.deleted:
+            return False
+
+        start_time = time.time()
+        vectors, documents = [], []
+        for segment in snapshot.segments:
+            mask, _ = snapshot.deleted.get(segment.name, (None, 0))
+            rows = np.arange(segment.count) if mask is None else np.flatnonzero(~mask)
+            vectors.append(np.asarray(segment.vectors()[rows]))
+            documents.extend(segment.docstore.get(int(row))[1] for row in rows)
+
+        entry = None
+        if documents:
+            entry = Segment.write(self.path, np.concatenate(vectors), documents, self.params, staged=True)
+
+        replaced = [segment.name for segment in snapshot.segments]
+        with self._locked():
+            self._load_if_changed()
+            current = self._state
+            current_names = {segment.name for segment in current.segments}
+            if not set(replaced) <= current_names:
+                # Another process compacted these segments first
+                if entry is not None:
+                    shutil.rmtree(Segment.staging_path(self.path, entry["name"]), ignore_errors=True)
+                return False
+
+            segments = tuple(segment for segment in current.segments if segment.name not in replaced)
+            if entry is not None:
+                Segment.publish(self.path, entry["name"])
+                segments = (Segment.open(self.path, entry, self.params, self.mmap),) + segments
+
+            # Tombstones only matter while some segment still holds the key
+            tombstones = frozenset(
+                key for key in current.tombstones
+                if any(key in segment.keys for segment in segments)
+            )
+            self._commit({"op": "compact", "segment": entry, "replaced": replaced, "tombstones": sorted(tombstones)},
+                         segments, tombstones, current.documents)
+
+            # Open mappings of the old files stay valid after the directories are removed
+            for name in replaced:
+                shutil.rmtree(os.path.join(self.path, SEGMENTS_DIR, name), ignore_errors=True)
+
+        self.compactions += 1
+        self.last_compaction_seconds = time.time() - start_time
+        logger.info(f"Compacted {len(replaced)} segments into {entry['name'] if entry else 'none'} "
+                    f"in {self.last_compaction_seconds:.2f} seconds")
+        return True
+
+    def stats(self) -> Dict:
+        """Return segment, row and compaction counts."""
+        state = self._state
+        rows = sum(segment.count for segment in state.segments)
+        deleted = sum(count for _, count in state.deleted.values())
+        return {
+            "segments": len(state.segments),
+            "rows": rows,
+            "deleted_rows": deleted,
+            "tombstones": len(state.tombstones),
+            "documents": len(state.documents),
+            "seq": self.seq,
+            "wal_records": self.wal_records,
+            "compactions": self.compactions,
+            "last_compaction_seconds": self.last_compaction_seconds,
+            "compacting": self._compaction_thread is not None and self._compaction_thread.is_alive(),
+        }
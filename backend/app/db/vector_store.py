@@ -1,50 +1,112 @@
 """Vector database operations and connection management."""
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import os
 import logging
+import faiss
+import numpy as np
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from langchain.vectorstores import FAISS
 from langchain.schema import Document
-from sentence_transformers import SentenceTransformer
 
 from app.core.config import settings
+from app.core.registry import registry
+from app.db.docstore import DOCSTORE_FILE
+from app.db.index_types import IndexParams
+from app.db.segments import MANIFEST_FILE, WAL_FILE, SegmentedIndex, StaleDocumentError
 
 logger = logging.getLogger(__name__)
 
+# Document earlier versions put in new, empty indexes
+LEGACY_PLACEHOLDER = "This is a placeholder document"
+
 class VectorStore:
     """Wrapper for vector database operations."""
     
-    def __init__(self, index_name: str = "campus_guide"):
-        """Initialize FAISS vector store."""
+    def __init__(self, index_name: str = "campus_guide", embedding_model=None):
+        """
+        Initialize FAISS vector store.
+
+        Args:
+            index_name: Name of the index directory under data/
+            embedding_model: LangChain embeddings to use, defaults to the shared registry model
+        """
+        if embedding_model is None:
+            embedding_model = registry.embedding_model
+
         self.index_name = index_name
-        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        self.embedding_model = embedding_model
         self.index_path = f"data/{index_name}"
+        self.index_params = IndexParams.from_settings(settings)
         self._initialize_faiss()
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever the index contents change, used to invalidate caches."""
+        self.index.refresh()
+        return self.index.seq
+
+    @property
+    def loaded_version(self) -> Optional[int]:
+        """
+        `version` without waiting for a reload, for use on the event loop.
+
+        None if another process changed the index since this one last loaded
+        it; reading `version` off the event loop catches up.
+        """
+        return self.index.loaded_seq()
         
     def _initialize_faiss(self):
-        """Initialize FAISS index or create if it doesn't exist."""
+        """Open the segmented FAISS index, creating it or converting an older single index."""
         try:
             # Ensure data directory exists
             os.makedirs("data", exist_ok=True)
+            legacy = os.path.exists(os.path.join(self.index_path, "index.faiss")) and not any(
+                os.path.exists(os.path.join(self.index_path, name)) for name in (MANIFEST_FILE, WAL_FILE)
+            )
             
-            # Check if index exists
-            if os.path.exists(self.index_path):
-                self.index = FAISS.load_local(self.index_path, self.embedding_model)
-                logger.info(f"Loaded existing FAISS index from {self.index_path}")
-            else:
-                # Create an empty index with a placeholder document
-                # This will be replaced when actual documents are added
-                self.index = FAISS.from_texts(
-                    ["This is a placeholder document"],
-                    self.embedding_model
-                )
-                self.index.save_local(self.index_path)
-                logger.info(f"Created new FAISS index at {self.index_path}")
+            self.index = SegmentedIndex(
+                self.index_path,
+                self.index_params,
+                mmap=settings.VECTOR_STORE_MMAP,
+                max_segments=settings.VECTOR_STORE_MAX_SEGMENTS,
+                max_deleted_ratio=settings.VECTOR_STORE_COMPACT_DELETED_RATIO,
+            )
+            if legacy:
+                self._migrate_legacy_index()
+            logger.info(f"Opened FAISS index at {self.index_path}: {self.index.stats()}")
                 
         except Exception as e:
             logger.error(f"Error initializing FAISS: {str(e)}")
             raise ValueError(f"Failed to initialize FAISS: {str(e)}")
+
+    def _migrate_legacy_index(self):
+        """
+        Turn an index saved by earlier versions (index.faiss and index.pkl) into the first segment.
+
+        The placeholder document earlier versions created is dropped.
+        """
+        legacy = FAISS.load_local(self.index_path, self.embedding_model)
+        ivf = faiss.try_extract_index_ivf(legacy.index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        vectors = legacy.index.reconstruct_n(0, legacy.index.ntotal)
+
+        rows, documents = [], []
+        for row in range(legacy.index.ntotal):
+            document = legacy.docstore.search(legacy.index_to_docstore_id[row])
+            if document.page_content == LEGACY_PLACEHOLDER:
+                continue
+            rows.append(row)
+            documents.append(document)
+
+        if documents:
+            self.index.add(vectors[rows], documents)
+        for name in ("index.faiss", "index.pkl", DOCSTORE_FILE):
+            path = os.path.join(self.index_path, name)
+            if os.path.exists(path):
+                os.remove(path)
+        logger.info(f"Converted {self.index_path} to a segmented index with {len(documents)} chunks")
         
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
     def search(self, query: str, top_k: int = 5, namespace: Optional[str] = None) -> List[Document]:
@@ -61,63 +123,116 @@ class VectorStore:
         """
         try:
             # Create query embedding
-            documents_with_scores = self.index.similarity_search_with_score(
-                query, 
-                k=top_k
-            )
+            embedding = self.embedding_model.embed_query(query)
             
             # Extract just the documents
-            documents = [doc for doc, score in documents_with_scores]
-            
-            return documents
+            return [doc for _, doc, _ in self.search_by_vector(embedding, top_k=top_k)]
             
         except Exception as e:
             logger.error(f"Error searching vector store: {str(e)}")
             raise ValueError(f"Failed to search vector store: {str(e)}")
         
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def upsert_documents(self, documents: List[Document], namespace: Optional[str] = None) -> Dict[str, Any]:
+    def search_by_vector(self, embedding: List[float], top_k: int = 5) -> List[Tuple[str, Document, float]]:
         """
-        Add documents to the vector store.
+        Search with a precomputed query embedding.
         
         Args:
-            documents: List of Document objects to add
-            namespace: Ignored for FAISS (kept for compatibility)
+            embedding: Query embedding from the shared embedding model
+            top_k: Number of results to return
             
         Returns:
-            Dict with operation status
+            List of (chunk_id, Document, distance) tuples, closest first
         """
         try:
-            # Add documents to FAISS index
-            if not documents:
-                return {"status": "success", "count": 0}
-            
-            # Create new index with the documents
-            new_index = FAISS.from_documents(documents, self.embedding_model)
-            
-            # Merge with existing index if it exists
-            if hasattr(self, 'index') and self.index is not None:
-                self.index.merge_from(new_index)
-            else:
-                self.index = new_index
-            
-            # Save the updated index
-            self.index.save_local(self.index_path)
-            
-            return {
-                "status": "success",
-                "count": len(documents),
-                "namespace": namespace or "default"
-            }
+            return self.index.search(embedding, top_k)
             
         except Exception as e:
-            logger.error(f"Error upserting documents: {str(e)}")
-            raise ValueError(f"Failed to upsert documents: {str(e)}")
+            logger.error(f"Error searching vector store by vector: {str(e)}")
+            raise ValueError(f"Failed to search vector store: {str(e)}")
+        
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Record of a document's ingested version, or None if it has none."""
+        self.index.refresh()
+        return self.index.state.documents.get(document_id)
+
+    def find_document(self, content_sha256: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Find the most recently ingested document with exactly the given file contents.
+
+        Returns:
+            (document_id, record) or None if there is none
+        """
+        self.index.refresh()
+        matches = [(document_id, record) for document_id, record in self.index.state.documents.items()
+                   if record.get("content_sha256") == content_sha256]
+        if not matches:
+            return None
+        return max(matches, key=lambda match: match[1].get("updated_at", 0))
+
+    def document_chunks(self, document_id: str) -> Dict[str, int]:
+        """Live chunks of a document, counted by tombstone key (see segments.chunk_key)."""
+        return self.index.document_keys(document_id)
+
+    def update_document(self, document_id: str, record: Dict[str, Any], documents: List[Document],
+                        vectors: np.ndarray, retire: List[str], previous: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Add a document version's new chunks and retire the superseded ones in one write.
+
+        The write is refused if the document's record is no longer `previous`,
+        because another upload or a deletion, possibly in another worker
+        process, changed the document in the meantime.
+
+        Args:
+            document_id: Document being added or updated
+            record: Source, fingerprint and counts of the new version
+            documents: New chunks, possibly none
+            vectors: Their embeddings, one row each
+            retire: Tombstone keys, from document_chunks, of chunks the new version no longer has
+            previous: Record from get_document the changes were computed against, None for a new document
+
+        Returns:
+            Name of the new segment, or None if no chunks were added
+
+        Raises:
+            StaleDocumentError: The document changed since `previous` was read
+        """
+        try:
+            return self.index.add(vectors, documents, retire=retire, document_id=document_id, document=record,
+                                  previous=previous)
+        except StaleDocumentError:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating document: {str(e)}")
+            raise ValueError(f"Failed to update document: {str(e)}")
+
+    def delete_document(self, document_id: str) -> Tuple[bool, int]:
+        """
+        Delete every chunk of an uploaded document.
+
+        The chunks are hidden from searches at once and removed from disk
+        by the next compaction.
+
+        Args:
+            document_id: document_id assigned when the document was ingested
+
+        Returns:
+            (found, deleted): whether the document exists and the number of chunks deleted
+        """
+        try:
+            return self.index.delete(document_id)
+        except Exception as e:
+            logger.error(f"Error deleting document: {str(e)}")
+            raise ValueError(f"Failed to delete document: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return segment, deletion and compaction counts."""
+        return self.index.stats()
     
-    def get_langchain_retriever(self, namespace: Optional[str] = None):
-        """Get a LangChain retriever for the vector store."""
-        return self.index.as_retriever(search_kwargs={"k": 5})
+    def close(self):
+        """Release the FAISS index and unmap its files."""
+        self.index = None
+
 
 def get_vector_store() -> VectorStore:
-    """Factory function to get VectorStore instance."""
-    return VectorStore() 
\ No newline at end of file
+    """Return the process-wide VectorStore held by the model registry."""
+    return registry.vector_store 
\ No newline at end of file
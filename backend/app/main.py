@@ -1,12 +1,16 @@
 """Entrypoint: configures FastAPI, includes routers, and starts Uvicorn server."""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import time
 from prometheus_client import Counter, Histogram
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from app.api.routes import router as api_router
 from app.core.config import settings
+from app.core.inference import InferenceRejected, inference_executor
+from app.core.registry import registry
+from app.services.ingest_jobs import ingest_jobs
 
 # Prometheus metrics
 REQUEST_COUNT = Counter(
@@ -43,22 +47,51 @@ def create_application() -> FastAPI:
     # Include routers
     application.include_router(api_router, prefix="/api")
     
+    @application.exception_handler(InferenceRejected)
+    async def inference_rejected(request, exc: InferenceRejected):
+        """Refuse requests the inference executor has no room for, telling clients when to retry."""
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)}
+        )
+    
     @application.on_event("startup")
     async def startup_db_client():
-        """Initialize database connections on startup."""
-        # Add any startup logic here (e.g., initialize vector store)
-        pass
+        """Load the embedding model, LLM and vector store once for the process."""
+        registry.load()
 
     @application.on_event("shutdown")
     async def shutdown_db_client():
-        """Close database connections on shutdown."""
-        # Add any cleanup logic here
-        pass
+        """Stop ingestion and inference work and release the shared models and vector store."""
+        ingest_jobs.shutdown()
+        inference_executor.shutdown()
+        registry.close()
     
     return application
 
 app = create_application()
 
+# Allowance for the multipart boundaries and headers around an uploaded file
+MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    """Refuse uploads that declare a size over the limit before their body is read."""
+    content_length = request.headers.get("content-length", "")
+    if (
+        request.method == "POST"
+        and request.url.path.endswith("/upload-handbook")
+        and content_length.isdigit()
+        and int(content_length) > settings.INGEST_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD
+    ):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File exceeds the {settings.INGEST_MAX_UPLOAD_BYTES} byte upload limit"}
+        )
+    # Uploads without a declared size are checked while they are saved
+    return await call_next(request)
+
 # Custom middleware for request metrics
 @app.middleware("http")
 async def add_metrics(request, call_next):
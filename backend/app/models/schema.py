@@ -21,4 +21,27 @@ class IngestResponse(BaseModel):
     """Response model for document ingestion."""
     status: str
     document_id: str
-    num_chunks: int 
\ No newline at end of file
+    num_chunks: int = Field(..., description="Chunks of the document after the upload")
+    chunks_added: int = Field(0, description="Chunks of new or changed pages")
+    chunks_unchanged: int = Field(0, description="Chunks kept from the previous version")
+    chunks_removed: int = Field(0, description="Chunks of the previous version's pages that are gone")
+    chunks_per_second: Optional[float] = Field(None, description="Embedding throughput of the upload")
+
+class DeleteDocumentResponse(BaseModel):
+    """Response model for document deletion."""
+    status: str
+    document_id: str
+    deleted_chunks: int
+
+class IngestJobStatus(BaseModel):
+    """Status of a background ingestion job."""
+    job_id: str
+    filename: str
+    sha256: Optional[str] = Field(None, description="SHA-256 of the uploaded file")
+    size_bytes: int = 0
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    stage: str = Field(..., description="queued, processing, indexing or done")
+    progress: Dict[str, int] = Field({}, description="pages_total, pages_parsed, pages_unchanged, chunks_total and chunks_embedded")
+    timings: Dict[str, Any] = Field({}, description="Seconds queued, elapsed and per stage")
+    result: Optional[Dict[str, Any]] = Field(None, description="document_id, sha256, num_chunks, chunks_added, chunks_unchanged, chunks_removed, chunks_per_second and per-stage pipeline throughput once succeeded")
+    error: Optional[str] = None
\ No newline at end of file
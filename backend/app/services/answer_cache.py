@@ -0,0 +1,170 @@
+"""Semantic cache of chat answers in front of retrieval and generation."""
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+import threading
+import numpy as np
+
+from prometheus_client import Counter
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.retrieval import normalize_query
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_LOOKUPS = Counter(
+    "answer_cache_lookups_total",
+    "Answer cache lookups by result",
+    ["result"]
+)
+
+class AnswerCache:
+    """
+    LRU/TTL cache of chat answers with exact and near-duplicate matching.
+
+    Exact hits match on the normalized query text. Near-duplicate hits need the
+    same retrieved chunk IDs and a query embedding whose cosine similarity to a
+    cached query is at least `similarity_threshold`. Every entry belongs to a
+    vector store version; when the version changes the cache is emptied, so
+    answers are never served from a superseded index.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = 3600,
+                 similarity_threshold: float = 0.95):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached answers
+            ttl_seconds: Seconds an answer stays valid, or None to never expire
+            similarity_threshold: Minimum cosine similarity for a near-duplicate hit
+        """
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._entries = LRUCache(name="answer", max_size=max_size, ttl_seconds=ttl_seconds)
+        self._by_chunks: Dict[Tuple[str, ...], Set[str]] = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_exact(self, query: str, version: int, count_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached answer for the same normalized query, if any.
+
+        Args:
+            query: The user's question
+            version: Vector store version the caller works with
+            count_miss: False for a pre-check whose miss is followed by a counted lookup
+        """
+        if not self._check_version(version):
+            return None
+        entry = self._entries.get(normalize_query(query), count_miss=count_miss)
+        if entry is None:
+            return None
+
+        with self._lock:
+            self.exact_hits += 1
+        ANSWER_CACHE_LOOKUPS.labels(result="exact_hit").inc()
+        return entry["answer"]
+
+    def get_similar(self, query_embedding: List[float], chunk_ids: List[str],
+                    version: int) -> Optional[Dict[str, Any]]:
+        """Return a cached answer for a near-duplicate query with the same retrieved chunks."""
+        if not self._check_version(version):
+            return None
+        embedding = self._normalize(query_embedding)
+
+        with self._lock:
+            keys = list(self._by_chunks.get(tuple(chunk_ids), ()))
+
+        best_answer, best_similarity = None, self.similarity_threshold
+        for key in keys:
+            entry = self._entries.peek(key)
+            if entry is None or entry["chunk_ids"] != tuple(chunk_ids):
+                # Evicted, expired or re-cached with other chunks, drop the stale reference
+                self._forget(key, tuple(chunk_ids))
+                continue
+            similarity = float(np.dot(embedding, entry["embedding"]))
+            if similarity >= best_similarity:
+                best_answer, best_similarity = entry["answer"], similarity
+
+        with self._lock:
+            if best_answer is None:
+                self.misses += 1
+            else:
+                self.near_hits += 1
+        ANSWER_CACHE_LOOKUPS.labels(result="miss" if best_answer is None else "near_hit").inc()
+        return best_answer
+
+    def put(self, query: str, query_embedding: List[float], chunk_ids: List[str],
+            answer: Dict[str, Any], version: int):
+        """Cache an answer produced for the query at the given vector store version."""
+        if not self._check_version(version):
+            return
+        key = normalize_query(query)
+        chunk_key = tuple(chunk_ids)
+
+        self._entries.set(key, {
+            "answer": answer,
+            "embedding": self._normalize(query_embedding),
+            "chunk_ids": chunk_key
+        })
+        with self._lock:
+            self._by_chunks.setdefault(chunk_key, set()).add(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for sizing the cache."""
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._entries.max_size,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+                "version": self._version
+            }
+
+    def _check_version(self, version: int) -> bool:
+        """
+        Empty the cache when the vector store has moved to a newer version.
+
+        Returns:
+            False if the caller is working with an older version than the cache,
+            in which case it must neither read nor store answers
+        """
+        if version == self._version:
+            return True
+        with self._lock:
+            if self._version is not None and version < self._version:
+                return False
+            if version == self._version:
+                return True
+            if self._version is not None:
+                logger.info(f"Vector store changed (version {self._version} -> {version}), clearing answer cache")
+            self._version = version
+            self._by_chunks.clear()
+            self._entries.clear()
+        return True
+
+    def _forget(self, key: str, chunk_key: Tuple[str, ...]):
+        with self._lock:
+            keys = self._by_chunks.get(chunk_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_chunks[chunk_key]
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+answer_cache = AnswerCache(
+    max_size=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY
+)
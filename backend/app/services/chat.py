@@ -1,46 +1,62 @@
 """Service for handling chat interactions with the AI model."""
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
+import threading
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 import os
 
 from langchain.prompts import PromptTemplate
 from langchain.schema import Document
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-from sentence_transformers import SentenceTransformer
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 
 from app.models.schema import Message
 from app.core.config import settings
+from app.core.inference import InferenceRejected, inference_executor
+from app.core.registry import registry
+from app.services.answer_cache import answer_cache
+from app.services.retrieval import Retriever, RetrievalContext
 
 logger = logging.getLogger(__name__)
 
+class _StopOnEvent(StoppingCriteria):
+    """Stops generation once the event is set, e.g. when a streaming client disconnects."""
+    
+    def __init__(self, event: threading.Event):
+        self.event = event
+        
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
 class ChatService:
     """Service for handling chat operations with AI models."""
     
     def __init__(self, vector_store, model_name: str = settings.LLM_MODEL):
-        """Initialize with vector store and model configuration."""
+        """Initialize with vector store and the shared models from the registry."""
         self.vector_store = vector_store
         self.model_name = model_name
         
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        
-        # Initialize LLM with HuggingFace
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.llm = pipeline(
-            "text-generation",
-            model=model_name,
-            tokenizer=self.tokenizer,
-            max_length=1024,
-            temperature=0.3,
-            top_k=50,
-            top_p=0.95,
-            do_sample=True,
-        )
+        # Warm models are loaded once per process by the registry
+        self.embedding_model = registry.embedding_model
+        self.tokenizer = registry.tokenizer
+        self.llm = registry.llm
+        self.generator = registry.generator
         
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+        # Query embeddings are cached process-wide and reused within a request
+        self.retriever = Retriever(vector_store, self.embedding_model)
+        self.answer_cache = answer_cache
+        
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10),
+           retry=retry_if_not_exception_type(InferenceRejected))
     async def query(self, query: str, chat_history: Optional[List[Message]] = None) -> Dict[str, Any]:
-        """Process a query and return an AI response with sources."""
+        """
+        Process a query and return an AI response with sources.
+        
+        Embedding, search and generation run on the inference executor, so
+        the event loop keeps serving other requests meanwhile.
+        
+        Raises:
+            InferenceRejected: If the inference queue is full or the request waited too long
+        """
         if chat_history is None:
             chat_history = []
             
@@ -48,59 +64,223 @@ class ChatService:
             # Convert to the format expected by the chat function
             history_tuples = [(msg.role, msg.content) for msg in chat_history]
             
-            # Get response from chat function
-            response_text = self.chat(query, history_tuples)
-            
-            # Get source documents
-            query_embedding = self.embedding_model.encode(query)
-            source_documents = self.vector_store.search(
-                query=query,
-                top_k=5,
-                namespace="student_handbook"
-            )
+            # Answers only depend on the query and the index when there is no history. Reloading
+            # the index can wait for other writers, so an exact match is only looked up here if
+            # the loaded index is current; the executor task checks again after reloading it
+            if not history_tuples:
+                version = self.vector_store.loaded_version
+                cached = (self.answer_cache.get_exact(query, version, count_miss=False)
+                          if version is not None else None)
+                if cached is not None:
+                    return cached
             
-            formatted_sources = self.format_sources(source_documents)
+            return await inference_executor.run(self.answer, query, history_tuples)
             
-            return {
-                "response": response_text,
-                "sources": formatted_sources
-            }
+        except InferenceRejected:
+            raise
             
         except Exception as e:
             logger.error(f"Error in query: {str(e)}")
             raise ValueError(f"Failed to process query: {str(e)}")
     
-    def chat(self, query: str, history: List[Tuple[str, str]]) -> str:
+    def answer(self, query: str, history: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        Retrieve, generate and cache an answer; blocks while the models run.
+        
+        Args:
+            query: The user's question
+            history: List of (role, content) tuples representing chat history
+            
+        Returns:
+            Dict with the response and its formatted sources
+        """
+        cacheable = not history
+        # Reloads the index if another process changed it
+        version = self.vector_store.version
+        
+        if cacheable:
+            cached = self.answer_cache.get_exact(query, version)
+            if cached is not None:
+                return cached
+        
+        # Embed and search once, then share the result with the prompt and the sources
+        context = self.retrieve(query)
+        
+        if cacheable:
+            cached = self.answer_cache.get_similar(context.query_embedding, context.chunk_ids, version)
+            if cached is not None:
+                return cached
+        
+        # Get response from chat function
+        response_text = self.chat(query, history, context=context)
+        
+        formatted_sources = self.format_sources(context.documents)
+        
+        result = {
+            "response": response_text,
+            "sources": formatted_sources
+        }
+        if cacheable:
+            self.answer_cache.put(query, context.query_embedding, context.chunk_ids, result, version)
+        
+        return result
+    
+    def retrieve(self, query: str, top_k: int = 5) -> RetrievalContext:
+        """Build the retrieval context for a query using the cached query embedding."""
+        return self.retriever.retrieve(query, top_k=top_k)
+    
+    def chat(self, query: str, history: List[Tuple[str, str]], context: Optional[RetrievalContext] = None) -> str:
         """
         Generate a response based on query, history, and retrieved contexts.
         
         Args:
             query: The user's question
             history: List of (role, content) tuples representing chat history
+            context: Retrieval context already computed for this query, if any
             
         Returns:
             The assistant's response
         """
         try:
-            # Retrieve relevant contexts from vector store
-            results = self.vector_store.search(
-                query=query,
-                top_k=5,
-                namespace="student_handbook"
-            )
+            # Retrieve relevant contexts from vector store unless the caller already did
+            if context is None:
+                context = self.retrieve(query)
+            
+            prompt = self.build_prompt(query, history, context)
+            
+            # Generate response with Hugging Face model, batched with concurrent requests
+            response = self.generator.generate(prompt)
+            
+            return self.extract_answer(response, query)
+            
+        except Exception as e:
+            logger.error(f"Error in chat: {str(e)}")
+            raise ValueError(f"Failed to generate chat response: {str(e)}")
+    
+    def stream_chat(self, query: str, history: List[Tuple[str, str]]) -> Iterator[Tuple[str, Any]]:
+        """
+        Start generating a response and return its events as the model produces them.
+        
+        Retrieval and generation are queued on the inference executor before
+        this returns, so a full queue raises here rather than part way
+        through a stream. A request that then waits too long for a worker
+        raises InferenceRejected from the returned iterator instead.
+        
+        Args:
+            query: The user's question
+            history: List of (role, content) tuples representing chat history
+            
+        Returns:
+            Iterator of ("token", text) for each decoded chunk of the answer, then
+            ("sources", formatted_sources) once generation has finished
+            
+        Raises:
+            InferenceRejected: If the inference queue is full
+        """
+        cacheable = not history
+        # As in query(), only look up an exact match here if the loaded index is current
+        if cacheable:
+            version = self.vector_store.loaded_version
+            cached = (self.answer_cache.get_exact(query, version, count_miss=False)
+                      if version is not None else None)
+            if cached is not None:
+                return iter([("token", cached["response"]), ("sources", cached["sources"])])
+        
+        streamer = TextIteratorStreamer(
+            self.tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True,
+            timeout=settings.STREAM_TOKEN_TIMEOUT
+        )
+        stop_event = threading.Event()
+        state: Dict[str, Any] = {}
+        
+        def generate():
+            try:
+                # Reloads the index if another process changed it
+                version = state["version"] = self.vector_store.version
+                if cacheable:
+                    cached = self.answer_cache.get_exact(query, version)
+                    if cached is not None:
+                        state["cached"] = cached
+                        streamer.end()
+                        return
+                
+                context = self.retrieve(query)
+                state["context"] = context
+                
+                if cacheable:
+                    cached = self.answer_cache.get_similar(context.query_embedding, context.chunk_ids, version)
+                    if cached is not None:
+                        state["cached"] = cached
+                        streamer.end()
+                        return
+                
+                self.llm(
+                    self.build_prompt(query, history, context),
+                    max_new_tokens=settings.GENERATION_MAX_NEW_TOKENS,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop_event)])
+                )
+            except Exception as e:
+                logger.error(f"Error in streaming generation: {str(e)}")
+                state["error"] = e
+                # Unblock the consumer waiting on the streamer
+                streamer.end()
+        
+        def finished(future):
+            # Refused for waiting too long, or cancelled at shutdown, before generate() ran
+            if future.cancelled():
+                state["error"] = RuntimeError("Generation was cancelled")
+                streamer.end()
+            elif future.exception() is not None:
+                state["error"] = future.exception()
+                streamer.end()
+        
+        # Generation runs on the inference executor and feeds the streamer as tokens are decoded
+        inference_executor.submit(generate).add_done_callback(finished)
+        return self._stream_events(query, streamer, stop_event, state, cacheable)
+    
+    def _stream_events(self, query: str, streamer: TextIteratorStreamer, stop_event: threading.Event,
+                       state: Dict[str, Any], cacheable: bool) -> Iterator[Tuple[str, Any]]:
+        """Yield the streamer's tokens, then the sources, caching the finished answer."""
+        try:
+            answer = ""
+            for text in streamer:
+                if text:
+                    answer += text
+                    yield "token", text
             
-            # Format contexts into a single string
-            contexts = "\n\n".join([doc.page_content for doc in results])
+            if isinstance(state.get("error"), InferenceRejected):
+                raise state["error"]
+            if "error" in state:
+                raise ValueError(f"Failed to generate chat response: {str(state['error'])}")
+            if "cached" in state:
+                yield "token", state["cached"]["response"]
+                yield "sources", state["cached"]["sources"]
+                return
             
-            # Create formatted prompt with contexts and history
-            formatted_history = "\n".join([f"{role}: {content}" for role, content in history])
+            context = state["context"]
+            formatted_sources = self.format_sources(context.documents)
+            if cacheable:
+                result = {"response": answer.strip(), "sources": formatted_sources}
+                self.answer_cache.put(query, context.query_embedding, context.chunk_ids, result, state["version"])
             
-            prompt = f"""Instructions: You are CampusGuide AI, a helpful assistant for university students.
+            yield "sources", formatted_sources
+        finally:
+            # Stop generating if the client went away before the answer finished
+            stop_event.set()
+    
+    def build_prompt(self, query: str, history: List[Tuple[str, str]], context: RetrievalContext) -> str:
+        """Build the generation prompt from retrieved contexts and chat history."""
+        formatted_history = "\n".join([f"{role}: {content}" for role, content in history])
+        
+        return f"""Instructions: You are CampusGuide AI, a helpful assistant for university students.
 Based on the student handbook information below, provide accurate and helpful answers.
 If the information is not in the handbook, politely say you don't have that information.
 
 STUDENT HANDBOOK INFORMATION:
-{contexts}
+{context.contexts}
 
 CHAT HISTORY:
 {formatted_history}
@@ -108,24 +288,16 @@ CHAT HISTORY:
 USER: {query}
 
 ASSISTANT:"""
-            
-            # Generate response with Hugging Face model
-            response = self.llm(prompt, max_length=1024)[0]['generated_text']
-            
-            # Extract the assistant's reply from the response
-            # Find where the assistant's response starts
-            assistant_prefix = "ASSISTANT:"
-            if assistant_prefix in response:
-                answer = response.split(assistant_prefix)[-1].strip()
-            else:
-                # Fallback if the format isn't as expected
-                answer = response.split(f"USER: {query}")[-1].strip()
-            
-            return answer
-            
-        except Exception as e:
-            logger.error(f"Error in chat: {str(e)}")
-            raise ValueError(f"Failed to generate chat response: {str(e)}")
+    
+    def extract_answer(self, response: str, query: str) -> str:
+        """Extract the assistant's reply from the full generated text."""
+        # Find where the assistant's response starts
+        assistant_prefix = "ASSISTANT:"
+        if assistant_prefix in response:
+            return response.split(assistant_prefix)[-1].strip()
+        
+        # Fallback if the format isn't as expected
+        return response.split(f"USER: {query}")[-1].strip()
         
     def create_prompt_template(self) -> PromptTemplate:
         """Create the prompt template for the AI."""
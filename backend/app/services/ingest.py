@@ -1,28 +1,44 @@
 """Service for document ingestion and preprocessing."""
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+import functools
+import hashlib
 import os
 import tempfile
+import time
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 import uuid
 import logging
 
-from langchain.document_loaders import PyPDFium2Loader
+from tenacity import retry, retry_if_exception_type, stop_after_attempt
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.schema import Document
 
-from app.db.vector_store import get_vector_store
 from app.core.config import settings
+from app.core.registry import registry
+from app.db.segments import StaleDocumentError, key_page_sha256
+from app.services.ingest_jobs import IngestJob, IngestQueueFull, ingest_jobs
+from app.services.ingest_pipeline import IngestPipeline
 
 logger = logging.getLogger(__name__)
 
+# Bytes read from an upload at a time
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in blocks."""
+    content_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
 class IngestService:
     """Service for ingesting documents into the vector store."""
     
     def __init__(self, vector_store):
         """Initialize with vector store client."""
         self.vector_store = vector_store
-        self.embeddings = OpenAIEmbeddings(model=settings.EMBEDDING_MODEL)
+        self.embeddings = registry.embedding_model
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=500,
             chunk_overlap=50,
@@ -30,105 +46,199 @@ class IngestService:
             separators=["\n\n", "\n", " ", ""]
         )
         
-    async def process_file(self, file: UploadFile) -> Dict[str, Any]:
-        """Process a file upload and ingest into vector store."""
+    async def process_file(self, file: UploadFile, document_id: Optional[str] = None) -> IngestJob:
+        """
+        Save an upload and queue its ingestion as a background job.
+
+        Args:
+            file: Uploaded PDF
+            document_id: Previously ingested document the upload is a new version of
+
+        Returns:
+            The queued IngestJob
+
+        Raises:
+            HTTPException: 400 for non-PDF files, 404 for an unknown document_id, 413 for
+                files over INGEST_MAX_UPLOAD_BYTES, 429 when too many jobs are pending
+        """
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are supported")
+        # Reading the index can wait for another worker's write, so not on the event loop
+        if document_id is not None and not await run_in_threadpool(self.document_exists, document_id):
+            raise HTTPException(status_code=404, detail="Document not found")
+        if ingest_jobs.pending >= ingest_jobs.max_pending:
+            raise HTTPException(status_code=429, detail="Too many uploads are being processed, try again later",
+                                headers={"Retry-After": "30"})
         
-        # Save file temporarily
+        # Stream the upload to a temporary file in fixed-size blocks, hashing as it goes;
+        # the job deletes the file when it finishes
+        temp_path = None
         try:
+            content_hash = hashlib.sha256()
+            size = 0
             with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(await file.read())
                 temp_path = temp_file.name
+                while True:
+                    block = await file.read(UPLOAD_BLOCK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > settings.INGEST_MAX_UPLOAD_BYTES:
+                        raise HTTPException(status_code=413,
+                                            detail=f"File exceeds the {settings.INGEST_MAX_UPLOAD_BYTES} byte upload limit")
+                    content_hash.update(block)
+                    temp_file.write(block)
             
-            # Process the saved PDF
-            result = self.ingest_handbook(temp_path, original_filename=file.filename)
-            
-            return {
-                "status": "success",
-                "document_id": result["document_id"],
-                "num_chunks": result["num_chunks"]
-            }
+            return ingest_jobs.submit(file.filename, temp_path,
+                                      functools.partial(self._run_job, document_id=document_id),
+                                      sha256=content_hash.hexdigest(), size_bytes=size)
+        
+        except HTTPException:
+            os.unlink(temp_path)
+            raise
+        
+        except IngestQueueFull:
+            os.unlink(temp_path)
+            raise HTTPException(status_code=429, detail="Too many uploads are being processed, try again later",
+                                headers={"Retry-After": "30"})
         
         except Exception as e:
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
             logger.error(f"Error processing file: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
-        
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+
+    def document_exists(self, document_id: str) -> bool:
+        """Whether a document has an ingested version or live chunks."""
+        return bool(self.vector_store.get_document(document_id) or self.vector_store.document_chunks(document_id))
+
+    def _run_job(self, path: str, filename: str, job: IngestJob, document_id: Optional[str] = None) -> Dict[str, Any]:
+        """Ingest a saved upload on an ingestion worker thread."""
+        return self.ingest_handbook(path, original_filename=filename, job=job, document_id=document_id)
     
-    def ingest_handbook(self, pdf_path: str, original_filename: Optional[str] = None) -> Dict[str, Any]:
+    def ingest_handbook(self, pdf_path: str, original_filename: Optional[str] = None,
+                        job: Optional[IngestJob] = None, document_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Load PDF handbook, split into chunks and store in vector database.
         
+        A new version of an already ingested document only costs its changed
+        pages: pages are fingerprinted by the SHA-256 of their text, pages the
+        previous version already has are skipped, and the chunks of pages the
+        new version no longer has are retired in the same write that adds the
+        new ones. An identical file is not parsed at all.
+        
         Args:
             pdf_path: Path to the PDF file
             original_filename: Original filename for metadata
+            job: Background job to report stages and progress to
+            document_id: Document this file is a new version of; by default the last
+                document ingested with exactly the same file contents, if any,
+                otherwise a new document
             
         Returns:
-            Dict with document_id and num_chunks
+            Dict with document_id, sha256, num_chunks (live chunks of the document),
+            chunks_added, chunks_unchanged, chunks_removed, chunks_per_second and
+            the pipeline's per-stage throughput
         """
+        # Stand-in so progress reporting needs no checks when called without a job
+        job = job or IngestJob(original_filename or os.path.basename(pdf_path), pdf_path)
+        source = original_filename or os.path.basename(pdf_path)
         try:
-            # Generate a document ID
-            document_id = str(uuid.uuid4())
-            
-            # Load the PDF
-            documents = self.load_pdf(pdf_path)
-            
-            # Add metadata
-            for doc in documents:
-                doc.metadata.update({
-                    "document_id": document_id,
-                    "source": original_filename or os.path.basename(pdf_path),
-                    "type": "student_handbook"
-                })
-            
-            # Split the documents
-            chunks = self.split_documents(documents)
-            
-            logger.info(f"Split document into {len(chunks)} chunks")
-            
-            # Store in vector database
-            result = self.ingest_documents(chunks, namespace="student_handbook")
-            
-            return {
-                "document_id": document_id,
-                "num_chunks": len(chunks)
-            }
+            # Uploads are hashed while they are received, other files here
+            content_sha256 = job.sha256 or file_sha256(pdf_path)
+            return self._ingest_version(pdf_path, source, content_sha256, job, document_id)
             
         except Exception as e:
             logger.error(f"Error ingesting handbook: {str(e)}")
             raise ValueError(f"Failed to ingest handbook: {str(e)}")
+    
+    # Another upload or a deletion, possibly in another worker process, changed the document
+    # between reading its previous version and writing the new one: recompute the changes
+    @retry(stop=stop_after_attempt(3), retry=retry_if_exception_type(StaleDocumentError), reraise=True)
+    def _ingest_version(self, pdf_path: str, source: str, content_sha256: str, job: IngestJob,
+                        document_id: Optional[str]) -> Dict[str, Any]:
+        """Ingest a file as the next version of a document, see ingest_handbook."""
+        previous = None
+        if document_id is not None:
+            previous = self.vector_store.get_document(document_id)
+        else:
+            found = self.vector_store.find_document(content_sha256)
+            # Generate a document ID for a new document
+            document_id, previous = found or (str(uuid.uuid4()), None)
         
-    def load_pdf(self, file_path: str) -> List[Document]:
-        """Load a PDF file and return documents."""
-        try:
-            loader = PyPDFium2Loader(file_path)
-            documents = loader.load()
-            logger.info(f"Loaded PDF with {len(documents)} pages")
-            return documents
-        except Exception as e:
-            logger.error(f"Error loading PDF: {str(e)}")
-            raise ValueError(f"Failed to load PDF: {str(e)}")
+        # Live chunks of the previous version by page fingerprint; chunks ingested
+        # before pages were fingerprinted have none and are always replaced
+        live = {
+            key: (key_page_sha256(key), rows)
+            for key, rows in self.vector_store.document_chunks(document_id).items()
+        }
         
-    def split_documents(self, documents: List[Document]) -> List[Document]:
-        """Split documents into chunks."""
-        try:
-            chunks = self.text_splitter.split_documents(documents)
-            return chunks
-        except Exception as e:
-            logger.error(f"Error splitting documents: {str(e)}")
-            raise ValueError(f"Failed to split documents: {str(e)}")
+        if previous is not None and previous.get("content_sha256") == content_sha256 and live:
+            unchanged = sum(rows for _, rows in live.values())
+            logger.info(f"{source} is unchanged since its last ingestion as document {document_id}")
+            return {
+                "document_id": document_id,
+                "sha256": content_sha256,
+                "num_chunks": unchanged,
+                "chunks_added": 0,
+                "chunks_unchanged": unchanged,
+                "chunks_removed": 0,
+                "chunks_per_second": None,
+                "pipeline": None
+            }
+        
+        metadata = {
+            "document_id": document_id,
+            "content_sha256": content_sha256,
+            "source": source,
+            "type": "student_handbook",
+            "ingest_job_id": job.id
+        }
+        
+        # Extract, split and embed the changed pages with the stages overlapping
+        job.start_stage("processing")
+        pipeline = IngestPipeline.from_settings(settings, self.text_splitter, self.embeddings)
+        result = pipeline.run(
+            pdf_path, metadata, progress=lambda counts: job.update_progress(**counts),
+            skip_pages=frozenset(page for page, _ in live.values() if page)
+        )
+        
+        pages = set(result.page_hashes)
+        retire = [key for key, (page, _) in live.items() if page not in pages]
+        unchanged = sum(rows for page, rows in live.values() if page in pages)
+        removed = sum(live[key][1] for key in retire)
+        logger.info(f"Document {document_id}: {len(result.chunks)} chunks added, "
+                    f"{unchanged} unchanged, {removed} removed")
+        
+        # Store in vector database, unless the document changed in the meantime
+        job.start_stage("indexing")
+        record = {
+            "source": source,
+            "content_sha256": content_sha256,
+            "pages": len(result.page_hashes),
+            "chunks": unchanged + len(result.chunks),
+            "updated_at": time.time()
+        }
+        self.vector_store.update_document(document_id, record, result.chunks, result.vectors, retire, previous)
+        
+        return {
+            "document_id": document_id,
+            "sha256": content_sha256,
+            "num_chunks": record["chunks"],
+            "chunks_added": len(result.chunks),
+            "chunks_unchanged": unchanged,
+            "chunks_removed": removed,
+            "chunks_per_second": result.stages["embed"]["per_second"] if result.chunks else None,
+            "pipeline": result.stages
+        }
         
-    def ingest_documents(self, documents: List[Document], namespace: str) -> Dict[str, Any]:
-        """Ingest documents into vector store."""
+    def delete_document(self, document_id: str) -> Tuple[bool, int]:
+        """Delete every chunk of an ingested document, returning whether it existed and how many were deleted."""
         try:
-            # Use the vector store to upsert documents
-            result = self.vector_store.upsert_documents(documents, namespace=namespace)
-            logger.info(f"Ingested {len(documents)} documents to namespace '{namespace}'")
-            return result
+            found, deleted = self.vector_store.delete_document(document_id)
+            if found:
+                logger.info(f"Deleted {deleted} chunks of document {document_id}")
+            return found, deleted
         except Exception as e:
-            logger.error(f"Error ingesting documents: {str(e)}")
-            raise ValueError(f"Failed to ingest documents: {str(e)}") 
\ No newline at end of file
+            logger.error(f"Error deleting document: {str(e)}")
+            raise ValueError(f"Failed to delete document: {str(e)}")
\ No newline at end of file
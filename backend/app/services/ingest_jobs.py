@@ -0,0 +1,216 @@
+"""Background ingestion jobs run on a bounded worker pool, off the event loop."""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import logging
+import os
+import threading
+import time
+import uuid
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INGEST_JOBS = Counter(
+    "ingest_jobs_total",
+    "Ingestion jobs by final status",
+    ["status"]
+)
+INGEST_JOBS_PENDING = Gauge(
+    "ingest_jobs_pending",
+    "Ingestion jobs queued or running"
+)
+
+class IngestQueueFull(Exception):
+    """Raised when the maximum number of pending ingestion jobs is reached."""
+
+class IngestJob:
+    """
+    State of one uploaded document's ingestion.
+
+    Updated by the worker thread and read by the status endpoint, so every
+    access goes through the job's lock.
+    """
+
+    def __init__(self, filename: str, path: str, sha256: Optional[str] = None, size_bytes: int = 0):
+        """Initialize a queued job for a saved upload and its SHA-256, if already known."""
+        self.id = str(uuid.uuid4())
+        self.filename = filename
+        self.path = path
+        self.sha256 = sha256
+        self.size_bytes = size_bytes
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress: Dict[str, int] = {
+            "pages_total": 0, "pages_parsed": 0, "pages_unchanged": 0, "chunks_total": 0, "chunks_embedded": 0
+        }
+        self.stage_seconds: Dict[str, float] = {}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._stage_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start_stage(self, stage: str):
+        """Enter a pipeline stage, closing the timing of the previous one."""
+        with self._lock:
+            now = time.time()
+            if self._stage_started is not None:
+                self.stage_seconds[self.stage] = now - self._stage_started
+            self.stage = stage
+            self._stage_started = now
+
+    def update_progress(self, **counts: int):
+        """Set progress counters such as pages_parsed or chunks_embedded."""
+        with self._lock:
+            self.progress.update(counts)
+
+    def _start(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.time()
+
+    def _finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.start_stage("done")
+        with self._lock:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self._stage_started = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot of the job for the status endpoint."""
+        with self._lock:
+            now = time.time()
+            stage_seconds = dict(self.stage_seconds)
+            if self._stage_started is not None:
+                stage_seconds[self.stage] = now - self._stage_started
+            return {
+                "job_id": self.id,
+                "filename": self.filename,
+                "sha256": self.sha256,
+                "size_bytes": self.size_bytes,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": dict(self.progress),
+                "timings": {
+                    "queued_seconds": (self.started_at or now) - self.created_at,
+                    "elapsed_seconds": (self.finished_at or now) - (self.started_at or now),
+                    "stages": stage_seconds,
+                },
+                "result": self.result,
+                "error": self.error,
+            }
+
+class IngestJobManager:
+    """
+    Runs ingestion jobs on a fixed number of worker threads.
+
+    At most `max_pending` jobs may be queued or running; further uploads are
+    refused with IngestQueueFull instead of piling up saved files. The last
+    `history_size` finished jobs stay available to the status endpoint.
+    """
+
+    def __init__(self, workers: int = 1, max_pending: int = 8, history_size: int = 100):
+        """
+        Initialize the job manager.
+
+        Args:
+            workers: Jobs processed at the same time
+            max_pending: Jobs that may be queued or running before uploads are refused
+            history_size: Finished jobs kept for status queries
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.history_size = history_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, filename: str, path: str, ingest: Callable[[str, str, IngestJob], Dict[str, Any]],
+               sha256: Optional[str] = None, size_bytes: int = 0) -> IngestJob:
+        """
+        Queue the ingestion of a saved upload.
+
+        Args:
+            filename: Original file name
+            path: Saved file, deleted when the job finishes
+            ingest: Called on a worker thread as ingest(path, filename, job)
+            sha256: Hex SHA-256 of the file, computed while it was received
+            size_bytes: File size
+
+        Returns:
+            The queued job
+
+        Raises:
+            IngestQueueFull: If max_pending jobs are already queued or running
+        """
+        job = IngestJob(filename, path, sha256=sha256, size_bytes=size_bytes)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise IngestQueueFull(f"{self._pending} ingestion jobs are already pending")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._trim_history()
+            INGEST_JOBS_PENDING.set(self._pending)
+            self._executor.submit(self._run, job, ingest)
+        logger.info(f"Queued ingestion job {job.id} for {filename}")
+        return job
+
+    def _run(self, job: IngestJob, ingest: Callable[[str, str, IngestJob], Dict[str, Any]]):
+        job._start()
+        try:
+            result = ingest(job.path, job.filename, job)
+            job._finish("succeeded", result=result)
+            logger.info(f"Ingestion job {job.id} succeeded: {result}")
+        except Exception as e:
+            job._finish("failed", error=str(e))
+            logger.error(f"Ingestion job {job.id} failed: {str(e)}")
+        finally:
+            if os.path.exists(job.path):
+                os.unlink(job.path)
+            with self._lock:
+                self._pending -= 1
+                INGEST_JOBS_PENDING.set(self._pending)
+            INGEST_JOBS.labels(status=job.status).inc()
+
+    def _trim_history(self):
+        """Drop the oldest finished jobs beyond history_size. Caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Return a queued, running or recently finished job."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def shutdown(self):
+        """Stop accepting jobs; queued jobs that have not started are cancelled."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+ingest_jobs = IngestJobManager(
+    workers=settings.INGEST_WORKERS,
+    max_pending=settings.INGEST_MAX_PENDING_JOBS,
+    history_size=settings.INGEST_JOB_HISTORY,
+)
@@ -0,0 +1,285 @@
+"""Pipelined ingestion: parallel page extraction, splitting and batched embedding over bounded queues."""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AbstractSet, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import hashlib
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+import numpy as np
+from langchain.schema import Document
+
+from app.services.pdf_pages import count_pages, extract_pages
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+class StageStats:
+    """Items processed by one pipeline stage, its busy time and its wall-clock span."""
+
+    def __init__(self, name: str):
+        """Initialize empty counters for a stage."""
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def record(self, items: int, seconds: float):
+        if self.started is None:
+            self.started = time.time() - seconds
+        self.items += items
+        self.busy_seconds += seconds
+        self.finished = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = (self.finished - self.started) if self.started is not None else 0.0
+        return {
+            "items": self.items,
+            "busy_seconds": self.busy_seconds,
+            "wall_seconds": wall,
+            "per_second": self.items / wall if wall > 0 else 0.0,
+        }
+
+class PipelineResult(NamedTuple):
+    """Output of an ingestion pipeline run."""
+    chunks: List[Document]
+    vectors: np.ndarray  # float32, one row per chunk
+    page_hashes: List[str]  # SHA-256 of every page's text, in page order
+    stages: Dict[str, Any]  # Per-stage statistics
+
+def page_sha256(text: str) -> str:
+    """Fingerprint of a page's extracted text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class PipelineStopped(Exception):
+    """Raised in a stage thread when another stage has failed."""
+
+class IngestPipeline:
+    """
+    Turns a PDF into embedded chunks with the stages running concurrently.
+
+    A pool of processes extracts page text, a few pages per task, and the
+    pages flow through a bounded queue into the splitter and from there,
+    as chunks, through a second bounded queue into the embedder, which
+    embeds them in batches. Each stage blocks when the queue after it is
+    full, so the pages and chunks waiting between stages are bounded by the
+    queue sizes and the in-flight extraction tasks. The embedded chunks and
+    their vectors are collected for the single index write that applies the
+    new version at once, so they grow with the number of new chunks (about
+    2 KB each with a 384-dimensional model). Pages and chunks keep their
+    document order.
+
+    Every page is fingerprinted by the SHA-256 of its text, recorded in its
+    chunks' metadata as page_sha256. Pages whose fingerprint is in
+    `skip_pages`, or repeats an earlier page, are not split or embedded.
+    """
+
+    def __init__(self, text_splitter, embedding_model, parse_workers: int = 1, pages_per_task: int = 4,
+                 queue_size: int = 64, embed_batch_size: int = 256):
+        """
+        Initialize the pipeline.
+
+        Args:
+            text_splitter: LangChain text splitter applied to each page
+            embedding_model: EmbeddingEngine, or any LangChain Embeddings
+            parse_workers: Page extraction processes, 1 to extract in a thread
+            pages_per_task: Pages extracted per task
+            queue_size: Capacity of the page and chunk queues
+            embed_batch_size: Chunks embedded per call
+        """
+        self.text_splitter = text_splitter
+        self.embedding_model = embedding_model
+        self.parse_workers = max(1, parse_workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.queue_size = max(1, queue_size)
+        self.embed_batch_size = max(1, embed_batch_size)
+
+    @classmethod
+    def from_settings(cls, settings, text_splitter, embedding_model) -> "IngestPipeline":
+        """Create a pipeline from the INGEST_* settings."""
+        return cls(
+            text_splitter,
+            embedding_model,
+            parse_workers=settings.INGEST_PARSE_WORKERS,
+            pages_per_task=settings.INGEST_PAGES_PER_TASK,
+            queue_size=settings.INGEST_QUEUE_SIZE,
+            embed_batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+        )
+
+    def run(self, pdf_path: str, metadata: Dict[str, Any],
+            progress: Optional[Callable[[Dict[str, int]], None]] = None,
+            skip_pages: AbstractSet[str] = frozenset()) -> PipelineResult:
+        """
+        Extract, split and embed a PDF.
+
+        Args:
+            pdf_path: Path to the PDF file
+            metadata: Metadata added to every page, and so to every chunk
+            progress: Called with pages_total, pages_parsed, pages_unchanged, chunks_total
+                and chunks_embedded counts
+            skip_pages: Fingerprints of pages that are already indexed
+
+        Returns:
+            PipelineResult with the chunks of the pages not skipped and their vectors
+        """
+        start_time = time.time()
+        pages_total = count_pages(pdf_path)
+        counts = {"pages_total": pages_total, "pages_parsed": 0, "pages_unchanged": 0,
+                  "chunks_total": 0, "chunks_embedded": 0}
+        page_hashes: List[str] = []
+        seen_pages = set()
+        stats = {name: StageStats(name) for name in ("extract", "split", "embed")}
+        pages: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        chunks: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[Exception] = []
+
+        def report():
+            if progress is not None:
+                progress(dict(counts))
+
+        def put(target: "queue.Queue", item):
+            # Give up instead of blocking forever once another stage has failed
+            while True:
+                if stop.is_set():
+                    raise PipelineStopped()
+                try:
+                    target.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(source: "queue.Queue"):
+            while True:
+                if stop.is_set():
+                    raise PipelineStopped()
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+        def stage(body: Callable[[], None]) -> Callable[[], None]:
+            def run_stage():
+                try:
+                    body()
+                except PipelineStopped:
+                    pass
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+            return run_stage
+
+        def extract():
+            ranges = [(first, min(pages_total, first + self.pages_per_task))
+                      for first in range(0, pages_total, self.pages_per_task)]
+
+            def emit(extracted: List[Tuple[int, str]], seconds: float):
+                stats["extract"].record(len(extracted), seconds)
+                for page in extracted:
+                    put(pages, page)
+
+            if self.parse_workers == 1:
+                for first, last in ranges:
+                    emit(*extract_pages(pdf_path, first, last))
+            else:
+                # Spawned: workers only import pdf_pages, not the server's models and threads
+                with ProcessPoolExecutor(max_workers=self.parse_workers,
+                                         mp_context=multiprocessing.get_context("spawn")) as pool:
+                    # At most two tasks per worker in flight, taken back in page order
+                    in_flight = deque()
+                    for first, last in ranges:
+                        in_flight.append(pool.submit(extract_pages, pdf_path, first, last))
+                        if len(in_flight) >= 2 * self.parse_workers:
+                            emit(*in_flight.popleft().result())
+                    while in_flight:
+                        emit(*in_flight.popleft().result())
+            put(pages, _DONE)
+
+        def split():
+            while True:
+                page = get(pages)
+                if page is _DONE:
+                    break
+                page_number, text = page
+                split_start = time.time()
+                fingerprint = page_sha256(text)
+                counts["pages_parsed"] += 1
+                page_hashes.append(fingerprint)
+                if fingerprint in skip_pages or fingerprint in seen_pages:
+                    counts["pages_unchanged"] += 1
+                    continue
+                seen_pages.add(fingerprint)
+                document = Document(
+                    page_content=text,
+                    metadata={"source": pdf_path, "page": page_number, **metadata, "page_sha256": fingerprint}
+                )
+                page_chunks = self.text_splitter.split_documents([document])
+                stats["split"].record(len(page_chunks), time.time() - split_start)
+                for chunk in page_chunks:
+                    put(chunks, chunk)
+            put(chunks, _DONE)
+
+        threads = [
+            threading.Thread(target=stage(extract), name="ingest-extract", daemon=True),
+            threading.Thread(target=stage(split), name="ingest-split", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Embed on the calling thread
+        documents: List[Document] = []
+        vectors: List[np.ndarray] = []
+        batch: List[Document] = []
+        try:
+            while True:
+                chunk = get(chunks)
+                if chunk is not _DONE:
+                    batch.append(chunk)
+                    counts["chunks_total"] += 1
+                if batch and (len(batch) >= self.embed_batch_size or chunk is _DONE):
+                    embed_start = time.time()
+                    vectors.append(self._embed([doc.page_content for doc in batch]))
+                    stats["embed"].record(len(batch), time.time() - embed_start)
+                    documents.extend(batch)
+                    counts["chunks_embedded"] += len(batch)
+                    batch = []
+                    report()
+                if chunk is _DONE:
+                    break
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+        report()
+        summary = {name: stage_stats.to_dict() for name, stage_stats in stats.items()}
+        summary["total_seconds"] = time.time() - start_time
+        logger.info(
+            f"Processed {pages_total} pages ({counts['pages_unchanged']} unchanged) into {len(documents)} chunks "
+            f"in {summary['total_seconds']:.2f} seconds: "
+            + ", ".join(f"{name} {summary[name]['per_second']:.1f}/s" for name in stats)
+        )
+        return PipelineResult(
+            chunks=documents,
+            vectors=np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32),
+            page_hashes=page_hashes,
+            stages=summary,
+        )
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if hasattr(self.embedding_model, "encode"):
+            return self.embedding_model.encode(texts)
+        return np.asarray(self.embedding_model.embed_documents(texts), dtype=np.float32)
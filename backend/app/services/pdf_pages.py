@@ -0,0 +1,44 @@
+"""Page text extraction run in ingestion worker processes; imports nothing but pypdfium2 so workers start quickly."""
+from typing import List, Tuple
+import threading
+import time
+
+import pypdfium2 as pdfium
+
+# pdfium is not thread-safe, even for different documents: every pdfium call in
+# a process goes through this lock. Worker processes each have their own.
+_pdfium_lock = threading.Lock()
+
+def count_pages(pdf_path: str) -> int:
+    """Number of pages in a PDF."""
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+def extract_pages(pdf_path: str, first: int, last: int) -> Tuple[List[Tuple[int, str]], float]:
+    """
+    Extract the text of pages first..last - 1, the way LangChain's PyPDFium2Loader does.
+
+    Every call opens its own copy of the document. Calls on threads of one
+    process run one at a time; extract in worker processes to parallelize.
+
+    Returns:
+        ([(page number, text), ...], seconds spent extracting)
+    """
+    with _pdfium_lock:
+        start_time = time.time()
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            pages = []
+            for page_number in range(first, last):
+                page = pdf[page_number]
+                text_page = page.get_textpage()
+                pages.append((page_number, text_page.get_text_range()))
+                text_page.close()
+                page.close()
+            return pages, time.time() - start_time
+        finally:
+            pdf.close()
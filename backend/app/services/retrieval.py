@@ -0,0 +1,75 @@
+"""Per-request retrieval context built on top of a cached query embedding."""
+from typing import List, Optional
+import logging
+import re
+
+from langchain.schema import Document
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Query embeddings keyed by (normalized query, embedding model name)
+query_embedding_cache = LRUCache(
+    name="query_embedding",
+    max_size=settings.EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.EMBEDDING_CACHE_TTL
+)
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+class RetrievalContext:
+    """Query embedding and retrieved chunks, computed once per request."""
+
+    def __init__(self, query: str, query_embedding: List[float], documents: List[Document],
+                 scores: List[float], chunk_ids: List[str]):
+        """Initialize with the results of a single vector search."""
+        self.query = query
+        self.query_embedding = query_embedding
+        self.documents = documents
+        self.scores = scores
+        self.chunk_ids = chunk_ids
+
+    @property
+    def contexts(self) -> str:
+        """Retrieved chunk texts joined for the prompt."""
+        return "\n\n".join([doc.page_content for doc in self.documents])
+
+class Retriever:
+    """Embeds queries through the shared cache and runs a single vector search."""
+
+    def __init__(self, vector_store, embedding_model, cache: Optional[LRUCache] = None):
+        """Initialize with the vector store, embedding model and query embedding cache."""
+        self.vector_store = vector_store
+        self.embedding_model = embedding_model
+        self.cache = cache if cache is not None else query_embedding_cache
+
+    def embed_query(self, query: str) -> List[float]:
+        """Return the embedding for a query, reusing a cached one when available."""
+        key = (normalize_query(query), settings.EMBEDDING_MODEL)
+        return self.cache.get_or_compute(key, lambda: self.embedding_model.embed_query(query))
+
+    def retrieve(self, query: str, top_k: int = 5) -> RetrievalContext:
+        """
+        Embed the query once and search the vector store once.
+
+        Args:
+            query: The user's question
+            top_k: Number of chunks to retrieve
+
+        Returns:
+            RetrievalContext shared by prompt building and source formatting
+        """
+        query_embedding = self.embed_query(query)
+        hits = self.vector_store.search_by_vector(query_embedding, top_k=top_k)
+
+        return RetrievalContext(
+            query=query,
+            query_embedding=query_embedding,
+            documents=[doc for _, doc, _ in hits],
+            scores=[score for _, _, score in hits],
+            chunk_ids=[chunk_id for chunk_id, _, _ in hits]
+        )
@@ -0,0 +1,35 @@
+"""Shared fixtures for the backend tests."""
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+DIMENSION = 8
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def make_chunks(document_id, count, rng, **metadata):
+    """Random unit vectors and chunks of one document."""
+    vectors = rng.standard_normal((count, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    documents = [
+        Document(page_content=f"{document_id} chunk {i}", metadata={"document_id": document_id, **metadata})
+        for i in range(count)
+    ]
+    return vectors, documents
+
+
+@pytest.fixture
+def loaded_registry(monkeypatch):
+    """Mark registry components ready with stand-ins: call with name=object pairs."""
+    from app.core.registry import registry
+
+    def load(**components):
+        for name, component in components.items():
+            monkeypatch.setattr(registry, f"_{name}", component)
+            monkeypatch.setitem(registry._status, name, "ready")
+        return registry
+    return load
@@ -0,0 +1,24 @@
+"""Answer cache: counting the event-loop pre-check and the executor lookup as one request."""
+from app.services.answer_cache import AnswerCache
+
+
+def request(cache, query, version=1):
+    """Look up a query the way ChatService does: an uncounted pre-check, then the counted lookup."""
+    return cache.get_exact(query, version, count_miss=False) or cache.get_exact(query, version)
+
+
+def test_uncached_request_is_one_miss():
+    cache = AnswerCache()
+
+    assert request(cache, "What is the exam policy?") is None
+    assert cache._entries.stats()["misses"] == 1
+
+
+def test_pre_check_hit_is_counted():
+    cache = AnswerCache()
+    answer = {"response": "Exams are in May.", "sources": []}
+    cache.put("What is the exam policy?", [1.0, 0.0], ["chunk-1"], answer, version=1)
+
+    assert cache.get_exact("what is the exam policy?", 1, count_miss=False) == answer
+    assert cache._entries.stats()["hits"] == 1 and cache._entries.stats()["misses"] == 0
+    assert cache.stats()["exact_hits"] == 1
@@ -0,0 +1,44 @@
+"""EmbeddingEngine batching, ordering and per-call statistics."""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.embeddings import EmbeddingEngine
+
+
+class LengthModel:
+    """Stands in for SentenceTransformer: embeds a text as [len(text), batch size]."""
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy, show_progress_bar):
+        return np.array([[len(text), len(texts)] for text in texts], dtype=np.float32)
+
+
+def make_engine(batch_size=2):
+    engine = EmbeddingEngine("test-model", batch_size=batch_size)
+    engine._model = LengthModel()
+    return engine
+
+
+def test_encode_keeps_input_order_in_length_sorted_batches():
+    engine = make_engine(batch_size=2)
+    progress = []
+
+    vectors = engine.encode(["aa", "a", "aaaa", "aaa\nb"], progress=progress.append)
+
+    assert vectors[:, 0].tolist() == [2, 1, 4, 5]
+    assert progress == [2, 4]
+
+
+def test_encode_with_stats_reports_each_call():
+    engine = make_engine(batch_size=3)
+
+    with ThreadPoolExecutor(2) as pool:
+        small = pool.submit(engine.encode_with_stats, ["a"] * 2)
+        large = pool.submit(engine.encode_with_stats, ["b"] * 9)
+        (small_vectors, small_stats), (large_vectors, large_stats) = small.result(), large.result()
+
+    assert len(small_vectors) == small_stats["texts"] == 2
+    assert small_stats["batches"] == 1
+    assert len(large_vectors) == large_stats["texts"] == 9
+    assert large_stats["batches"] == 3
+    assert engine.encode_with_stats([])[1] == {}
@@ -0,0 +1,116 @@
+"""Generation batching: closing batches, fanning out results and errors, closing the batcher."""
+import threading
+import time
+
+import pytest
+
+from app.core.generation import GenerationBatcher
+
+
+class FakePipeline:
+    """Stands in for the text-generation pipeline, recording every call."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def __call__(self, prompts, **kwargs):
+        prompts = [prompts] if isinstance(prompts, str) else prompts
+        self.calls.append({"prompts": list(prompts), "thread": threading.current_thread().name, **kwargs})
+        if self.error is not None:
+            raise self.error
+        return [[{"generated_text": f"{prompt} -> answer to {prompt}"}] for prompt in prompts]
+
+
+def generate_concurrently(batcher, prompts):
+    """Call generate() from one thread per prompt; returns results or exceptions by prompt."""
+    results = {}
+
+    def call(prompt):
+        try:
+            results[prompt] = batcher.generate(prompt)
+        except Exception as e:
+            results[prompt] = e
+    threads = [threading.Thread(target=call, args=(prompt,)) for prompt in prompts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_batch_closes_when_the_window_ends():
+    llm = FakePipeline()
+    batcher = GenerationBatcher(llm, max_batch_size=8, window=0.5, max_new_tokens=32)
+
+    start = time.monotonic()
+    results = generate_concurrently(batcher, ["a", "b", "c"])
+
+    assert results["a"] == "a -> answer to a"
+    assert time.monotonic() - start >= 0.4
+    assert len(llm.calls) == 1
+    assert sorted(llm.calls[0]["prompts"]) == ["a", "b", "c"]
+    assert llm.calls[0]["batch_size"] == 3
+    assert llm.calls[0]["max_new_tokens"] == 32 and "max_length" not in llm.calls[0]
+    assert batcher.stats()["last_batch"]["size"] == 3
+    batcher.close()
+
+
+def test_batch_closes_when_full():
+    llm = FakePipeline()
+    batcher = GenerationBatcher(llm, max_batch_size=2, window=30)
+
+    start = time.monotonic()
+    results = generate_concurrently(batcher, ["a", "b", "c", "d"])
+
+    # Two full batches, neither waiting for the window
+    assert time.monotonic() - start < 10
+    assert [len(call["prompts"]) for call in llm.calls] == [2, 2]
+    assert len(results) == 4
+    batcher.close()
+
+
+def test_every_caller_gets_its_own_text():
+    llm = FakePipeline()
+    batcher = GenerationBatcher(llm, max_batch_size=4, window=0.2)
+
+    results = generate_concurrently(batcher, ["a", "b", "c", "d"])
+
+    assert results == {prompt: f"{prompt} -> answer to {prompt}" for prompt in "abcd"}
+    batcher.close()
+
+
+def test_error_reaches_every_caller_in_the_batch():
+    llm = FakePipeline(error=RuntimeError("out of memory"))
+    batcher = GenerationBatcher(llm, max_batch_size=3, window=0.5)
+
+    results = generate_concurrently(batcher, ["a", "b", "c"])
+
+    assert len(llm.calls) == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "out of memory" for result in results.values())
+
+    # The scheduler keeps running after a failed batch
+    llm.error = None
+    assert batcher.generate("d") == "d -> answer to d"
+    batcher.close()
+
+
+def test_batch_size_one_generates_on_the_caller_thread():
+    llm = FakePipeline()
+    batcher = GenerationBatcher(llm, max_batch_size=1)
+
+    assert batcher.generate("a") == "a -> answer to a"
+    assert llm.calls[0]["thread"] == threading.current_thread().name
+    assert batcher.stats()["waiting"] == 0
+
+
+@pytest.mark.parametrize("max_batch_size", [1, 4])
+def test_closed_batcher_refuses_prompts(max_batch_size):
+    llm = FakePipeline()
+    batcher = GenerationBatcher(llm, max_batch_size=max_batch_size, window=0.01)
+    batcher.generate("a")
+    batcher.close()
+
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.generate("b")
+    assert len(llm.calls) == 1
@@ -0,0 +1,100 @@
+"""Inference executor: refusing with 429 and 503, Retry-After and queue accounting."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.inference import InferenceExecutor, InferenceRejected
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(workers=1, max_queue=1, queue_timeout=30)
+    yield executor
+    executor.shutdown()
+
+
+def occupy(executor):
+    """Submit a task that holds the worker until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+        return "held"
+    future = executor.submit(hold)
+    assert started.wait(5)
+    return future, release
+
+
+def test_run_returns_the_result(executor):
+    assert asyncio.run(executor.run(lambda x, y=0: x + y, 2, y=3)) == 5
+    assert executor.stats()["queued"] == 0 and executor.stats()["active"] == 0
+
+
+def test_full_queue_is_refused_with_429(executor):
+    running, release = occupy(executor)
+    waiting = executor.submit(lambda: "waited")
+    assert (executor.stats()["active"], executor.stats()["queued"]) == (1, 1)
+
+    with pytest.raises(InferenceRejected) as rejected:
+        executor.submit(lambda: "refused")
+    assert rejected.value.status_code == 429
+    # One running and one waiting task at the initial one second average
+    assert rejected.value.retry_after == 2
+
+    release.set()
+    assert running.result(5) == "held"
+    assert waiting.result(5) == "waited"
+    assert (executor.stats()["active"], executor.stats()["queued"]) == (0, 0)
+    assert executor.submit(lambda: "accepted").result(5) == "accepted"
+
+
+def test_task_that_waited_too_long_is_refused_with_503(executor):
+    executor.queue_timeout = 0.05
+    running, release = occupy(executor)
+    called = []
+    waiting = executor.submit(called.append, "ran")
+    time.sleep(0.1)
+    release.set()
+
+    with pytest.raises(InferenceRejected) as rejected:
+        waiting.result(5)
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after >= 1
+    assert called == []
+    assert (executor.stats()["active"], executor.stats()["queued"]) == (0, 0)
+
+
+def test_error_is_raised_to_the_caller_and_frees_the_worker(executor):
+    def fail():
+        raise RuntimeError("model failed")
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        asyncio.run(executor.run(fail))
+    assert executor.stats()["active"] == 0
+    assert asyncio.run(executor.run(lambda: "next")) == "next"
+
+
+def test_cancelled_task_leaves_the_queue(executor):
+    running, release = occupy(executor)
+    waiting = executor.submit(lambda: "never")
+    assert waiting.cancel()
+    assert executor.stats()["queued"] == 0
+
+    # Its place can be taken again
+    replacement = executor.submit(lambda: "replacement")
+    release.set()
+    assert replacement.result(5) == "replacement"
+
+
+def test_shutdown_cancels_waiting_tasks(executor):
+    running, release = occupy(executor)
+    waiting = executor.submit(lambda: "never")
+    executor.shutdown()
+    release.set()
+
+    assert waiting.cancelled()
+    assert running.result(5) == "held"
+    assert executor.stats()["queued"] == 0
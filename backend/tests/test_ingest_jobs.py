@@ -0,0 +1,99 @@
+"""IngestJobManager: job lifecycle, pending limit and history."""
+import os
+import threading
+import time
+
+import pytest
+
+from app.services.ingest_jobs import IngestJobManager, IngestQueueFull
+
+
+def wait_idle(manager, timeout=5.0):
+    """Wait until every job has finished and released its pending slot."""
+    deadline = time.monotonic() + timeout
+    while manager.pending:
+        assert time.monotonic() < deadline, f"{manager.pending} jobs still pending"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def manager():
+    manager = IngestJobManager(workers=1, max_pending=2, history_size=2)
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def upload(tmp_path):
+    def make(name="upload.pdf"):
+        path = tmp_path / name
+        path.write_bytes(b"%PDF-1.4")
+        return str(path)
+    return make
+
+
+def test_job_succeeds_and_removes_its_file(manager, upload):
+    path = upload()
+
+    def ingest(path, filename, job):
+        job.start_stage("processing")
+        job.update_progress(pages_total=3, pages_parsed=3)
+        return {"filename": filename, "num_chunks": 7}
+
+    job = manager.submit("handbook.pdf", path, ingest, sha256="abc", size_bytes=8)
+    wait_idle(manager)
+
+    status = job.to_dict()
+    assert status["status"] == "succeeded"
+    assert status["stage"] == "done"
+    assert status["result"] == {"filename": "handbook.pdf", "num_chunks": 7}
+    assert status["progress"]["pages_parsed"] == 3
+    assert "processing" in status["timings"]["stages"]
+    assert status["sha256"] == "abc"
+    assert manager.get(job.id) is job
+    assert not os.path.exists(path)
+
+
+def test_job_failure_is_reported(manager, upload):
+    def ingest(path, filename, job):
+        raise ValueError("Failed to parse PDF")
+
+    job = manager.submit("broken.pdf", upload(), ingest)
+    wait_idle(manager)
+
+    assert job.status == "failed"
+    assert job.error == "Failed to parse PDF"
+    assert job.result is None
+
+
+def test_submit_refused_when_pending_limit_reached(manager, upload):
+    release = threading.Event()
+
+    def ingest(path, filename, job):
+        release.wait(5)
+        return {}
+
+    first = manager.submit("a.pdf", upload("a.pdf"), ingest)
+    second = manager.submit("b.pdf", upload("b.pdf"), ingest)
+    with pytest.raises(IngestQueueFull):
+        manager.submit("c.pdf", upload("c.pdf"), ingest)
+    assert manager.pending == 2
+    assert second.status == "queued"
+
+    release.set()
+    wait_idle(manager)
+    assert first.status == second.status == "succeeded"
+    third = manager.submit("c.pdf", upload("c.pdf"), ingest)
+    wait_idle(manager)
+    assert third.status == "succeeded"
+
+
+def test_history_keeps_recent_finished_jobs(manager, upload):
+    jobs = []
+    for i in range(4):
+        jobs.append(manager.submit(f"{i}.pdf", upload(f"{i}.pdf"), lambda path, filename, job: {}))
+        wait_idle(manager)
+
+    # Trimmed to history_size finished jobs whenever a job is queued
+    assert manager.get(jobs[0].id) is None
+    assert [manager.get(job.id) for job in jobs[1:]] == jobs[1:]
@@ -0,0 +1,111 @@
+"""Versioned ingestion: matching previous versions, page-level updates and concurrent writers."""
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+from app.core.config import settings
+from app.db.vector_store import VectorStore
+from app.services import ingest as ingest_module
+from app.services.ingest import IngestService
+from app.services.ingest_pipeline import PipelineResult, page_sha256
+from tests.conftest import DIMENSION
+
+
+class FakePipeline:
+    """Stands in for IngestPipeline: one chunk per page, pages given per file path."""
+
+    def __init__(self, pages_by_path, rng):
+        self.pages_by_path = pages_by_path
+        self.rng = rng
+        self.runs = 0
+        self.before_result = None  # Called once a run has read the previous version
+
+    def run(self, pdf_path, metadata, progress=None, skip_pages=frozenset()):
+        self.runs += 1
+        hashes = [page_sha256(text) for text in self.pages_by_path[pdf_path]]
+        chunks = [
+            Document(page_content=text, metadata={**metadata, "page": number, "page_sha256": sha})
+            for number, (text, sha) in enumerate(zip(self.pages_by_path[pdf_path], hashes))
+            if sha not in skip_pages
+        ]
+        vectors = self.rng.standard_normal((len(chunks), DIMENSION)).astype(np.float32)
+        if self.before_result is not None:
+            self.before_result()
+        stages = {"embed": {"per_second": 1.0}}
+        return PipelineResult(chunks, vectors, hashes, stages)
+
+
+@pytest.fixture
+def pipeline(monkeypatch, rng):
+    fake = FakePipeline({}, rng)
+    monkeypatch.setattr(ingest_module.IngestPipeline, "from_settings",
+                        classmethod(lambda cls, settings, splitter, embeddings: fake))
+    return fake
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, loaded_registry):
+    loaded_registry(embedding_model=object())
+    # The index lives under data/ in the working directory; a background compaction
+    # would outlive the test and its directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "VECTOR_STORE_MAX_SEGMENTS", 1000)
+    monkeypatch.setattr(settings, "VECTOR_STORE_COMPACT_DELETED_RATIO", 1.0)
+    return IngestService(VectorStore(embedding_model=object()))
+
+
+def handbook(tmp_path, pipeline, name, pages):
+    path = tmp_path / name
+    path.write_bytes("\f".join(pages).encode())
+    pipeline.pages_by_path[str(path)] = pages
+    return str(path)
+
+
+def test_new_version_only_embeds_changed_pages(tmp_path, service, pipeline):
+    first = service.ingest_handbook(handbook(tmp_path, pipeline, "v1.pdf", ["a", "b", "c"]), "handbook.pdf")
+    second = service.ingest_handbook(handbook(tmp_path, pipeline, "v2.pdf", ["a", "c", "d"]), "handbook.pdf",
+                                     document_id=first["document_id"])
+
+    assert second["document_id"] == first["document_id"]
+    assert (second["chunks_added"], second["chunks_unchanged"], second["chunks_removed"]) == (1, 2, 1)
+    assert second["num_chunks"] == 3
+    assert sum(service.vector_store.document_chunks(first["document_id"]).values()) == 3
+
+
+def test_previous_version_is_only_matched_by_contents(tmp_path, service, pipeline):
+    first = service.ingest_handbook(handbook(tmp_path, pipeline, "v1.pdf", ["a", "b"]), "handbook.pdf")
+
+    # Same contents under another name: the same document, not parsed again
+    again = service.ingest_handbook(handbook(tmp_path, pipeline, "copy.pdf", ["a", "b"]), "copy.pdf")
+    assert again["document_id"] == first["document_id"]
+    assert again["chunks_unchanged"] == 2 and pipeline.runs == 1
+
+    # New contents under the same name, without a document_id: a new document
+    other = service.ingest_handbook(handbook(tmp_path, pipeline, "v2.pdf", ["a", "c"]), "handbook.pdf")
+    assert other["document_id"] != first["document_id"]
+    assert other["chunks_added"] == 2
+    assert sum(service.vector_store.document_chunks(first["document_id"]).values()) == 2
+
+
+def test_concurrent_update_is_recomputed(tmp_path, service, pipeline):
+    first = service.ingest_handbook(handbook(tmp_path, pipeline, "v1.pdf", ["a", "b"]), "handbook.pdf")
+    document_id = first["document_id"]
+    path = handbook(tmp_path, pipeline, "v2.pdf", ["a", "b", "c"])
+
+    # Another worker process, with its own index, updates the document while this one embeds
+    other = IngestService(VectorStore(embedding_model=object()))
+    other_path = handbook(tmp_path, pipeline, "other.pdf", ["b", "e"])
+
+    def update_elsewhere():
+        pipeline.before_result = None
+        other.ingest_handbook(other_path, "handbook.pdf", document_id=document_id)
+    pipeline.before_result = update_elsewhere
+
+    result = service.ingest_handbook(path, "handbook.pdf", document_id=document_id)
+
+    # The first attempt was refused and the changes recomputed against the other version
+    assert pipeline.runs == 4
+    assert (result["chunks_added"], result["chunks_unchanged"], result["chunks_removed"]) == (2, 1, 1)
+    chunks = service.vector_store.document_chunks(document_id)
+    assert sum(chunks.values()) == 3
+    assert len(chunks) == 3
@@ -0,0 +1,223 @@
+"""Segmented index: writes, deletes, crash recovery and compaction."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.db import segments
+from app.db.index_types import IndexParams
+from app.db.segments import SEGMENTS_DIR, WAL_FILE, Segment, SegmentedIndex, StaleDocumentError
+from tests.conftest import make_chunks
+
+
+def open_index(path, **kwargs):
+    # Compaction only runs when a test calls compact()
+    kwargs.setdefault("max_segments", 1000)
+    kwargs.setdefault("max_deleted_ratio", 1.0)
+    return SegmentedIndex(str(path), IndexParams(), **kwargs)
+
+
+def found_documents(index, vector, top_k=10):
+    return {document.metadata["document_id"] for _, document, _ in index.search(vector, top_k)}
+
+
+def test_add_search_delete(tmp_path, rng):
+    index = open_index(tmp_path)
+    vectors_a, chunks_a = make_chunks("a", 3, rng)
+    vectors_b, chunks_b = make_chunks("b", 2, rng)
+    index.add(vectors_a, chunks_a)
+    index.add(vectors_b, chunks_b)
+
+    chunk_id, document, distance = index.search(vectors_b[1], 1)[0]
+    assert document.page_content == "b chunk 1"
+    assert distance < 1e-5
+
+    assert index.delete("b") == (True, 2)
+    assert found_documents(index, vectors_b[1]) == {"a"}
+    assert index.delete("b") == (False, 0)
+    assert index.delete("missing") == (False, 0)
+    assert index.stats()["deleted_rows"] == 2
+
+
+def test_delete_document_without_chunks(tmp_path):
+    index = open_index(tmp_path)
+    index.add(np.zeros((0, 8), dtype=np.float32), [], document_id="empty", document={"source": "empty.pdf"})
+
+    assert index.delete("empty") == (True, 0)
+    assert "empty" not in index.state.documents
+    assert index.delete("empty") == (False, 0)
+
+
+def test_reopen_from_manifest_and_wal(tmp_path, rng, monkeypatch):
+    monkeypatch.setattr(segments, "CHECKPOINT_RECORDS", 2)
+    index = open_index(tmp_path)
+    vectors_a, chunks_a = make_chunks("a", 3, rng)
+    vectors_b, chunks_b = make_chunks("b", 3, rng)
+    index.add(vectors_a, chunks_a, document_id="a", document={"source": "a.pdf"})
+    index.delete("a")  # Second record: checkpointed into the manifest
+    index.add(vectors_b, chunks_b, document_id="b", document={"source": "b.pdf"})
+    assert index.wal_records == 1
+
+    reopened = open_index(tmp_path)
+    assert reopened.seq == index.seq == 3
+    assert reopened.wal_records == 1
+    assert set(reopened.state.documents) == {"b"}
+    assert found_documents(reopened, vectors_a[0]) == {"b"}
+    assert reopened.stats()["rows"] == 6
+    assert reopened.stats()["deleted_rows"] == 3
+
+
+def test_reopen_after_torn_wal_line(tmp_path, rng):
+    index = open_index(tmp_path)
+    vectors_a, chunks_a = make_chunks("a", 2, rng)
+    index.add(vectors_a, chunks_a)
+    wal_path = os.path.join(tmp_path, WAL_FILE)
+    valid_size = os.path.getsize(wal_path)
+
+    # A crash in the middle of appending the next record
+    with open(wal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "delete", "document_id": "a", "ke')
+
+    reopened = open_index(tmp_path)
+    assert reopened.seq == 1
+    assert os.path.getsize(wal_path) == valid_size
+    assert found_documents(reopened, vectors_a[0]) == {"a"}
+
+    # The next write starts on a fresh line and survives another reopen
+    vectors_b, chunks_b = make_chunks("b", 2, rng)
+    reopened.add(vectors_b, chunks_b)
+    with open(wal_path, encoding="utf-8") as f:
+        assert [json.loads(line)["seq"] for line in f] == [1, 2]
+    assert open_index(tmp_path).stats()["rows"] == 4
+
+
+def test_compaction_with_delete_during_build(tmp_path, rng, monkeypatch):
+    index = open_index(tmp_path)
+    vectors_a, chunks_a = make_chunks("a", 4, rng)
+    vectors_b, chunks_b = make_chunks("b", 4, rng)
+    vectors_c, chunks_c = make_chunks("c", 4, rng)
+    index.add(vectors_a, chunks_a)
+    index.add(vectors_b, chunks_b)
+    index.delete("a")
+
+    write = Segment.write.__func__
+
+    def write_then_delete(cls, *args, **kwargs):
+        entry = write(cls, *args, **kwargs)
+        if kwargs.get("staged"):
+            # Lands after the snapshot, before the merged segment is published
+            index.delete("b")
+            index.add(vectors_c, chunks_c)
+        return entry
+
+    monkeypatch.setattr(Segment, "write", classmethod(write_then_delete))
+    assert index.compact()
+    monkeypatch.undo()
+
+    stats = index.stats()
+    assert stats["segments"] == 2  # The merged segment and the one added meanwhile
+    assert stats["rows"] == 8
+    assert stats["deleted_rows"] == 4
+    assert stats["tombstones"] == 1  # a is gone from disk; b's rows are still in the merged segment
+    assert found_documents(index, vectors_b[0]) == {"c"}
+
+    reopened = open_index(tmp_path)
+    assert found_documents(reopened, vectors_b[0]) == {"c"}
+    names = set(os.listdir(os.path.join(tmp_path, SEGMENTS_DIR)))
+    assert names == {segment.name for segment in reopened.state.segments}
+
+
+def test_startup_keeps_compaction_in_progress(tmp_path, rng):
+    index = open_index(tmp_path)
+    vectors, chunks = make_chunks("a", 2, rng)
+    index.add(vectors, chunks)
+    staged = Segment.write(str(tmp_path), vectors, chunks, IndexParams(), staged=True)
+    orphan = os.path.join(tmp_path, SEGMENTS_DIR, "seg-orphan")
+    os.makedirs(orphan)
+
+    # Another worker starting up while the compaction is still being written
+    open_index(tmp_path)
+    assert os.path.isdir(Segment.staging_path(str(tmp_path), staged["name"]))
+    assert not os.path.exists(orphan)
+
+
+def test_refresh_picks_up_other_writers(tmp_path, rng):
+    reader = open_index(tmp_path)
+    writer = open_index(tmp_path)
+    vectors, chunks = make_chunks("a", 2, rng)
+    writer.add(vectors, chunks, document_id="a", document={"source": "a.pdf"})
+
+    reader.refresh(force=True)
+    assert reader.seq == writer.seq
+    assert found_documents(reader, vectors[0]) == {"a"}
+    assert reader.state.documents["a"] == {"source": "a.pdf"}
+
+
+def test_stale_document_write_is_refused(tmp_path, rng):
+    index = open_index(tmp_path)
+    other = open_index(tmp_path)  # Another worker process updating the same document
+    vectors, chunks = make_chunks("a", 2, rng)
+    first = {"source": "a.pdf", "updated_at": 1.0}
+    index.add(vectors, chunks, document_id="a", document=first, previous=None)
+
+    # Both start from the first version; the second write to land is refused
+    other.add(np.zeros((0, 8), dtype=np.float32), [], document_id="a",
+              document={"source": "a.pdf", "updated_at": 2.0}, previous=first)
+    with pytest.raises(StaleDocumentError):
+        index.add(vectors, chunks, document_id="a", document={"source": "a.pdf", "updated_at": 3.0},
+                  previous=first)
+    assert index.state.documents["a"]["updated_at"] == 2.0
+    assert index.stats()["segments"] == 1
+
+    # A deleted document cannot be updated from its old version, nor created twice
+    index.delete("a")
+    with pytest.raises(StaleDocumentError):
+        other.add(vectors, chunks, document_id="a", document=first, previous={"source": "a.pdf", "updated_at": 2.0})
+    other.add(vectors, chunks, document_id="a", document=first, previous=None)
+    with pytest.raises(StaleDocumentError):
+        index.add(vectors, chunks, document_id="a", document=first, previous=None)
+
+
+def test_loaded_seq_does_not_reload(tmp_path, rng, monkeypatch):
+    monkeypatch.setattr(segments, "REFRESH_INTERVAL", 0.0)
+    index = open_index(tmp_path)
+    other = open_index(tmp_path)
+    vectors, chunks = make_chunks("a", 2, rng)
+    index.add(vectors, chunks)
+    assert index.loaded_seq() == 1
+
+    # Another process wrote: unknown until a refresh loads the write
+    other.add(vectors, chunks)
+    assert index.loaded_seq() is None
+    assert index.seq == 1
+    index.refresh()
+    assert index.loaded_seq() == 2
+
+
+def test_failed_log_append_is_not_published(tmp_path, rng, monkeypatch):
+    index = open_index(tmp_path)
+    vectors_a, chunks_a = make_chunks("a", 2, rng)
+    vectors_b, chunks_b = make_chunks("b", 2, rng)
+    index.add(vectors_a, chunks_a, document_id="a", document={"source": "a.pdf"})
+    wal_size = os.path.getsize(tmp_path / WAL_FILE)
+
+    def fail(fd):
+        raise OSError("disk full")
+    with monkeypatch.context() as patch:
+        patch.setattr(segments.os, "fsync", fail)
+        with pytest.raises(OSError):
+            index.add(vectors_b, chunks_b, document_id="b", document={"source": "b.pdf"})
+        with pytest.raises(OSError):
+            index.delete("a")
+
+    # Neither write is visible here, and the log holds no partial record
+    assert index.seq == 1
+    assert found_documents(index, vectors_b[0]) == {"a"}
+    assert set(index.state.documents) == {"a"}
+    assert os.path.getsize(tmp_path / WAL_FILE) == wal_size
+
+    index.add(vectors_b, chunks_b, document_id="b", document={"source": "b.pdf"})
+    reopened = open_index(tmp_path)
+    assert reopened.seq == 2
+    assert found_documents(reopened, vectors_a[0]) == {"a", "b"}
@@ -0,0 +1,121 @@
+"""Upload handling: streaming to disk, hashing, the size limit and refusals."""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+from app.services import ingest as ingest_module
+from app.services.ingest import UPLOAD_BLOCK_SIZE, IngestService
+from app.services.ingest_jobs import IngestQueueFull
+
+
+class SubmittedJobs:
+    """Stands in for ingest_jobs, recording submissions instead of running them."""
+
+    def __init__(self, full=False):
+        self.full = full
+        self.submitted = []
+        self.pending = 0
+        self.max_pending = 8
+
+    def submit(self, filename, path, ingest, sha256=None, size_bytes=0):
+        if self.full:
+            raise IngestQueueFull("full")
+        self.submitted.append({"filename": filename, "path": path, "sha256": sha256, "size_bytes": size_bytes})
+        return self.submitted[-1]
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def service(loaded_registry):
+    loaded_registry(embedding_model=object())
+    return IngestService(vector_store=None)
+
+
+def process(service, data, filename="handbook.pdf", document_id=None):
+    upload = UploadFile(file=io.BytesIO(data), filename=filename)
+    return asyncio.run(service.process_file(upload, document_id=document_id))
+
+
+def test_upload_is_saved_and_hashed(service, upload_dir, monkeypatch):
+    jobs = SubmittedJobs()
+    monkeypatch.setattr(ingest_module, "ingest_jobs", jobs)
+    data = os.urandom(2 * UPLOAD_BLOCK_SIZE + 123)
+
+    job = process(service, data)
+
+    assert job["filename"] == "handbook.pdf"
+    assert job["sha256"] == hashlib.sha256(data).hexdigest()
+    assert job["size_bytes"] == len(data)
+    with open(job["path"], "rb") as f:
+        assert f.read() == data
+
+
+def test_upload_over_limit_is_refused_with_413(service, upload_dir, monkeypatch):
+    jobs = SubmittedJobs()
+    monkeypatch.setattr(ingest_module, "ingest_jobs", jobs)
+    monkeypatch.setattr(settings, "INGEST_MAX_UPLOAD_BYTES", UPLOAD_BLOCK_SIZE + 1)
+
+    with pytest.raises(HTTPException) as refused:
+        process(service, b"x" * (UPLOAD_BLOCK_SIZE + 2))
+
+    assert refused.value.status_code == 413
+    assert jobs.submitted == []
+    assert os.listdir(upload_dir) == []
+
+
+def test_upload_at_limit_is_accepted(service, upload_dir, monkeypatch):
+    jobs = SubmittedJobs()
+    monkeypatch.setattr(ingest_module, "ingest_jobs", jobs)
+    monkeypatch.setattr(settings, "INGEST_MAX_UPLOAD_BYTES", 1000)
+
+    assert process(service, b"x" * 1000)["size_bytes"] == 1000
+
+
+def test_non_pdf_is_refused(service, upload_dir):
+    with pytest.raises(HTTPException) as refused:
+        process(service, b"text", filename="notes.txt")
+    assert refused.value.status_code == 400
+
+
+def test_full_job_queue_is_refused_with_429(service, upload_dir, monkeypatch):
+    monkeypatch.setattr(ingest_module, "ingest_jobs", SubmittedJobs(full=True))
+
+    with pytest.raises(HTTPException) as refused:
+        process(service, b"%PDF-1.4")
+
+    assert refused.value.status_code == 429
+    assert refused.value.headers["Retry-After"] == "30"
+    assert os.listdir(upload_dir) == []
+
+
+def test_unknown_document_is_refused_with_404_off_the_event_loop(service, upload_dir):
+    class Store:
+        """Records the threads the index is read on."""
+        threads = []
+
+        def get_document(self, document_id):
+            self.threads.append(threading.get_ident())
+            return None
+
+        def document_chunks(self, document_id):
+            return {}
+    service.vector_store = Store()
+
+    with pytest.raises(HTTPException) as refused:
+        process(service, b"%PDF-1.4", document_id="missing")
+
+    assert refused.value.status_code == 404
+    assert Store.threads and threading.get_ident() not in Store.threads
+    assert os.listdir(upload_dir) == []
@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+
+class AnswerCache:
+    """LRU/TTL cache of generated answers with exact and near-duplicate matching.
+
+    Exact hits match on the normalized query. Near-duplicate hits need the same
+    retrieved row IDs and a query vector whose cosine similarity to a cached
+    query is at least `similarity_threshold`. Call `invalidate()` whenever the
+    index is rebuilt so answers never outlive the data they came from; lookups
+    and puts given the `generation` read before retrieval are ignored if an
+    invalidation happened in between. Cache answers bare: a near-duplicate hit
+    is served to a different query, so anything built from the query asked
+    belongs outside the cache.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=3600, similarity_threshold=0.9):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0  # Incremented by every invalidation
+        self._entries = OrderedDict()  # normalized query -> entry dict
+        self._by_chunks = {}  # tuple of row IDs -> set of normalized queries
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a cache configured from ANSWER_CACHE_* environment variables."""
+        return cls(
+            max_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.9")),
+        )
+
+    def get_exact(self, query):
+        """Return the cached answer for the same normalized query, if any."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["answer"]
+
+    def get_similar(self, query_vector, chunk_ids, generation=None):
+        """Return a cached answer for a near-duplicate query with the same retrieved rows.
+
+        `query_vector` is an L2-normalized sparse row vector, e.g. a TF-IDF query.
+        """
+        chunk_key = tuple(chunk_ids)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.misses += 1
+                return None
+            best_key, best_similarity = None, self.similarity_threshold
+            for key in list(self._by_chunks.get(chunk_key, ())):
+                entry = self._live_entry(key)
+                if entry is None:
+                    continue
+                similarity = query_vector.multiply(entry["vector"]).sum()
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.near_hits += 1
+            return self._entries[best_key]["answer"]
+
+    def put(self, query, query_vector, chunk_ids, answer, generation=None):
+        """Cache an answer together with the query vector and retrieved row IDs."""
+        key = normalize_query(query)
+        chunk_key = tuple(chunk_ids)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                # Retrieved from an index that has since been replaced
+                return
+            self._remove(key)
+            self._entries[key] = {
+                "answer": answer,
+                "vector": query_vector,
+                "chunk_ids": chunk_key,
+                "expires_at": time.monotonic() + self.ttl_seconds if self.ttl_seconds else None,
+            }
+            self._by_chunks.setdefault(chunk_key, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self):
+        """Drop every cached answer, e.g. after the index was rebuilt."""
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self):
+        """Return hit/miss counters for sizing the cache."""
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "generation": self.generation,
+            }
+
+    def _live_entry(self, key):
+        """Return the entry for key, removing it if it has expired. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] is not None and entry["expires_at"] <= time.monotonic():
+            self._remove(key)
+            return None
+        return entry
+
+    def _remove(self, key):
+        """Remove an entry and its row-ID reference. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_chunks.get(entry["chunk_ids"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_chunks[entry["chunk_ids"]]
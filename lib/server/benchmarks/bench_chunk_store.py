@@ -0,0 +1,103 @@
+"""Benchmark of the memory-mapped chunk store against unpickling every chunk.
+
+Larger corpora are simulated by repeating the chunks of the dense index,
+each copy with its own text. For each size this times opening the store,
+measures the resident memory the open adds, and times top-5 lookups of
+random rows. The baseline is a pickle of the same (text, metadata) chunks,
+which is what LangChain's index.pkl costs on every load before any query
+is answered.
+
+Run from lib/server:
+
+    python benchmarks/bench_chunk_store.py [rag_backend/faiss_index] [--scales 1,10,100]
+"""
+import argparse
+import gc
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunk_store import ChunkStore, read_langchain_chunks  # noqa: E402
+
+LOOKUPS = 1000
+TOP_K = 5
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def scaled_chunks(chunks, scale):
+    scaled = []
+    for copy in range(scale):
+        for text, metadata in chunks:
+            metadata = dict(metadata)
+            metadata["chunk_id"] = len(scaled)
+            # Distinct strings, so the pickle can't share them between copies
+            scaled.append((f"{text} ({copy})", metadata))
+    return scaled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("index_dir", nargs="?", default="rag_backend/faiss_index")
+    parser.add_argument("--scales", default="1,10,100", help="corpus sizes as multiples of the index")
+    args = parser.parse_args()
+
+    chunks = read_langchain_chunks(args.index_dir)
+    print(f"{'chunks':>8} {'store MB':>9} {'open ms':>9} {'open RSS MB':>12} {'top-5 us':>9} "
+          f"{'pickle MB':>10} {'unpickle ms':>12} {'unpickle RSS MB':>16}")
+
+    for scale in [int(s) for s in args.scales.split(",")]:
+        folder = tempfile.mkdtemp(prefix="chunk_store_")
+        try:
+            scaled = scaled_chunks(chunks, scale)
+            ChunkStore.write(folder, scaled)
+            pickle_path = os.path.join(folder, "chunks.pkl")
+            with open(pickle_path, "wb") as f:
+                pickle.dump(scaled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            count = len(scaled)
+            del scaled
+            gc.collect()
+
+            before = rss_bytes()
+            start = time.perf_counter()
+            store = ChunkStore(folder)
+            open_ms = (time.perf_counter() - start) * 1000
+            open_rss = rss_bytes() - before
+
+            rows = [random.randrange(count) for _ in range(LOOKUPS * TOP_K)]
+            start = time.perf_counter()
+            for i in range(0, len(rows), TOP_K):
+                for row in rows[i:i + TOP_K]:
+                    store.get(row)
+            lookup_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+            store.close()
+            gc.collect()
+
+            before = rss_bytes()
+            start = time.perf_counter()
+            with open(pickle_path, "rb") as f:
+                loaded = pickle.load(f)
+            unpickle_ms = (time.perf_counter() - start) * 1000
+            unpickle_rss = rss_bytes() - before
+            del loaded
+            gc.collect()
+
+            print(f"{count:>8} {os.path.getsize(os.path.join(folder, 'chunks.bin')) / 2**20:>9.1f} {open_ms:>9.2f} "
+                  f"{open_rss / 2**20:>12.1f} {lookup_us:>9.1f} {os.path.getsize(pickle_path) / 2**20:>10.1f} "
+                  f"{unpickle_ms:>12.1f} {unpickle_rss / 2**20:>16.1f}")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Micro-benchmark of the intent router against the legacy intent functions.
+
+Checks that both give the same answers on a query corpus, then times the
+intent work of a single /api/chat request: three special-query checks, one
+location check and one query analysis for the prompt.
+
+Run from lib/server:
+
+    python benchmarks/bench_intent_router.py [queries.txt] [--repeat N]
+
+A corpus file has one query per line; by default a built-in corpus is used.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import legacy_intents  # noqa: E402
+
+DEFAULT_CORPUS = [
+    "Where is the ICT building?",
+    "where's the cafeteria",
+    "How do I get to the LRC?",
+    "CEA building",
+    "Where can I find building 23",
+    "where is bldg 10",
+    "How to find the registrar's office",
+    "Where is the PAT-AVR?",
+    "Is the gym near the sports field?",
+    "I can't find the fab lab",
+    "Where is the campus map?",
+    "Where is the nearest room to study?",
+    "What is the wifi password?",
+    "how do I connect to wifi",
+    "When is enrollment?",
+    "How to enroll for next semester",
+    "What are the library hours?",
+    "Is the library open on Saturday?",
+    "I lost my ID, where do I report it?",
+    "lost and found",
+    "hello",
+    "Good morning",
+    "help",
+    "what can you do",
+    "I'm tired",
+    "stressed out",
+    "I am hungry",
+    "where to eat lunch",
+    "This bot is useless and I'm frustrated",
+    "What is the grading system for academic subjects?",
+    "What are the requirements for admission?",
+    "What is the policy on absences?",
+    "How do I apply for a scholarship?",
+    "What does the handbook say about student organizations?",
+    "What is the code of conduct for students?",
+    "Can I bring a laptop to the computer laboratory?",
+    "What is the USTP vision and mission?",
+    "How much is the tuition fee?",
+    "Who is the dean of CITC?",
+    "What happens if I fail a subject?",
+    "Tell me about the retention policy",
+    "Are students allowed to wear shorts?",
+    "What is the dress code?",
+    "How to file a complaint against a professor",
+    "What services does the guidance office provide?",
+    "Who should I contact about my transcript?",
+    "What are the rules on cheating during exams?",
+    "can I transfer to another course",
+    "What is the maximum number of units per semester?",
+    "Explain the latin honors requirements",
+]
+
+
+def load_corpus(path):
+    if not path:
+        return DEFAULT_CORPUS
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def call(function, query, seed):
+    """Call with a fixed random seed so randomized responses are comparable."""
+    random.seed(seed)
+    try:
+        return function(query)
+    except Exception as e:
+        return f"<{type(e).__name__}: {e}>"
+
+
+def check_parity(corpus):
+    pairs = [
+        ("handle_campus_location_query", legacy_intents.handle_campus_location_query, app.handle_campus_location_query),
+        ("handle_special_queries", legacy_intents.handle_special_queries, app.handle_special_queries),
+        ("detect_sentiment", legacy_intents.detect_sentiment, app.detect_sentiment),
+        ("analyze_query_intent", legacy_intents.analyze_query_intent, app.analyze_query_intent),
+    ]
+    mismatches = 0
+    for seed, query in enumerate(corpus):
+        for name, legacy, current in pairs:
+            expected = call(legacy, query, seed)
+            actual = call(current, query, seed)
+            if isinstance(expected, str) and expected.startswith("<KeyError"):
+                # The legacy "administration" alias pointed at a missing location
+                print(f"legacy error {name}({query!r}): {expected}")
+            elif expected != actual:
+                mismatches += 1
+                print(f"MISMATCH {name}({query!r})")
+                print(f"  legacy: {str(expected)[:100]!r}")
+                print(f"  router: {str(actual)[:100]!r}")
+    return mismatches
+
+
+def legacy_request(query):
+    try:
+        legacy_intents.handle_special_queries(query)
+        legacy_intents.handle_campus_location_query(query)
+        legacy_intents.handle_special_queries(query)
+        legacy_intents.handle_special_queries(query)
+        legacy_intents.analyze_query_intent(query)
+    except KeyError:
+        pass
+
+
+def router_request(query):
+    app.handle_special_queries(query)
+    app.handle_campus_location_query(query)
+    app.handle_special_queries(query)
+    app.handle_special_queries(query)
+    app.analyze_query_intent(query)
+
+
+def router_request_cold(query):
+    app.router.classify.cache_clear()
+    router_request(query)
+
+
+def bench(name, function, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in corpus:
+            function(query)
+    elapsed = time.perf_counter() - start
+    per_request = elapsed / (repeat * len(corpus)) * 1e6
+    print(f"{name:<28} {per_request:9.1f} us/request")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", help="file with one query per line")
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus per measurement")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"{len(corpus)} queries, {args.repeat} passes\n")
+
+    mismatches = check_parity(corpus)
+    print(f"parity: {mismatches} mismatches\n")
+
+    legacy = bench("legacy functions", legacy_request, corpus, args.repeat)
+    cold = bench("router (cold cache)", router_request_cold, corpus, args.repeat)
+    warm = bench("router (memoized)", router_request, corpus, args.repeat)
+    print(f"\nspeedup: {legacy / cold:.1f}x cold, {legacy / warm:.1f}x memoized")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
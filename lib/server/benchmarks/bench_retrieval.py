@@ -0,0 +1,108 @@
+"""Benchmark of inverted-index top-k search against full cosine similarity.
+
+Checks that InvertedIndex.search returns the same rows as the previous
+cosine_similarity + argsort retrieval, then times both as the corpus grows.
+Larger corpora are simulated by appending copies of the handbook matrix
+whose term columns are randomly permuted, i.e. documents with the same
+shape but a different vocabulary, as new handbook editions and campus
+documents would have.
+
+Run from lib/server:
+
+    python benchmarks/bench_retrieval.py [data/handbook.csv] [--scales 1,10,50] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tfidf_index import InvertedIndex, TfidfIndex, file_sha256  # noqa: E402
+from text_normalizer import TextNormalizer  # noqa: E402
+
+TOP_K = 6
+CUTOFF = 0.03
+
+
+def legacy_search(query_vector, matrix):
+    """The retrieval loop before the inverted index: score every row, sort all scores."""
+    similarity_scores = cosine_similarity(query_vector, matrix).flatten()
+    top_indices = similarity_scores.argsort()[-TOP_K:][::-1]
+    if similarity_scores[top_indices[0]] < CUTOFF:
+        return []
+    return [(int(idx), float(similarity_scores[idx])) for idx in top_indices if similarity_scores[idx] > CUTOFF]
+
+
+def scaled_matrix(matrix, scale, rng):
+    """Stack the matrix with scale - 1 copies whose term columns are permuted."""
+    blocks = [matrix]
+    for _ in range(scale - 1):
+        permutation = rng.permutation(matrix.shape[1]).astype(matrix.indices.dtype)
+        block = matrix.copy()
+        block.indices = permutation[block.indices]
+        block.sort_indices()
+        blocks.append(block)
+    return sp.vstack(blocks, format="csr")
+
+
+def same_rows(expected, actual):
+    """Compare rankings, allowing rows with (nearly) tied scores to swap places."""
+    if len(expected) != len(actual):
+        return False
+    for (expected_row, expected_score), (actual_row, actual_score) in zip(expected, actual):
+        if expected_row != actual_row and abs(expected_score - actual_score) > 1e-6:
+            return False
+    return True
+
+
+def timed(function, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query_vector in queries:
+            function(query_vector)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv", nargs="?", default="data/handbook.csv")
+    parser.add_argument("--index-dir", default=os.getenv("TFIDF_INDEX_DIR", "data/tfidf_index"))
+    parser.add_argument("--scales", default="1,10,50", help="corpus sizes as multiples of the handbook")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the queries per measurement")
+    args = parser.parse_args()
+
+    index = TfidfIndex.load(args.index_dir, file_sha256(args.csv))
+    if index is None:
+        print("No index artifact for this CSV; start the server or run tfidf_index.py first")
+        return 1
+
+    normalizer = TextNormalizer()
+    titles = pd.read_csv(args.csv)["Title"].astype(str).tolist()
+    queries = [normalizer.normalize(normalizer.expand_query(title)) for title in titles]
+    query_vectors = [index.vectorizer.transform([query]) for query in queries]
+
+    mismatches = sum(
+        not same_rows(legacy_search(query_vector, index.matrix), index.search(query_vector, TOP_K, CUTOFF))
+        for query_vector in query_vectors
+    )
+    print(f"parity: {mismatches} mismatches over {len(query_vectors)} queries\n")
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>8} {'cosine+argsort':>16} {'inverted index':>16} {'speedup':>8}")
+    for scale in [int(s) for s in args.scales.split(",")]:
+        matrix = scaled_matrix(index.matrix, scale, rng)
+        postings = InvertedIndex.from_matrix(matrix)
+        legacy = timed(lambda q: legacy_search(q, matrix), query_vectors, args.repeat)
+        current = timed(lambda q: postings.search(q, TOP_K, CUTOFF), query_vectors, args.repeat)
+        print(f"{matrix.shape[0]:>8} {legacy:>13.1f} us {current:>13.1f} us {legacy / current:>7.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Benchmark of TextNormalizer against the legacy preprocess_text.
+
+Checks that both produce identical output for every handbook row, every
+title and a set of edge cases, then measures corpus throughput (the whole
+content column, as done when the index is built) and per-query latency
+(abbreviation expansion plus normalization, as done for each chat request).
+
+Run from lib/server:
+
+    python benchmarks/bench_text_normalizer.py [data/handbook.csv] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import legacy_text  # noqa: E402
+from text_normalizer import TextNormalizer  # noqa: E402
+
+EDGE_CASES = [
+    "Where is Building 23?",
+    "bldg. 5 and BLDG 5 and building 5",
+    "Club 3 meets in building 3",
+    "The ICT-AVR is in the CITC building (Bldg 9).",
+    "ArCU, COED & CAS offices",
+    "_ICT_MARKER_ text",
+    "İCT and ıct and CAſ and Key",
+    "ΟΣΑ and CASΣ",
+    "  lots   of\twhitespace\n\nand   punctuation!!! ",
+    "“Quoted” text – with dashes • and bullets’",
+    "",
+    None,
+    42,
+]
+
+QUERIES = [
+    "What is the grading system for academic subjects?",
+    "Where is the ICT building?",
+    "What are the requirements for admission?",
+    "How do I join a student organization at CEA?",
+    "What is the NSTP requirement?",
+    "Where is bldg 23?",
+    "What does the handbook say about the OSA?",
+    "Tell me about the retention policy",
+]
+
+
+def check_parity(normalizer, texts, queries):
+    mismatches = 0
+    batch = normalizer.normalize_many(texts)
+    for text, actual in zip(texts, batch):
+        expected = legacy_text.preprocess_text(text)
+        if expected != actual or normalizer.normalize(text) != expected:
+            mismatches += 1
+            print(f"MISMATCH preprocess_text({str(text)[:60]!r})")
+            print(f"  legacy:     {expected[:80]!r}")
+            print(f"  normalizer: {actual[:80]!r}")
+    for query in queries:
+        if legacy_text.expand_query(query) != normalizer.expand_query(query):
+            mismatches += 1
+            print(f"MISMATCH expand_query({query!r})")
+    return mismatches
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv", nargs="?", default="data/handbook.csv")
+    parser.add_argument("--repeat", type=int, default=20, help="passes per measurement")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.csv)
+    content = data["Content"].astype(str).tolist()
+    titles = data["Title"].astype(str).tolist()
+    normalizer = TextNormalizer()
+
+    mismatches = check_parity(normalizer, content + titles + EDGE_CASES, QUERIES + titles)
+    print(f"parity: {mismatches} mismatches over {len(content) + len(titles) + len(EDGE_CASES)} texts\n")
+
+    legacy = timed(lambda: [legacy_text.preprocess_text(text) for text in content], args.repeat)
+    batched = timed(lambda: normalizer.normalize_many(content), args.repeat)
+    print(f"corpus ({len(content)} rows)")
+    print(f"  legacy preprocess_text   {len(content) / legacy:10.0f} rows/s")
+    print(f"  normalize_many           {len(content) / batched:10.0f} rows/s  ({legacy / batched:.1f}x)\n")
+
+    query_repeat = args.repeat * 50
+    legacy = timed(lambda: [legacy_text.preprocess_text(legacy_text.expand_query(q)) for q in QUERIES], query_repeat)
+    current = timed(lambda: [normalizer.normalize(normalizer.expand_query(q)) for q in QUERIES], query_repeat)
+    print(f"query ({len(QUERIES)} queries)")
+    print(f"  legacy                   {legacy / len(QUERIES) * 1e6:10.1f} us/query")
+    print(f"  normalizer               {current / len(QUERIES) * 1e6:10.1f} us/query  ({legacy / current:.1f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,499 @@
+"""Reference copies of the intent functions that predate intent_router.
+
+Kept verbatim (apart from the imports) so bench_intent_router.py can check the
+router against them and compare timings. Not used by the server.
+"""
+import re
+import random
+
+from app import CAMPUS_LOCATIONS, COMMON_FAQS, USAGE_TIPS, get_time_greeting
+
+
+def detect_sentiment(query):
+    """Detects negative sentiment in user queries and provides supportive responses."""
+    query_lower = query.lower()
+    
+    # Detect frustration or negative emotions
+    negative_terms = ["frustrated", "annoyed", "angry", "upset", "terrible", 
+                      "awful", "worst", "bad experience", "complaint", "stupid", 
+                      "useless", "not helpful", "doesn't work"]
+    
+    if any(term in query_lower for term in negative_terms):
+        return """I understand this might be frustrating. Let me try to help you better.
+
+For immediate assistance with urgent matters, please contact the relevant office directly:
+- Student Affairs: https://www.facebook.com/ustposacdo
+- Guidance Office: https://www.facebook.com/ustpgsucdo
+
+Could you please try rephrasing your question with more specific details?"""
+    
+    return None
+
+
+def analyze_query_context(query):
+    """Deeply analyze query context to understand user intent and entities."""
+    query_lower = query.lower().strip()
+    
+    # Extract potential building names and abbreviations that might not be in our dictionary
+    words = query_lower.split()
+    potential_buildings = []
+    
+    # Look for building numbers
+    bldg_number_pattern = re.compile(r'(building|bldg\.?|b\.?)\s*(\d+)', re.IGNORECASE)
+    matches = bldg_number_pattern.findall(query_lower)
+    for match in matches:
+        potential_buildings.append(f"building {match[1]}")
+    
+    # Look for common building abbreviations (3-4 letter acronyms)
+    abbreviation_pattern = re.compile(r'\b([a-z]{2,4})\b\s*(building|bldg|center|complex)?', re.IGNORECASE)
+    matches = abbreviation_pattern.findall(query_lower)
+    for match in matches:
+        if len(match[0]) >= 2:  # Only consider abbreviations with 2+ characters
+            potential_buildings.append(match[0])
+    
+    # Extract query type (question vs statement)
+    is_question = any(q in query_lower for q in ["where", "how", "when", "what", "which", "?"])
+    
+    # Look for specific building-related context
+    context = {
+        "is_question": is_question,
+        "potential_buildings": potential_buildings,
+        "has_location_terms": any(term in query_lower for term in ["locate", "find", "get to", "direction", "where"]),
+    }
+    
+    return context
+
+
+def handle_campus_location_query(query):
+    """Handle queries about campus locations with detailed directions."""
+    query_lower = query.lower().strip()
+    
+    # Get deeper query context
+    query_context = analyze_query_context(query)
+    
+    # Updated location keywords with the correct abbreviations and college names
+    buildings = {
+        "administration": ["admin", "administration", "admin building", "administration building", "bldg 10", "building 10"],
+        "arts_culture": ["arcu", "arts and culture", "arts building", "bldg 1", "building 1", "arcu building"],
+        "integrated_tech": ["integrated technology", "integrated tech", "bldg 3", "building 3", "technology building"],
+        "rotc": ["rotc", "rotc building", "bldg 4", "building 4"],
+        "ict": ["ict", "ict building", "bldg 9", "building 9", "information technology", "computer", "it building", "citc", "college of information technology and computer studies"],
+        "cafeteria": ["cafeteria", "canteen", "food court", "bldg 20", "building 20", "where to eat", "dining", "lunch"],
+        "lrc": ["lrc", "learning resource center", "library", "bldg 23", "building 23", "resource center"],
+        "science": ["science complex", "science building", "bldg 36", "building 36", "old student center"],
+        "student_center": ["student center", "education complex", "bldg 44", "building 44"],
+        "sports": ["sports complex", "gym", "gymnasium", "bldg 49", "building 49", "sports center"],
+        "dormitory": ["dorm", "dormitory", "residence hall", "bldg 51", "building 51", "where to stay"],
+        "engineering": ["engineering", "engineering complex", "engineering building", "bldg 42", "building 42", "bldg 43", "building 43"],
+        "registrar": ["registrar", "registrar's office", "registration", "transcript", "records"],
+        "map": ["map", "campus map", "directions", "layout", "overview"],
+        # Update college abbreviations
+        "cea": ["cea", "cea building", "college of engineering and architecture", "engineering and architecture"],
+        "citc": ["citc", "citc building", "college of information technology and computer studies", "information technology and computer studies"],
+        "coed": ["coed", "coed building", "college of education", "education building"],
+        "cas": ["cas", "cas building", "college of arts and sciences", "arts and sciences"],
+        "old_engineering": ["old engineering", "old engineering building", "bldg 5", "building 5"],
+        "finance": ["finance", "accounting", "finance and accounting", "bldg 14", "building 14", "shs", "senior high school", "senior high"],
+        "hrm": ["hrm", "hrm building", "bldg 15", "building 15"],
+        "culinary": ["culinary", "culinary building", "bldg 18", "building 18"],
+        "science_centrum": ["science centrum", "centrum", "bldg 19", "building 19"],
+        "foods": ["foods", "foods trade", "foods trade building", "bldg 24", "building 24"],
+        "old_education": ["old education", "old education building", "bldg 35", "building 35"],
+        "technology": ["technology", "technology building", "bldg 47", "building 47", "cot", "college of technology"],
+        "sports_field": ["sports field", "track", "field", "sports track"],
+        "basketball": ["basketball", "basketball court", "court"],
+        "tennis": ["tennis", "tennis court"],
+        "food_innovation": ["food innovation", "food innovation center", "fic", "bldg 25", "building 25", "bldg 26", "building 26"],
+        "fab_lab": ["fab lab", "fabrication laboratory", "fabrication", "bldg 48", "building 48"],
+        "residences": ["residences", "bldg 53", "building 53"],
+        "rer_hall": ["rer", "rer hall", "rer memorial hall", "bldg 16", "building 16"],
+        "guard_house": ["guard house", "guard", "security", "bldg 21", "building 21"],
+        "old_medical": ["old medical", "medical", "old medical building", "bldg 27", "building 27", "clinic", "osa", "office of student affairs", "student affairs"],
+        "old_science": ["old science", "old science building", "bldg 28", "building 28"],
+        "supply": ["supply", "supply office", "bldg 45", "building 45"],
+        "faculty_lrc": ["faculty lrc", "faculty learning resource center", "bldg 50", "building 50"],
+        "sump_pit": ["sump pit", "bldg 52", "building 52"],
+        "fic_extension": ["fic extension", "bldg 54", "building 54"],
+        "toilet": ["toilet", "restroom", "bathroom", "bldg f", "building f"],
+        "sped": ["sped", "sped building", "bldg g", "building g"],
+        "science_complex_41": ["csm", "college of science and mathematics", "bldg 41", "building 41"],
+        "pat_avr": ["pat-avr", "pat avr", "physics avr", "architecture avr", "technology avr", "cea avr", "engineering avr"],
+        "ict_avr": ["ict-avr", "ict avr", "information technology avr", "computer avr", "citc avr"]
+    }
+    
+    # Update CAMPUS_LOCATIONS with the complete information provided by the user
+    # First, update existing entries with any corrections
+    CAMPUS_LOCATIONS["arts_culture"] = "The Arts and Culture Building (ArCU, BLDG 1) is located in the northwestern section of campus near the sports facilities. From the main entrance, take the first right and follow the path past the tennis courts. The building will be on your left. It's in the Auxiliary Services Zone (Gray)."
+    
+    CAMPUS_LOCATIONS["ict"] = "The ICT Building (BLDG 9) is situated in the southwestern quadrant of campus. From the main entrance, proceed straight until you reach the main campus intersection, then turn left. The ICT Building will be on your right after the Administration Building. This building houses the College of Information Technology and Computer Studies (CITC) and is in the Academic Core Zone (Blue)."
+    
+    # Add CITC reference
+    if "citc" not in CAMPUS_LOCATIONS:
+        CAMPUS_LOCATIONS["citc"] = "The College of Information Technology and Computer Studies (CITC) is located in the ICT Building (BLDG 9) in the southwestern quadrant of campus. From the main entrance, proceed straight until you reach the main campus intersection, then turn left. The ICT Building will be on your right after the Administration Building. It's in the Academic Core Zone (Blue)."
+    
+    # Update college references
+    if "cea" in CAMPUS_LOCATIONS:
+        CAMPUS_LOCATIONS["cea"] = "The College of Engineering and Architecture (CEA) is housed in the Engineering Complex (BLDG 42 & 43) in the southeastern area of campus. From the main entrance, head straight, pass the central square, and take the southeastern path to find it on your right."
+    
+    # Add missing buildings that aren't in the CAMPUS_LOCATIONS dictionary
+    new_locations = {
+        "old_engineering": "The Old Engineering Building (BLDG 5) is located beside the ROTC Building in the western section of campus. From the main entrance, proceed straight, take the second left, and it will be directly ahead of you. It's in the Academic Core Zone (Blue).",
+        
+        "sports_field": "The Sports Field and Track are found in the northern section of campus, visible from most areas. From the main entrance, proceed straight, then take the northern path at the central square. It's in the Sports and Recreation Zone (Light Green).",
+        
+        "sump_pit": "The Sump Pit (BLDG 52) is found in the eastern section of campus. From the main entrance, proceed straight, pass the central square, and take the eastern path to find it on your right. It's in the Auxiliary Services Zone (Gray).",
+        
+        "fic_extension": "The FIC Extension (BLDG 54) is located in the eastern area of campus. From the main entrance, follow the main path straight, pass the central square, and take the eastern path to find it on your right. It's in the Auxiliary Services Zone (Gray).",
+        
+        "toilet": "The Toilet facilities (BLDG F) are situated in the northeastern section of campus. From the main entrance, proceed to the central square, then take the northeastern path to find them on your right. They're in the Auxiliary Services Zone (Gray).",
+        
+        "science_complex_41": "The College of Science and Mathematics (CSM) is located in Building 41 in the eastern part of campus. From the main entrance, follow the main road through campus, past the central square, and take the eastern path to find it on your right. It's in the Academic Core Zone (Blue).",
+        
+        "old_medical": "Building 27 houses multiple facilities, including the Clinic on the ground floor and the Office of Student Affairs (OSA) on the second floor. From the main entrance, proceed to the central square and take the eastern path to find it on your left. It's in the Auxiliary Services Zone (Gray)."
+    }
+    
+    # Update CAMPUS_LOCATIONS with new entries
+    for key, value in new_locations.items():
+        if key not in CAMPUS_LOCATIONS:
+            CAMPUS_LOCATIONS[key] = value
+    
+    # ONLY match these explicit location question patterns
+    strict_location_patterns = [
+        "where is", "where are", "where can i find", "how do i get to", 
+        "how to find", "how to get to", "location of", "directions to",
+        "where's the", "where's", "tell me where", "show me where", 
+        "how to reach", "how can i find", "i can't find", "i can not find",
+        "can you tell me where", "need to find", "looking for the location",
+        "i need to locate", "i need to find", "where exactly is", "give me directions to",
+        "need directions to", "i need the location of", "where would i find"
+    ]
+    
+    # More general location-related words, used only in conjunction with building names
+    # and absence of non-location patterns
+    location_related_words = [
+        "located", "situated", "find", "location", "where", "building", 
+        "directions", "map", "address", "place", "area", "room", "floor", 
+        "near", "beside", "next to", "across from"
+    ]
+    
+    # Patterns that strongly suggest the query is NOT about location
+    non_location_patterns = [
+        "report", "contact", "email", "call", "phone", "complain", "file", 
+        "submit", "send", "process", "apply", "requirements", "working hours",
+        "who is", "what does", "when does", "why is", "services", "provide",
+        "function", "job", "role", "responsibility", "office hours", "open",
+        "open hours", "close", "closed", "available", "schedule", "appointment",
+        "document", "form", "payment", "pay", "fee", "cost", "how do i", 
+        "how to", "help me", "assist", "registration", "enroll", "what is the",
+        "how much", "when will", "inquiry", "inquire", "question about",
+        "information about", "who should i", "who do i"
+    ]
+    
+    # First check if the query contains a potential building abbreviation from our analysis
+    for building_abbr in query_context["potential_buildings"]:
+        for key, keywords in buildings.items():
+            if building_abbr.lower() in [k.lower() for k in keywords]:
+                # Check if it's a location question
+                if query_context["is_question"] and query_context["has_location_terms"]:
+                    return CAMPUS_LOCATIONS[key]
+    
+    # First, strictly check if the query contains non-location patterns
+    # These would indicate the query is about something other than finding a location
+    if any(pattern in query_lower for pattern in non_location_patterns):
+        return None
+    
+    # Direct building reference check - improved to catch abbreviations like "CEA building"
+    for key, keywords in buildings.items():
+        for keyword in keywords:
+            if keyword in query_lower:
+                # If we have a strict location pattern, immediately return the location
+                if any(pattern in query_lower for pattern in strict_location_patterns):
+                    return CAMPUS_LOCATIONS[key]
+                
+                # If no explicit question pattern but still has location words, could be implicit
+                if any(word in query_lower for word in location_related_words):
+                    return CAMPUS_LOCATIONS[key]
+    
+    # Check if query exactly matches our strict location question patterns
+    # This is the most reliable way to identify a true location question
+    has_strict_location_pattern = any(pattern in query_lower for pattern in strict_location_patterns)
+    
+    if has_strict_location_pattern:
+        # If we have a strict location pattern, look for building references
+        for key, keywords in buildings.items():
+            for keyword in keywords:
+                # Look for the building name in the query
+                if keyword in query_lower:
+                    return CAMPUS_LOCATIONS[key]
+    
+    # If no strict pattern match, check for building name + location word proximity
+    # This catches less explicit location questions
+    building_mentioned = False
+    building_key = None
+    
+    for key, keywords in buildings.items():
+        for keyword in keywords:
+            # Check if the keyword is mentioned as a complete word
+            if (f" {keyword} " in f" {query_lower} " or 
+                query_lower.startswith(f"{keyword} ") or 
+                query_lower.endswith(f" {keyword}")):
+                building_mentioned = True
+                building_key = key
+                # Check if any location words are in close proximity to the building name
+                query_words = query_lower.split()
+                keyword_words = keyword.split()
+                
+                # Find position of the keyword in the query
+                for i in range(len(query_words) - len(keyword_words) + 1):
+                    if ' '.join(query_words[i:i+len(keyword_words)]) == keyword:
+                        # Check words before and after the keyword for location indicators
+                        window_start = max(0, i - 3)
+                        window_end = min(len(query_words), i + len(keyword_words) + 3)
+                        context_window = ' '.join(query_words[window_start:window_end])
+                        
+                        if any(word in context_window for word in location_related_words):
+                            return CAMPUS_LOCATIONS[key]
+    
+    # If the query is just "CEA building" or similar - handle these direct references
+    query_words = query_lower.split()
+    if len(query_words) <= 3:  # Short queries like "CEA building" or "where's CCS"
+        for key, keywords in buildings.items():
+            for keyword in keywords:
+                if keyword in query_lower:
+                    return CAMPUS_LOCATIONS[key]
+    
+    # General campus map or building question (if no specific building but asking about locations)
+    if has_strict_location_pattern and any(word in query_lower for word in ["building", "bldg", "room", "place", "area", "campus", "map"]):
+        return """The USTP campus is organized into several zones:
+        
+- Academic Core Zone (Blue): Contains most teaching buildings including the LRC (Building 23)
+- Sports and Recreation Zone (Light Green): Located in the northern area with the Sports Complex
+- Research Zone (Teal): Located in the eastern section with the Food Innovation Center
+- Administration Zone (Purple): Located in the central-western area with the Admin Building
+- Residential Zone (Yellow): Located in the northeastern section with the Dormitory
+- Commercial Zone (Red): Located in the southeastern area with the Cafeteria
+
+For specific building directions, please ask about a particular building by name or number (e.g., "Where is the ICT Building?" or "How do I find Building 23?").
+
+For a campus map, visit the Guard House at the main entrance or the Administration Building (BLDG 10)."""
+    
+    # Return None if we can't confidently identify this as a location query
+    return None
+
+
+def handle_special_queries(query):
+    """Handle special queries with guided responses."""
+    query_lower = query.lower().strip()
+    
+    # First pass: Check for WiFi or password specific queries
+    # These are high-priority instant responses
+    if "wifi" in query_lower or "password" in query_lower or "internet" in query_lower:
+        wifi_patterns = ["password", "wifi password", "connect to wifi", "internet access"]
+        if any(pattern in query_lower for pattern in wifi_patterns):
+            return COMMON_FAQS["wifi access"]
+    
+    # Second pass: Check for campus location queries
+    # This should only respond to very clear location questions
+    location_response = handle_campus_location_query(query)
+    if location_response:
+        return location_response
+    
+    # Third pass: Check for sentiment/emotional queries
+    sentiment_response = detect_sentiment(query_lower)
+    if sentiment_response:
+        return sentiment_response
+    
+    # Fourth pass: Check for greetings and help requests
+    if query_lower in ["hello", "hi", "start", "hey", "good morning", "good afternoon", "good evening"]:
+        greeting = get_time_greeting()
+        return f"""# {greeting}Welcome to CampusGuide AI! 👋
+        
+I can help answer questions about:
+- Academic policies and requirements
+- Student services and organizations
+- Campus facilities and resources
+- Student rights and responsibilities
+- Campus building locations and directions
+
+{random.choice(USAGE_TIPS)}
+
+How can I assist you today?"""
+    
+    # Help command
+    if query_lower in ["help", "help me", "i need help", "what can you do"]:
+        return """# How I Can Help You
+        
+I'm CampusGuide AI, your USTP Student Handbook assistant. Here are topics I can provide information about:
+
+1. **Academic Regulations** - Admission, registration, grading system, attendance
+2. **Student Rights** - Rights and responsibilities as outlined in the handbook
+3. **Student Code of Conduct** - Rules and expectations for USTP students
+4. **Student Organizations and Activities** - Information about campus groups
+5. **Student Services** - Available services for students
+6. **USTP Vision, Mission, and Core Values**
+7. **Campus Locations** - How to find buildings and facilities on campus
+
+Try asking specific questions like "What is the grading system?", "Where is the ICT Building?", or "What are the admission requirements?"
+"""
+    
+    # Personal state queries
+    if query_lower in ["i am tired", "tired", "stressed", "stressed out", "i'm tired"]:
+        # Choose a random library to recommend from the available buildings
+        libraries = {
+            "LRC": "The Learning Resource Center (LRC, Building 23) has quiet study spaces and comfortable seating where you can relax and recharge. From the main entrance, follow the main path straight ahead until you reach the second intersection, then turn right. The LRC will be on your left in the Academic Core Zone (Blue).",
+            "COT": "The College of Technology (COT, Building 47) library provides a peaceful environment away from the busy areas of campus. Located in the northeastern section, it has comfortable seating and good lighting. From the main entrance, follow the main path to the central square, then take the northeastern path to find it on your left.",
+            "CEA": "The College of Engineering and Architecture (CEA) library in the Engineering Complex (Buildings 42 & 43) offers a calming atmosphere with study carrels and lounge areas. Located in the southeastern area, it's a great place to take a break and recharge. From the main entrance, head straight, pass the central square, and take the southeastern path to find it on your right.",
+            "CSM": "The College of Science and Mathematics (CSM) library in Building 41 provides a serene environment with natural lighting and comfortable seating. Located in the eastern part of campus, it's perfect for relaxing while surrounded by books. From the main entrance, follow the main road through campus, past the central square, and take the eastern path to find it on your right."
+        }
+        
+        # Select a random library
+        library_key = random.choice(list(libraries.keys()))
+        library_info = libraries[library_key]
+        
+        return f"""# Need a Break? Visit the {library_key} Library
+
+I understand student life can be demanding. When you're feeling tired, sometimes a change of environment can help:
+
+{library_info}
+
+This quiet space is perfect for:
+- Taking a short break from a busy schedule
+- Finding a comfortable spot to relax and recharge
+- Reading in a peaceful environment
+- Having a quiet moment to yourself
+
+If you're feeling overwhelmed beyond needing a short break, consider speaking with the Guidance and Counseling Services: https://www.facebook.com/ustpgsucdo
+"""
+    
+    # Handle hungry queries
+    elif any(word in query_lower for word in ["hungry", "food", "eat", "i am hungry", "starving", "need to eat", "want food"]):
+        cafeteria_info = CAMPUS_LOCATIONS["cafeteria"]
+        return f"""# Hungry? Head to the Cafeteria!
+
+{cafeteria_info}
+
+The cafeteria (Building 20) offers a variety of food options to satisfy your hunger:
+- Full meals
+- Snacks and quick bites
+- Beverages and refreshments
+- Affordable student-friendly prices
+
+There are also several food stalls around campus that offer different food options.
+
+Typical cafeteria hours are from 7:00 AM to 7:00 PM on weekdays, but some food stalls may have different operating hours.
+"""
+    
+    # Fifth pass: Check for specific FAQ patterns with enhanced pattern matching
+    # WiFi related queries - Enhanced pattern matching
+    if any(word in query_lower for word in ["wifi", "password", "internet", "connection", "network"]):
+        # Check for common WiFi question patterns
+        wifi_patterns = [
+            "what is the wifi", "what's the wifi", "wifi password", "password for wifi", 
+            "connect to wifi", "internet password", "ustp wifi", "campus wifi",
+            "wifi access", "access the wifi", "where can i find the wifi",
+            "how do i get wifi", "how to connect", "how to access"
+        ]
+        if any(pattern in query_lower for pattern in wifi_patterns) or ("wifi" in query_lower and any(word in query_lower for word in ["what", "how", "where", "tell", "know", "get"])):
+            return COMMON_FAQS["wifi access"]
+    
+    # Enrollment related queries - Enhanced pattern matching
+    if any(word in query_lower for word in ["enrollment", "enroll", "register", "registration", "admit", "admission"]):
+        # Check for common enrollment question patterns
+        enrollment_patterns = [
+            "when is enrollment", "enrollment period", "enrollment date", "enrollment schedule",
+            "when can i enroll", "when does enrollment", "enrollment start", "start of enrollment",
+            "how to enroll", "process of enrollment", "enrollment process", "where to enroll",
+            "when is registration", "registration date", "registration period", "when can i register",
+            "when is the start of classes", "when do classes begin", "school start"
+        ]
+        if any(pattern in query_lower for pattern in enrollment_patterns) or (any(word in query_lower for word in ["enrollment", "enroll", "register", "registration"]) and any(word in query_lower for word in ["when", "how", "where", "date", "schedule", "time", "start"])):
+            return COMMON_FAQS["when is enrollment"]
+    
+    # Library hours queries - Enhanced pattern matching
+    if "library" in query_lower:
+        # Check for common library hours question patterns
+        library_patterns = [
+            "library hours", "library schedule", "library timing", "when is the library",
+            "when does the library", "library open", "library close", "library time",
+            "what time is the library", "what are the library hours", "library operation",
+            "when can i go to the library", "is the library open", "library availability",
+            "the hours of the library", "tell me about library hours"
+        ]
+        if any(pattern in query_lower for pattern in library_patterns) or ("library" in query_lower and any(word in query_lower for word in ["when", "hour", "time", "open", "close", "schedule", "available"])):
+            return COMMON_FAQS["library hours"]
+    
+    # Lost and found queries - Enhanced pattern matching
+    if any(word in query_lower for word in ["lost", "found", "missing", "misplaced", "dropped"]):
+        # Check for common lost and found question patterns
+        lost_patterns = [
+            "lost and found", "lost something", "found something", "if i lost", "where to go if i lost",
+            "what if i found", "how to find lost", "where to report lost", "where to claim found",
+            "where to go for lost", "i lost my", "found a", "missing item", "misplaced my",
+            "someone lost", "where to find lost", "how to recover lost"
+        ]
+        if any(pattern in query_lower for pattern in lost_patterns) or (any(word in query_lower for word in ["lost", "found", "missing"]) and any(word in query_lower for word in ["where", "how", "what", "report", "item", "object", "belonging"])):
+            return COMMON_FAQS["lost and found"]
+    
+    # Add more exceptions for question keywords that might lead to misunderstanding
+    if "example" in query_lower or "like" in query_lower or "such as" in query_lower:
+        # Treat as a regular query, not a special one
+        pass
+    
+    # Final pass: Check for any exact matches in our FAQ dictionary
+    for key, response in COMMON_FAQS.items():
+        if key in query_lower:
+            return response
+    
+    # Return None if not a special query - will fall back to RAG
+    return None
+
+
+def analyze_query_intent(query):
+    """Analyzes the query to determine its type and focus areas."""
+    query_lower = query.lower().strip()
+    
+    # Determine query type
+    query_type = "general"
+    
+    # Check for location queries
+    location_indicators = ["where", "location", "find", "building", "office", "campus", "room", "area"]
+    if any(indicator in query_lower for indicator in location_indicators):
+        query_type = "location"
+    
+    # Check for procedure queries
+    procedure_indicators = ["how to", "how do i", "steps", "process", "procedure", "apply", "register", "submit", "enroll"]
+    if any(indicator in query_lower for indicator in procedure_indicators):
+        query_type = "procedure"
+    
+    # Check for policy queries
+    policy_indicators = ["policy", "rule", "regulation", "allow", "permit", "prohibited", "requirement", "code of conduct"]
+    if any(indicator in query_lower for indicator in policy_indicators):
+        query_type = "policy"
+    
+    # Determine focus areas
+    focus_areas = []
+    
+    # Academic focus
+    academic_indicators = ["class", "course", "grade", "academic", "subject", "degree", "thesis", "study", "faculty", "professor", "instructor", "exam", "test"]
+    if any(indicator in query_lower for indicator in academic_indicators):
+        focus_areas.append("academic")
+    
+    # Administrative focus
+    administrative_indicators = ["form", "office", "document", "deadline", "submission", "request", "administration", "requirement", "application", "enroll", "register", "payment", "fee"]
+    if any(indicator in query_lower for indicator in administrative_indicators):
+        focus_areas.append("administrative")
+    
+    # Student life focus
+    student_life_indicators = ["organization", "club", "activity", "event", "dormitory", "housing", "dorm", "residence", "cafeteria", "food", "service", "scholarship", "financial", "stipend"]
+    if any(indicator in query_lower for indicator in student_life_indicators):
+        focus_areas.append("student_life")
+    
+    # Facilities focus
+    facilities_indicators = ["library", "gym", "laboratory", "lab", "computer", "internet", "wifi", "facility", "room", "building", "sports", "equipment"]
+    if any(indicator in query_lower for indicator in facilities_indicators):
+        focus_areas.append("facilities")
+    
+    return {
+        "query_type": query_type,
+        "focus_areas": focus_areas
+    }
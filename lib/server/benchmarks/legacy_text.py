@@ -0,0 +1,91 @@
+"""Reference copy of the text preprocessing that predates text_normalizer.
+
+Kept verbatim (apart from the wrapper around the abbreviation expansion) so
+bench_text_normalizer.py can check the normalizer against it and compare
+timings. Not used by the server.
+"""
+import re
+
+
+def preprocess_text(text):
+    """Clean and normalize text while preserving important context."""
+    if not isinstance(text, str):
+        return ""
+    
+    # Updated preserved terms with the correct abbreviations
+    preserved_terms = {
+        "ICT": "_ICT_MARKER_",
+        "CITC": "_CITC_MARKER_",
+        "LRC": "_LRC_MARKER_",
+        "ROTC": "_ROTC_MARKER_",
+        "NSTP": "_NSTP_MARKER_",
+        "CEA": "_CEA_MARKER_",
+        "ArCU": "_ARCU_MARKER_",
+        "COED": "_COED_MARKER_", 
+        "CAS": "_CAS_MARKER_",
+        "USTP": "_USTP_MARKER_",
+        "FIC": "_FIC_MARKER_",
+        "SPED": "_SPED_MARKER_",
+        "CSM": "_CSM_MARKER_",
+        "COT": "_COT_MARKER_",
+        "SHS": "_SHS_MARKER_",
+        "OSA": "_OSA_MARKER_"
+    }
+    
+    # Preserve building numbers
+    bldg_pattern = re.compile(r'(building|bldg\.?|b\.?)\s*(\d+)', re.IGNORECASE)
+    matches = bldg_pattern.findall(text)
+    building_markers = {}
+    
+    for match in matches:
+        building_num = match[1]
+        marker = f"_BUILDING_{building_num}_MARKER_"
+        building_markers[f"{match[0]} {building_num}"] = marker
+    
+    # Apply all markers to preserve important terms
+    processed_text = text
+    for term, marker in {**preserved_terms, **building_markers}.items():
+        # Case-insensitive replacement but preserve the original casing
+        pattern = re.compile(re.escape(term), re.IGNORECASE)
+        processed_text = pattern.sub(marker, processed_text)
+    
+    # Convert to lowercase and remove special chars with some exceptions
+    processed_text = re.sub(r'[^\w\s\-]', ' ', processed_text.lower())
+    
+    # Remove extra whitespace
+    processed_text = re.sub(r'\s+', ' ', processed_text).strip()
+    
+    # Restore the preserved terms
+    for term, marker in {**preserved_terms, **building_markers}.items():
+        processed_text = processed_text.replace(marker.lower(), term.lower())
+    
+    return processed_text
+
+
+def expand_query(query):
+    """Abbreviation expansion from the query path of retrieve_context."""
+    expanded_query = query
+    abbr_expansions = {
+        "ict": "information and communications technology ict",
+        "citc": "college of information technology and computer studies citc",
+        "lrc": "learning resource center lrc library",
+        "rotc": "reserve officers training corps rotc",
+        "nstp": "national service training program nstp",
+        "cea": "college of engineering and architecture cea",
+        "arcu": "arts and culture building arcu",
+        "coed": "college of education coed",
+        "cas": "college of arts and sciences cas",
+        "fic": "food innovation center fic",
+        "csm": "college of science and mathematics csm",
+        "cot": "college of technology cot",
+        "shs": "senior high school shs",
+        "osa": "office of student affairs osa"
+    }
+
+    # Check if query contains any abbreviations
+    query_lower = query.lower()
+    for abbr, expansion in abbr_expansions.items():
+        if abbr in query_lower:
+            expanded_query = f"{query} {expansion}"
+            break
+    return expanded_query
@@ -0,0 +1,278 @@
+"""Compact, memory-mapped store of FAISS chunk texts and metadata, keyed by FAISS row.
+
+Replaces LangChain's pickled docstore (index.pkl), which has to be unpickled
+in full on every load and grows with every upload. A chunks.bin file holds:
+
+    magic, header length, JSON header (padded to 8 bytes)
+    one column per metadata key, in the narrowest integer type that fits:
+        "int"      integer values, the type's minimum marking a missing value
+        "interned" codes into the key's table of distinct values in the header,
+                   for keys like source or page label that repeat across chunks
+        "json"     n + 1 int64 offsets and one JSON value per row, for keys
+                   that are mostly unique; an empty value is a missing one
+    n + 1 int64 text offsets, then the UTF-8 texts
+
+Opening the store maps the file and decodes only the small header, so load
+time and resident memory do not grow with the corpus. A lookup decodes one
+text and the metadata of one row, and recently decoded rows are kept in an
+LRU cache.
+
+Run from lib/server to convert an existing LangChain index in place:
+
+    python chunk_store.py [rag_backend/faiss_index]
+"""
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+CHUNKS_FILE = "chunks.bin"
+MAGIC = b"CGCHUNK1"
+PREFIX = struct.Struct("<8sQ")
+
+INT_TYPES = ("<i1", "<i2", "<i4", "<i8")
+
+
+def _aligned(position):
+    return (position + 7) // 8 * 8
+
+
+def _int_type(low, high):
+    """Narrowest integer type holding low..high, keeping its minimum free as the missing marker."""
+    for dtype in INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min < low and high <= info.max:
+            return dtype
+    raise ValueError(f"Integer metadata out of range: {low}..{high}")
+
+
+class ChunkStore:
+    """Read-only chunk store for one FAISS index directory."""
+
+    def __init__(self, folder_path, cache_size=256):
+        self.path = os.path.join(folder_path, CHUNKS_FILE)
+        with open(self.path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_length = PREFIX.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a chunk store file")
+        header = json.loads(self._buffer[PREFIX.size:PREFIX.size + header_length])
+
+        self.count = header["count"]
+        self._columns = []
+        for column in header["columns"]:
+            if column["kind"] == "json":
+                data = np.frombuffer(self._buffer, dtype="<i8", count=self.count + 1, offset=column["offset"])
+                extra = column["offset"] + data.nbytes
+            else:
+                data = np.frombuffer(self._buffer, dtype=column["dtype"], count=self.count, offset=column["offset"])
+                extra = column.get("values", np.iinfo(column["dtype"]).min)
+            self._columns.append((column["key"], column["kind"], data, extra))
+        self._offsets = np.frombuffer(self._buffer, dtype="<i8", count=self.count + 1, offset=header["text_offsets"])
+        self._text_start = header["text_offsets"] + self._offsets.nbytes
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def get(self, row):
+        """Return (text, metadata) of a FAISS row."""
+        with self._lock:
+            cached = self._cache.get(row)
+            if cached is not None:
+                self._cache.move_to_end(row)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        if not 0 <= row < self.count:
+            raise IndexError(f"Row {row} out of range for {self.count} chunks")
+        start = self._text_start + int(self._offsets[row])
+        end = self._text_start + int(self._offsets[row + 1])
+        text = self._buffer[start:end].decode("utf-8")
+
+        metadata = {}
+        for key, kind, data, extra in self._columns:
+            if kind == "json":
+                value_start = extra + int(data[row])
+                value_end = extra + int(data[row + 1])
+                if value_end > value_start:
+                    metadata[key] = json.loads(self._buffer[value_start:value_end])
+                continue
+            value = int(data[row])
+            if kind == "int":
+                if value != extra:
+                    metadata[key] = value
+            elif value >= 0:
+                metadata[key] = extra[value]
+
+        entry = (text, metadata)
+        with self._lock:
+            self._cache[row] = entry
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+    def stats(self):
+        return {
+            "chunks": self.count,
+            "file_bytes": len(self._buffer),
+            "columns": [key for key, _, _, _ in self._columns],
+            "cache_size": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+        }
+
+    def close(self):
+        self._columns = []
+        self._offsets = None
+        self._cache.clear()
+        self._buffer.close()
+
+    @staticmethod
+    def exists(folder_path):
+        return os.path.exists(os.path.join(folder_path, CHUNKS_FILE))
+
+    @staticmethod
+    def write(folder_path, chunks):
+        """Write the (text, metadata) chunks of an index, in FAISS row order.
+
+        The file is written under a temporary name and renamed into place, so
+        readers that have the previous file mapped are not affected.
+        """
+        texts = []
+        metadatas = []
+        for text, metadata in chunks:
+            texts.append(text.encode("utf-8"))
+            metadatas.append(metadata or {})
+        count = len(texts)
+
+        keys = list(dict.fromkeys(key for metadata in metadatas for key in metadata))
+        columns = []
+        for key in keys:
+            present = [(row, metadata[key]) for row, metadata in enumerate(metadatas) if key in metadata]
+            if all(isinstance(value, int) and not isinstance(value, bool) for _, value in present):
+                values = [value for _, value in present]
+                dtype = _int_type(min(values), max(values))
+                data = np.full(count, np.iinfo(dtype).min, dtype=dtype)
+                for row, value in present:
+                    data[row] = value
+                columns.append(({"key": key, "kind": "int", "dtype": dtype}, data.tobytes()))
+                continue
+
+            # JSON round-trips the values as close to the originals as the pickle did
+            encoded = [(row, json.dumps(value, ensure_ascii=False, sort_keys=True, default=str))
+                       for row, value in present]
+            distinct = list(dict.fromkeys(value for _, value in encoded))
+            if len(distinct) * 2 <= len(encoded):
+                codes = {value: code for code, value in enumerate(distinct)}
+                dtype = _int_type(-1, len(distinct))
+                data = np.full(count, -1, dtype=dtype)
+                for row, value in encoded:
+                    data[row] = codes[value]
+                values = [json.loads(value) for value in distinct]
+                columns.append(({"key": key, "kind": "interned", "dtype": dtype, "values": values}, data.tobytes()))
+            else:
+                blobs = [b""] * count
+                for row, value in encoded:
+                    blobs[row] = value.encode("utf-8")
+                value_offsets = np.zeros(count + 1, dtype="<i8")
+                np.cumsum([len(blob) for blob in blobs], out=value_offsets[1:])
+                columns.append(({"key": key, "kind": "json"}, value_offsets.tobytes() + b"".join(blobs)))
+
+        offsets = np.zeros(count + 1, dtype="<i8")
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+
+        # The header holds the byte offsets of the arrays that follow it, so
+        # lay them out for increasing header sizes until the offsets fit
+        header_space = 0
+        while True:
+            position = _aligned(PREFIX.size + header_space)
+            for column, data in columns:
+                column["offset"] = position
+                position = _aligned(position + len(data))
+            header = {"count": count, "columns": [column for column, _ in columns], "text_offsets": position}
+            encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            if len(encoded) <= header_space:
+                break
+            header_space = len(encoded) + 64
+
+        path = os.path.join(folder_path, CHUNKS_FILE)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(PREFIX.pack(MAGIC, len(encoded)))
+            f.write(encoded.ljust(header_space, b" "))
+            for column, data in columns:
+                f.seek(column["offset"])
+                f.write(data)
+            f.seek(header["text_offsets"])
+            f.write(offsets.tobytes())
+            for text in texts:
+                f.write(text)
+        os.replace(tmp_path, path)
+        return path
+
+
+class _Restored:
+    """Stand-in for the LangChain classes in index.pkl; keeps their pickled state."""
+
+    def __setstate__(self, state):
+        self.state = state
+
+
+class _LangChainUnpickler(pickle.Unpickler):
+    """Unpickler that only builds LangChain's docstore and Document classes, as stand-ins."""
+
+    ALLOWED = {"InMemoryDocstore", "Document"}
+
+    def find_class(self, module, name):
+        if module.split(".")[0] in ("langchain", "langchain_community", "langchain_core") and name in self.ALLOWED:
+            return _Restored
+        raise pickle.UnpicklingError(f"Unexpected class {module}.{name} in LangChain index")
+
+
+def read_langchain_chunks(folder_path):
+    """Return the (text, metadata) chunks of a LangChain FAISS index.pkl, in FAISS row order.
+
+    Does not import LangChain and cannot run code from the pickle.
+    """
+    with open(os.path.join(folder_path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = _LangChainUnpickler(f).load()
+
+    documents = docstore.state["_dict"]
+    chunks = []
+    for row in range(len(index_to_docstore_id)):
+        state = documents[index_to_docstore_id[row]].state
+        fields = state.get("__dict__", state)
+        chunks.append((fields["page_content"], fields.get("metadata") or {}))
+    return chunks
+
+
+def convert_langchain_index(folder_path):
+    """Write chunks.bin for a LangChain FAISS index directory and return its path."""
+    return ChunkStore.write(folder_path, read_langchain_chunks(folder_path))
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else "rag_backend/faiss_index"
+    start_time = time.time()
+    path = convert_langchain_index(folder)
+    print(f"Wrote {path} in {time.time() - start_time:.2f} seconds")
+
+    start_time = time.time()
+    store = ChunkStore(folder)
+    print(f"Opened {len(store)} chunks in {(time.time() - start_time) * 1000:.2f} ms, "
+          f"{os.path.getsize(path)} bytes vs {os.path.getsize(os.path.join(folder, 'index.pkl'))} pickled")
@@ -0,0 +1,74 @@
+"""Production serving for the Flask server: N worker processes sharing one index.
+
+Run from lib/server:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app), so the TF-IDF index,
+the row records and the intent tables are built before the workers fork.
+The index arrays are memory-mapped from the artifact, so workers share them
+through the page cache. The Python objects are shared copy-on-write, and
+garbage collection is kept off them as the `gc` module documentation
+recommends: collection is disabled while the master loads the app, everything
+loaded is frozen just before each fork, and collection is re-enabled in the
+worker. A worker's memory is then mostly its own requests, and total memory
+grows much more slowly than the worker count.
+
+Each worker serves SERVER_THREADS requests at once, enough that a slow
+Ollama answer or a long SSE stream doesn't hold up the rest. Keep it at or
+below OLLAMA_POOL_SIZE. Workers are replaced gracefully after about
+SERVER_MAX_REQUESTS requests, which bounds slow leaks. The replacement is
+forked from the master's loaded state, so it starts up quickly.
+
+The answer cache and retrieval stats are per worker. Each worker watches
+handbook.csv and reloads on its own; after the first worker saves the new
+index artifact, the others usually just load it.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("SERVER_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("SERVER_WORKERS", str(min(multiprocessing.cpu_count(), 8))))
+worker_class = "gthread"
+threads = int(os.getenv("SERVER_THREADS", "8"))
+
+# Recycle workers after a bounded number of requests, staggered so they don't all restart at once
+max_requests = int(os.getenv("SERVER_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+# Streams and Ollama calls can take a while; a worker gets this long to finish them on shutdown
+timeout = int(os.getenv("SERVER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+preload_app = True
+
+# Collect nothing while the master loads the app, so the loaded objects stay packed
+gc.disable()
+
+
+def when_ready(server):
+    # Free whatever loading left behind once, before the first worker forks
+    gc.collect()
+
+
+def pre_fork(server, worker):
+    # Move everything the master has loaded out of the collector's reach, so
+    # collections in the worker never write to (and un-share) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    # Threads don't survive the fork; start the worker's own watcher and prober
+    import app as server_app
+    server_app.start_background_threads()
+
+
+def worker_exit(server, worker):
+    import app as server_app
+    server_app.ollama.close()
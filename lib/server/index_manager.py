@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+
+from tfidf_index import file_sha256
+
+
+class IndexManager:
+    """Owns the active TF-IDF index and replaces it without blocking requests.
+
+    `load(csv_path, csv_sha256)` returns a new TfidfIndex, or None on failure.
+    Reloads build the new index off the request path and publish it with a
+    single reference assignment. A request that already holds the previous
+    index finishes on it, and new requests see the new one. The CSV is polled
+    every `poll_interval` seconds (0 disables the watcher). A change is
+    reloaded once the file has stopped changing for one interval.
+    """
+
+    def __init__(self, csv_path, load, on_swap=None, poll_interval=5.0):
+        self.csv_path = csv_path
+        self.poll_interval = poll_interval
+        self._load = load
+        self._on_swap = on_swap
+
+        self._index = None
+        self.version = 0  # Incremented on every swap
+        self.loaded_at = None
+        self.last_rebuild_seconds = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+        self._reload_lock = threading.Lock()  # One load at a time
+        self._lock = threading.Lock()
+        self._reload_thread = None
+        self._watch_pid = None
+
+    @classmethod
+    def from_env(cls, csv_path, load, on_swap=None):
+        """Create a manager configured from HANDBOOK_* environment variables."""
+        return cls(
+            csv_path,
+            load,
+            on_swap=on_swap,
+            poll_interval=float(os.getenv("HANDBOOK_RELOAD_INTERVAL", "5")),
+        )
+
+    @property
+    def current(self):
+        """The active TfidfIndex, or None before the first successful load.
+
+        Read it once per request and use that object throughout.
+        """
+        self.start_watching()
+        return self._index
+
+    @property
+    def ready(self):
+        return self._index is not None
+
+    def reload(self, force=False):
+        """Load the index for the CSV's current content and swap it in.
+
+        Does nothing if the CSV content is unchanged, unless `force` is set.
+        Returns True if an index is active afterwards.
+        """
+        with self._reload_lock:
+            start_time = time.time()
+            try:
+                if not os.path.exists(self.csv_path):
+                    raise FileNotFoundError(f"CSV file not found at: {self.csv_path}")
+
+                csv_sha256 = file_sha256(self.csv_path)
+                if not force and self._index is not None and self._index.csv_sha256 == csv_sha256:
+                    return True
+
+                index = self._load(self.csv_path, csv_sha256)
+                if index is None:
+                    raise ValueError(f"could not build an index from {self.csv_path}")
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                print(f"ERROR: index reload failed: {e}")
+                return self._index is not None
+
+            with self._lock:
+                self._index = index
+                self.version += 1
+                self.loaded_at = time.time()
+                self.last_rebuild_seconds = self.loaded_at - start_time
+                self.reloads += 1
+                self.last_error = None
+
+            if self._on_swap is not None:
+                self._on_swap()
+
+            print(f"Index version {self.version} active ({csv_sha256[:12]}, {self.last_rebuild_seconds:.3f} seconds)")
+            return True
+
+    def reload_async(self, force=False):
+        """Start a reload on a background thread unless one is running.
+
+        Returns True if a reload was started.
+        """
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(
+                target=self.reload, kwargs={"force": force}, name="index-reload", daemon=True
+            )
+            self._reload_thread.start()
+            return True
+
+    def start_watching(self):
+        """Start the CSV watcher, once per process.
+
+        Threads don't survive a fork, so a worker process that inherited this
+        manager from its parent starts its own watcher.
+        """
+        if self.poll_interval <= 0 or self._watch_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._watch_pid == os.getpid():
+                return
+            self._watch_pid = os.getpid()
+            self._reload_thread = None
+            thread = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+            thread.start()
+
+    def _watch(self):
+        last_seen = self._stat()
+        while True:
+            time.sleep(self.poll_interval)
+            seen = self._stat()
+            if seen == last_seen:
+                continue
+
+            # Wait until the file stops changing so a partial write isn't loaded
+            time.sleep(self.poll_interval)
+            if self._stat() != seen:
+                continue
+
+            last_seen = seen
+            self.reload()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.csv_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def stats(self):
+        """Return the active index version and reload timings."""
+        with self._lock:
+            index = self._index
+            return {
+                "ready": index is not None,
+                "version": self.version,
+                "csv_sha256": index.csv_sha256 if index is not None else None,
+                "rows": index.matrix.shape[0] if index is not None else 0,
+                "features": index.matrix.shape[1] if index is not None else 0,
+                "loaded_at": self.loaded_at,
+                "last_rebuild_seconds": self.last_rebuild_seconds,
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "reloading": self._reload_thread is not None and self._reload_thread.is_alive(),
+                "poll_interval": self.poll_interval,
+            }
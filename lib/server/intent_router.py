@@ -0,0 +1,369 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+
+# Building aliases, in the order they are tried. Keys are CAMPUS_LOCATIONS keys.
+BUILDING_ALIASES = (
+    ("admin", ("admin", "administration", "admin building", "administration building", "bldg 10", "building 10")),
+    ("arts_culture", ("arcu", "arts and culture", "arts building", "bldg 1", "building 1", "arcu building")),
+    ("integrated_tech", ("integrated technology", "integrated tech", "bldg 3", "building 3", "technology building")),
+    ("rotc", ("rotc", "rotc building", "bldg 4", "building 4")),
+    ("ict", ("ict", "ict building", "bldg 9", "building 9", "information technology", "computer", "it building", "citc", "college of information technology and computer studies")),
+    ("cafeteria", ("cafeteria", "canteen", "food court", "bldg 20", "building 20", "where to eat", "dining", "lunch")),
+    ("lrc", ("lrc", "learning resource center", "library", "bldg 23", "building 23", "resource center")),
+    ("science", ("science complex", "science building", "bldg 36", "building 36", "old student center")),
+    ("student_center", ("student center", "education complex", "bldg 44", "building 44")),
+    ("sports", ("sports complex", "gym", "gymnasium", "bldg 49", "building 49", "sports center")),
+    ("dormitory", ("dorm", "dormitory", "residence hall", "bldg 51", "building 51", "where to stay")),
+    ("engineering", ("engineering", "engineering complex", "engineering building", "bldg 42", "building 42", "bldg 43", "building 43")),
+    ("registrar", ("registrar", "registrar's office", "registration", "transcript", "records")),
+    ("map", ("map", "campus map", "directions", "layout", "overview")),
+    ("cea", ("cea", "cea building", "college of engineering and architecture", "engineering and architecture")),
+    ("citc", ("citc", "citc building", "college of information technology and computer studies", "information technology and computer studies")),
+    ("coed", ("coed", "coed building", "college of education", "education building")),
+    ("cas", ("cas", "cas building", "college of arts and sciences", "arts and sciences")),
+    ("old_engineering", ("old engineering", "old engineering building", "bldg 5", "building 5")),
+    ("finance", ("finance", "accounting", "finance and accounting", "bldg 14", "building 14", "shs", "senior high school", "senior high")),
+    ("hrm", ("hrm", "hrm building", "bldg 15", "building 15")),
+    ("culinary", ("culinary", "culinary building", "bldg 18", "building 18")),
+    ("science_centrum", ("science centrum", "centrum", "bldg 19", "building 19")),
+    ("foods", ("foods", "foods trade", "foods trade building", "bldg 24", "building 24")),
+    ("old_education", ("old education", "old education building", "bldg 35", "building 35")),
+    ("technology", ("technology", "technology building", "bldg 47", "building 47", "cot", "college of technology")),
+    ("sports_field", ("sports field", "track", "field", "sports track")),
+    ("basketball", ("basketball", "basketball court", "court")),
+    ("tennis", ("tennis", "tennis court")),
+    ("food_innovation", ("food innovation", "food innovation center", "fic", "bldg 25", "building 25", "bldg 26", "building 26")),
+    ("fab_lab", ("fab lab", "fabrication laboratory", "fabrication", "bldg 48", "building 48")),
+    ("residences", ("residences", "bldg 53", "building 53")),
+    ("rer_hall", ("rer", "rer hall", "rer memorial hall", "bldg 16", "building 16")),
+    ("guard_house", ("guard house", "guard", "security", "bldg 21", "building 21")),
+    ("old_medical", ("old medical", "medical", "old medical building", "bldg 27", "building 27", "clinic", "osa", "office of student affairs", "student affairs")),
+    ("old_science", ("old science", "old science building", "bldg 28", "building 28")),
+    ("supply", ("supply", "supply office", "bldg 45", "building 45")),
+    ("faculty_lrc", ("faculty lrc", "faculty learning resource center", "bldg 50", "building 50")),
+    ("sump_pit", ("sump pit", "bldg 52", "building 52")),
+    ("fic_extension", ("fic extension", "bldg 54", "building 54")),
+    ("toilet", ("toilet", "restroom", "bathroom", "bldg f", "building f")),
+    ("sped", ("sped", "sped building", "bldg g", "building g")),
+    ("science_complex_41", ("csm", "college of science and mathematics", "bldg 41", "building 41")),
+    ("pat_avr", ("pat-avr", "pat avr", "physics avr", "architecture avr", "technology avr", "cea avr", "engineering avr")),
+    ("ict_avr", ("ict-avr", "ict avr", "information technology avr", "computer avr", "citc avr")),
+)
+
+# Location key for the general campus zones overview
+CAMPUS_ZONES = "campus_zones"
+
+# Explicit location question patterns
+STRICT_LOCATION_PATTERNS = (
+    "where is", "where are", "where can i find", "how do i get to",
+    "how to find", "how to get to", "location of", "directions to",
+    "where's the", "where's", "tell me where", "show me where",
+    "how to reach", "how can i find", "i can't find", "i can not find",
+    "can you tell me where", "need to find", "looking for the location",
+    "i need to locate", "i need to find", "where exactly is", "give me directions to",
+    "need directions to", "i need the location of", "where would i find",
+)
+
+# More general location-related words, used only in conjunction with building names
+LOCATION_RELATED_WORDS = (
+    "located", "situated", "find", "location", "where", "building",
+    "directions", "map", "address", "place", "area", "room", "floor",
+    "near", "beside", "next to", "across from",
+)
+
+# Patterns that strongly suggest the query is NOT about location
+NON_LOCATION_PATTERNS = (
+    "report", "contact", "email", "call", "phone", "complain", "file",
+    "submit", "send", "process", "apply", "requirements", "working hours",
+    "who is", "what does", "when does", "why is", "services", "provide",
+    "function", "job", "role", "responsibility", "office hours", "open",
+    "open hours", "close", "closed", "available", "schedule", "appointment",
+    "document", "form", "payment", "pay", "fee", "cost", "how do i",
+    "how to", "help me", "assist", "registration", "enroll", "what is the",
+    "how much", "when will", "inquiry", "inquire", "question about",
+    "information about", "who should i", "who do i",
+)
+
+# Words that turn a strict location question into a general campus question
+CAMPUS_OVERVIEW_WORDS = ("building", "bldg", "room", "place", "area", "campus", "map")
+
+QUESTION_TERMS = ("where", "how", "when", "what", "which", "?")
+LOCATION_TERMS = ("locate", "find", "get to", "direction", "where")
+
+NEGATIVE_TERMS = (
+    "frustrated", "annoyed", "angry", "upset", "terrible",
+    "awful", "worst", "bad experience", "complaint", "stupid",
+    "useless", "not helpful", "doesn't work",
+)
+
+# Whole-query matches
+GREETINGS = frozenset(["hello", "hi", "start", "hey", "good morning", "good afternoon", "good evening"])
+HELP_REQUESTS = frozenset(["help", "help me", "i need help", "what can you do"])
+TIRED_QUERIES = frozenset(["i am tired", "tired", "stressed", "stressed out", "i'm tired"])
+
+HUNGRY_WORDS = ("hungry", "food", "eat", "i am hungry", "starving", "need to eat", "want food")
+
+# High-priority WiFi check, run before anything else
+WIFI_TRIGGERS = ("wifi", "password", "internet")
+WIFI_PRIORITY_PATTERNS = ("password", "wifi password", "connect to wifi", "internet access")
+
+# FAQ rules: (FAQ key, trigger words, question patterns, subject words, question words).
+# A rule matches when a trigger word is present and either a question pattern is,
+# or a subject word together with a question word.
+FAQ_RULES = (
+    ("wifi access",
+     ("wifi", "password", "internet", "connection", "network"),
+     ("what is the wifi", "what's the wifi", "wifi password", "password for wifi",
+      "connect to wifi", "internet password", "ustp wifi", "campus wifi",
+      "wifi access", "access the wifi", "where can i find the wifi",
+      "how do i get wifi", "how to connect", "how to access"),
+     ("wifi",),
+     ("what", "how", "where", "tell", "know", "get")),
+    ("when is enrollment",
+     ("enrollment", "enroll", "register", "registration", "admit", "admission"),
+     ("when is enrollment", "enrollment period", "enrollment date", "enrollment schedule",
+      "when can i enroll", "when does enrollment", "enrollment start", "start of enrollment",
+      "how to enroll", "process of enrollment", "enrollment process", "where to enroll",
+      "when is registration", "registration date", "registration period", "when can i register",
+      "when is the start of classes", "when do classes begin", "school start"),
+     ("enrollment", "enroll", "register", "registration"),
+     ("when", "how", "where", "date", "schedule", "time", "start")),
+    ("library hours",
+     ("library",),
+     ("library hours", "library schedule", "library timing", "when is the library",
+      "when does the library", "library open", "library close", "library time",
+      "what time is the library", "what are the library hours", "library operation",
+      "when can i go to the library", "is the library open", "library availability",
+      "the hours of the library", "tell me about library hours"),
+     ("library",),
+     ("when", "hour", "time", "open", "close", "schedule", "available")),
+    ("lost and found",
+     ("lost", "found", "missing", "misplaced", "dropped"),
+     ("lost and found", "lost something", "found something", "if i lost", "where to go if i lost",
+      "what if i found", "how to find lost", "where to report lost", "where to claim found",
+      "where to go for lost", "i lost my", "found a", "missing item", "misplaced my",
+      "someone lost", "where to find lost", "how to recover lost"),
+     ("lost", "found", "missing"),
+     ("where", "how", "what", "report", "item", "object", "belonging")),
+)
+
+# Query types in increasing priority; the last matching type wins
+QUERY_TYPE_INDICATORS = (
+    ("location", ("where", "location", "find", "building", "office", "campus", "room", "area")),
+    ("procedure", ("how to", "how do i", "steps", "process", "procedure", "apply", "register", "submit", "enroll")),
+    ("policy", ("policy", "rule", "regulation", "allow", "permit", "prohibited", "requirement", "code of conduct")),
+)
+
+FOCUS_AREA_INDICATORS = (
+    ("academic", ("class", "course", "grade", "academic", "subject", "degree", "thesis", "study", "faculty", "professor", "instructor", "exam", "test")),
+    ("administrative", ("form", "office", "document", "deadline", "submission", "request", "administration", "requirement", "application", "enroll", "register", "payment", "fee")),
+    ("student_life", ("organization", "club", "activity", "event", "dormitory", "housing", "dorm", "residence", "cafeteria", "food", "service", "scholarship", "financial", "stipend")),
+    ("facilities", ("library", "gym", "laboratory", "lab", "computer", "internet", "wifi", "facility", "room", "building", "sports", "equipment")),
+)
+
+BUILDING_NUMBER_PATTERN = re.compile(r'(building|bldg\.?|b\.?)\s*(\d+)', re.IGNORECASE)
+ABBREVIATION_PATTERN = re.compile(r'\b([a-z]{2,4})\b\s*(building|bldg|center|complex)?', re.IGNORECASE)
+
+
+# Classification of a query. `location` is a CAMPUS_LOCATIONS key (or CAMPUS_ZONES),
+# `special` is a (kind, key) tuple naming the guided response, or None for RAG.
+QueryIntent = namedtuple("QueryIntent", ["location", "special", "negative_sentiment", "query_type", "focus_areas"])
+
+
+def _trie_pattern(phrases):
+    """Build a regex matching the longest of `phrases` at a position.
+
+    Phrases are arranged as a character trie so the regex engine dispatches on
+    each character instead of trying every alternative in turn.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Greedy optional: prefer the longer phrase, fall back to this one
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    return build(trie)
+
+
+class PhraseMatcher:
+    """Finds every phrase of a fixed vocabulary that occurs in a text, in one scan.
+
+    Equivalent to `{p for p in phrases if p in text}`, but the text is scanned
+    once with a single compiled regex. At each position the regex yields the
+    longest phrase starting there; every shorter phrase starting at the same
+    position is a prefix of it, so it is found through a precomputed prefix table.
+    """
+
+    def __init__(self, phrases):
+        phrases = frozenset(phrases)
+        self._regex = re.compile("(?=(" + _trie_pattern(phrases) + "))")
+        self._prefixes = {
+            phrase: frozenset(p for p in phrases if phrase.startswith(p))
+            for phrase in phrases
+        }
+
+    def find_all(self, text):
+        found = set()
+        for match in self._regex.finditer(text):
+            phrase = match.group(1)
+            if phrase:
+                found |= self._prefixes[phrase]
+        return found
+
+
+class IntentRouter:
+    """Classifies queries into location, FAQ, sentiment and guided-response intents.
+
+    All alias and keyword tables are compiled into one PhraseMatcher when the
+    router is built, so a query is scanned once and every rule becomes a set
+    lookup. Classifications are memoized per query string, which lets the
+    several handlers a request passes through share one result. The router
+    holds no mutable state besides that cache, so it is safe to share between
+    threads.
+    """
+
+    def __init__(self, faq_keys, cache_size=4096):
+        self.faq_keys = tuple(faq_keys)
+
+        # First building key per alias, and all (alias, key) pairs in lookup order
+        self._alias_order = []
+        self._alias_keys = {}
+        for key, aliases in BUILDING_ALIASES:
+            for alias in aliases:
+                self._alias_order.append((alias, key))
+                self._alias_keys.setdefault(alias, key)
+        self._alias_rank = {}
+        for rank, (alias, _) in enumerate(self._alias_order):
+            self._alias_rank.setdefault(alias, rank)
+
+        phrases = set(self._alias_keys)
+        phrases.update(STRICT_LOCATION_PATTERNS, LOCATION_RELATED_WORDS, NON_LOCATION_PATTERNS,
+                       CAMPUS_OVERVIEW_WORDS, QUESTION_TERMS, LOCATION_TERMS, NEGATIVE_TERMS,
+                       HUNGRY_WORDS, WIFI_TRIGGERS, WIFI_PRIORITY_PATTERNS, self.faq_keys)
+        for _, triggers, patterns, subjects, question_words in FAQ_RULES:
+            phrases.update(triggers, patterns, subjects, question_words)
+        for _, indicators in QUERY_TYPE_INDICATORS + FOCUS_AREA_INDICATORS:
+            phrases.update(indicators)
+        self._matcher = PhraseMatcher(phrases)
+
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, query):
+        query_lower = query.lower().strip()
+        found = self._matcher.find_all(query_lower)
+
+        location = self._classify_location(query_lower, found)
+        negative_sentiment = not found.isdisjoint(NEGATIVE_TERMS)
+        return QueryIntent(
+            location=location,
+            special=self._classify_special(query_lower, found, location, negative_sentiment),
+            negative_sentiment=negative_sentiment,
+            query_type=self._classify_query_type(found),
+            focus_areas=tuple(area for area, indicators in FOCUS_AREA_INDICATORS
+                              if not found.isdisjoint(indicators)),
+        )
+
+    def _classify_location(self, query_lower, found):
+        """Return the location key a query asks about, or None."""
+        is_question = not found.isdisjoint(QUESTION_TERMS)
+        has_location_terms = not found.isdisjoint(LOCATION_TERMS)
+
+        # A building number or abbreviation that is itself an alias
+        if is_question and has_location_terms:
+            potential_buildings = [f"building {number}" for _, number in BUILDING_NUMBER_PATTERN.findall(query_lower)]
+            potential_buildings += [abbr for abbr, _ in ABBREVIATION_PATTERN.findall(query_lower)]
+            for building_abbr in potential_buildings:
+                if building_abbr in self._alias_keys:
+                    return self._alias_keys[building_abbr]
+
+        if not found.isdisjoint(NON_LOCATION_PATTERNS):
+            return None
+
+        mentioned = sorted((self._alias_rank[alias] for alias in found if alias in self._alias_rank))
+        has_strict_location_pattern = not found.isdisjoint(STRICT_LOCATION_PATTERNS)
+
+        if mentioned:
+            first_key = self._alias_order[mentioned[0]][1]
+            if has_strict_location_pattern or not found.isdisjoint(LOCATION_RELATED_WORDS):
+                return first_key
+
+            # Location words close to a whole-word building mention
+            query_words = query_lower.split()
+            padded = f" {query_lower} "
+            for rank in mentioned:
+                alias, key = self._alias_order[rank]
+                if f" {alias} " not in padded and not query_lower.startswith(f"{alias} ") and not query_lower.endswith(f" {alias}"):
+                    continue
+                alias_words = alias.split()
+                for i in range(len(query_words) - len(alias_words) + 1):
+                    if ' '.join(query_words[i:i+len(alias_words)]) == alias:
+                        window_start = max(0, i - 3)
+                        window_end = min(len(query_words), i + len(alias_words) + 3)
+                        context_window = ' '.join(query_words[window_start:window_end])
+                        if any(word in context_window for word in LOCATION_RELATED_WORDS):
+                            return key
+
+            # Short direct references like "CEA building"
+            if len(query_words) <= 3:
+                return first_key
+
+        if has_strict_location_pattern and not found.isdisjoint(CAMPUS_OVERVIEW_WORDS):
+            return CAMPUS_ZONES
+
+        return None
+
+    def _classify_special(self, query_lower, found, location, negative_sentiment):
+        """Return the (kind, key) of the guided response for a query, or None."""
+        if not found.isdisjoint(WIFI_TRIGGERS) and not found.isdisjoint(WIFI_PRIORITY_PATTERNS):
+            return ("faq", "wifi access")
+
+        if location:
+            return ("location", location)
+
+        if negative_sentiment:
+            return ("sentiment", None)
+
+        if query_lower in GREETINGS:
+            return ("greeting", None)
+        if query_lower in HELP_REQUESTS:
+            return ("help", None)
+        if query_lower in TIRED_QUERIES:
+            return ("tired", None)
+        if not found.isdisjoint(HUNGRY_WORDS):
+            return ("hungry", None)
+
+        for faq_key, triggers, patterns, subjects, question_words in FAQ_RULES:
+            if found.isdisjoint(triggers):
+                continue
+            if not found.isdisjoint(patterns) or (not found.isdisjoint(subjects) and not found.isdisjoint(question_words)):
+                return ("faq", faq_key)
+
+        for faq_key in self.faq_keys:
+            if faq_key in found:
+                return ("faq", faq_key)
+
+        return None
+
+    def _classify_query_type(self, found):
+        query_type = "general"
+        for candidate, indicators in QUERY_TYPE_INDICATORS:
+            if not found.isdisjoint(indicators):
+                query_type = candidate
+        return query_type
+
+    def cache_info(self):
+        """Return the classification cache statistics."""
+        return self.classify.cache_info()
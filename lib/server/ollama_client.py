@@ -0,0 +1,193 @@
+import os
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OllamaClient:
+    """Persistent Ollama client with a keep-alive connection pool.
+
+    Model availability is probed on a background thread every `probe_interval`
+    seconds and cached, so the request path only reads a flag instead of
+    calling /api/tags before every answer.
+    """
+
+    def __init__(self, base_url="http://localhost:11434", model="mistral", pool_size=10,
+                 connect_timeout=3.0, read_timeout=30.0, probe_interval=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.probe_interval = probe_interval
+
+        self._available = False
+        self._last_probe = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pid = None
+        self._session = None
+        self._probe_thread = None
+
+    @classmethod
+    def from_env(cls):
+        """Create a client configured from OLLAMA_* environment variables."""
+        return cls(
+            base_url=os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+            model=os.getenv("OLLAMA_MODEL", "mistral"),
+            pool_size=int(os.getenv("OLLAMA_POOL_SIZE", "10")),
+            connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3")),
+            read_timeout=float(os.getenv("OLLAMA_TIMEOUT", "30")),
+            probe_interval=float(os.getenv("OLLAMA_PROBE_INTERVAL", "30")),
+        )
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def start(self):
+        """Create the pool and start the probe thread in this process now rather than on first use."""
+        self._ensure_started()
+
+    @property
+    def session(self):
+        """Pooled session for the current process."""
+        self._ensure_started()
+        return self._session
+
+    def _ensure_started(self):
+        """Create the session and probe thread, once per process.
+
+        Sockets and threads don't survive a fork, so a worker process that
+        inherited this client from its parent gets its own pool and prober.
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+
+            # Probe once synchronously so the first request sees a real answer
+            self.probe()
+
+            self._probe_thread = threading.Thread(target=self._probe_loop, name="ollama-probe", daemon=True)
+            self._probe_thread.start()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            self.probe()
+
+    def probe(self):
+        """Check if Ollama is running and the configured model is available."""
+        available = False
+        try:
+            # Check Ollama API connection
+            response = self._session.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            if response.status_code != 200:
+                print("Warning: Ollama server is not accessible")
+            else:
+                # Check if the model is available
+                models = response.json().get("models", [])
+                available = any(model.get("name", "").startswith(self.model) for model in models)
+                if not available:
+                    print(f"Warning: {self.model} model not found in Ollama. Pull it with `ollama pull {self.model}`")
+        except Exception as e:
+            print(f"Error checking Ollama: {e}")
+
+        if available != self._available:
+            print(f"Ollama availability changed: {'available' if available else 'unavailable'}")
+        self._available = available
+        self._last_probe = time.time()
+        return available
+
+    def is_available(self):
+        """Return the cached availability flag from the last probe."""
+        self._ensure_started()
+        return self._available
+
+    def generate(self, prompt):
+        """Generate a complete response for the prompt, or None on failure."""
+        try:
+            payload = {
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False
+            }
+
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout)
+
+            if response.status_code == 200:
+                return response.json().get("response", "")
+            else:
+                print(f"Error from Ollama API: {response.status_code}")
+                return None
+        except requests.ConnectionError as e:
+            # Don't wait for the next probe to stop sending requests to a dead server
+            self._available = False
+            print(f"Error querying Ollama: {e}")
+            return None
+        except Exception as e:
+            print(f"Error querying Ollama: {e}")
+            return None
+
+    def generate_stream(self, prompt):
+        """Generate a response for the prompt, yielding text as it is produced."""
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True
+        }
+
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload, stream=True, timeout=self.timeout)
+        except requests.ConnectionError:
+            self._available = False
+            raise
+
+        # Ollama streams one JSON object per line until "done" is true.
+        # Closing the response returns the connection to the pool.
+        with response:
+            if response.status_code != 200:
+                print(f"Error from Ollama API: {response.status_code}")
+                return
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    print(f"Error from Ollama API: {chunk['error']}")
+                    return
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    return
+
+    def stats(self):
+        """Return the client configuration and last probe result."""
+        return {
+            "model": self.model,
+            "available": self._available,
+            "last_probe": self._last_probe,
+            "probe_interval": self.probe_interval,
+            "pool_size": self.pool_size,
+        }
+
+    def close(self):
+        """Stop the probe thread and close pooled connections."""
+        self._stop.set()
+        if self._session is not None:
+            self._session.close()
+        self._pid = None
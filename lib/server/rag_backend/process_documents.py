@@ -1,72 +1,98 @@
 import os
 import re
+import sys
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import faiss
+import numpy as np
+from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
+from langchain.schema import Document
 
-# Define the embedding model
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# chunk_store.py lives in lib/server, next to the server that reads the index
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chunk_store import ChunkStore
+
+# Page extraction processes, pages per extraction task, chunks per embedding call
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", "4"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
 
 def preprocess_text(text):
     # Clean and structure text
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def process_documents():
-    # Create data directory if it doesn't exist
-    os.makedirs("data", exist_ok=True)
-    
-    pdf_path = "data/USTP Student Handbook 2023 Edition.pdf"
-    
-    # Check if the PDF exists
-    if not os.path.exists(pdf_path):
-        print(f"ERROR: {pdf_path} not found. Please make sure it exists.")
+class StageTimes:
+    """Items and busy seconds of each stage, reported as items per second."""
+
+    def __init__(self, *stages):
+        self.items = dict.fromkeys(stages, 0)
+        self.seconds = dict.fromkeys(stages, 0.0)
+
+    def record(self, stage, items, seconds):
+        self.items[stage] += items
+        self.seconds[stage] += seconds
+
+    def report(self, units):
+        for stage, unit in units.items():
+            seconds = self.seconds[stage]
+            rate = self.items[stage] / seconds if seconds > 0 else 0.0
+            print(f"  {stage}: {self.items[stage]} {unit} in {seconds:.1f}s ({rate:.1f} {unit}/s)")
+
+def extract_pages(pdf_path, first, last):
+    # Runs in a worker process: each worker parses its own copy of the PDF,
+    # extracting text the same way PyPDFLoader does; returns the pages and the time taken
+    start = time.perf_counter()
+    reader = PdfReader(pdf_path)
+    pages = [(number, reader.pages[number].extract_text()) for number in range(first, last)]
+    return pages, time.perf_counter() - start
+
+def extracted_pages(pdf_path, num_pages, times):
+    """Yield (page number, text) in page order, extracted a few pages per task by worker processes.
+
+    At most two tasks per worker are in flight, so the workers stay ahead of
+    the splitting and embedding done by the caller without extracting the
+    whole document up front. Extraction time is summed over the workers.
+    """
+    def taken(pages, seconds):
+        times.record("extract", len(pages), seconds)
+        return pages
+
+    ranges = [(first, min(num_pages, first + PAGES_PER_TASK)) for first in range(0, num_pages, PAGES_PER_TASK)]
+    if PARSE_WORKERS == 1:
+        for first, last in ranges:
+            yield from taken(*extract_pages(pdf_path, first, last))
         return
-    
-    # Load the PDF
-    print(f"Loading PDF from {pdf_path}")
-    loader = PyPDFLoader(pdf_path)
-    pages = loader.load()
-    
-    # Print the first few pages to debug content
-    print(f"Loaded {len(pages)} pages from PDF")
-    if len(pages) > 0:
-        print(f"First page preview: {pages[0].page_content[:200]}...")
-    
-    # Pre-process text to improve content
-    processed_pages = []
-    for page in pages:
-        # Remove extra whitespace and clean page content
-        cleaned_text = preprocess_text(page.page_content)
-        
-        # Skip pages with minimal content (headers, footers, blank pages)
-        if len(cleaned_text) > 100:
-            page.page_content = cleaned_text
-            processed_pages.append(page)
-    
-    print(f"Processed {len(processed_pages)} content-rich pages")
-    
-    # Create smaller chunks with more overlap for better context
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,  # Smaller chunks for more precise retrieval
-        chunk_overlap=100,  # Good overlap to maintain context
-        separators=["\n\n", "\n", ". ", "? ", "! ", " ", ""],
-        length_function=len
+
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        for first, last in ranges:
+            in_flight.append(pool.submit(extract_pages, pdf_path, first, last))
+            if len(in_flight) >= 2 * PARSE_WORKERS:
+                yield from taken(*in_flight.popleft().result())
+        while in_flight:
+            yield from taken(*in_flight.popleft().result())
+
+def split_page(text_splitter, pdf_path, number, cleaned_text, chunk_id):
+    """Split one cleaned page into quality chunks; returns them and the next chunk_id."""
+    documents = text_splitter.split_documents(
+        [Document(page_content=cleaned_text, metadata={"source": pdf_path, "page": number})]
     )
-    
-    documents = text_splitter.split_documents(processed_pages)
-    
-    # Add metadata and improve chunk quality
     quality_documents = []
-    for i, doc in enumerate(documents):
+    for doc in documents:
+        i = chunk_id
+        chunk_id += 1
         # Skip very short chunks (likely headers or footers)
         if len(doc.page_content) < 50:
             continue
-            
+
         doc.metadata["source"] = "USTP Student Handbook"
         doc.metadata["chunk_id"] = i
-        
+
         # Try to extract section headings
         lines = doc.page_content.split('\n')
         for line in lines[:3]:  # Check first few lines for headings
@@ -74,18 +100,99 @@ def process_documents():
             if heading_match:
                 doc.metadata["section"] = line.strip()
                 break
-        
+
         quality_documents.append(doc)
-    
+    return quality_documents, chunk_id
+
+def build_index(pdf_path, text_splitter, embeddings):
+    """Extract, clean, split and embed the PDF, adding batches to an exact L2 index as they fill.
+
+    Worker processes extract the next pages while this process splits and
+    embeds the previous ones. Prints the throughput of each stage.
+    """
+    num_pages = len(PdfReader(pdf_path).pages)
+    print(f"Processing {num_pages} pages with {PARSE_WORKERS} extraction worker(s)")
+    index = None
+    chunks = []
+    batch = []
+    chunk_id = 0
+    content_pages = 0
+    times = StageTimes("extract", "split", "embed")
+
+    def embed(batch):
+        nonlocal index
+        start = time.perf_counter()
+        # Same vectors as FAISS.from_documents
+        vectors = np.asarray(embeddings.embed_documents([d.page_content for d in batch]), dtype=np.float32)
+        times.record("embed", len(batch), time.perf_counter() - start)
+        if index is None:
+            index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        chunks.extend(batch)
+        print(f"Embedded {len(chunks)} chunks")
+
+    for number, text in extracted_pages(pdf_path, num_pages, times):
+        start = time.perf_counter()
+        # Skip pages with minimal content (headers, footers, blank pages)
+        cleaned_text = preprocess_text(text)
+        if len(cleaned_text) > 100:
+            content_pages += 1
+            page_chunks, chunk_id = split_page(text_splitter, pdf_path, number, cleaned_text, chunk_id)
+            batch.extend(page_chunks)
+        times.record("split", 1, time.perf_counter() - start)
+        if len(batch) >= EMBED_BATCH_SIZE:
+            embed(batch)
+            batch = []
+    if batch:
+        embed(batch)
+
+    print(f"Processed {content_pages} content-rich pages")
+    times.report({"extract": "pages", "split": "pages", "embed": "chunks"})
+    return index, chunks
+
+def process_documents():
+    # Create data directory if it doesn't exist
+    os.makedirs("data", exist_ok=True)
+
+    pdf_path = "data/USTP Student Handbook 2023 Edition.pdf"
+
+    # Check if the PDF exists
+    if not os.path.exists(pdf_path):
+        print(f"ERROR: {pdf_path} not found. Please make sure it exists.")
+        return
+
+    # Define the embedding model; loaded here rather than at import so the
+    # extraction workers, which import this module, don't each load it
+    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+
+    # Create smaller chunks with more overlap for better context
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=500,  # Smaller chunks for more precise retrieval
+        chunk_overlap=100,  # Good overlap to maintain context
+        separators=["\n\n", "\n", ". ", "? ", "! ", " ", ""],
+        length_function=len
+    )
+
+    start = time.time()
+    index, quality_documents = build_index(pdf_path, text_splitter, embeddings)
+
     # Print chunk stats
-    print(f"Created {len(quality_documents)} quality chunks from {len(pages)} pages")
+    print(f"Created {len(quality_documents)} quality chunks in {time.time() - start:.1f}s")
     if len(quality_documents) > 0:
         print(f"Sample chunk: {quality_documents[0].page_content[:150]}...")
-    
-    # Create and save the vector database
-    db = FAISS.from_documents(quality_documents, embeddings)
-    db.save_local("faiss_index")
+    else:
+        print("ERROR: no content extracted from the PDF")
+        return
+
+    # Save the vector database: the FAISS index, plus the chunk texts and
+    # metadata in FAISS row order as a memory-mapped chunk store instead of
+    # LangChain's pickled docstore
+    os.makedirs("faiss_index", exist_ok=True)
+    faiss.write_index(index, os.path.join("faiss_index", "index.faiss"))
+    ChunkStore.write("faiss_index", [(doc.page_content, doc.metadata) for doc in quality_documents])
+    if os.path.exists(os.path.join("faiss_index", "index.pkl")):
+        os.remove(os.path.join("faiss_index", "index.pkl"))
     print(f"Vector database saved to 'faiss_index' folder")
 
 if __name__ == "__main__":
-    process_documents()
\ No newline at end of file
+    process_documents()
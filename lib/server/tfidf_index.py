@@ -0,0 +1,321 @@
+"""On-disk TF-IDF index artifact for the handbook CSV.
+
+The fitted vocabulary, IDF weights, the float32 CSR matrix, its inverted
+index postings and each row's content and citation fields are written to a
+directory named after the SHA-256 of the CSV, so startup only needs to hash
+the CSV and memory-map the arrays. The index is
+rebuilt only when the CSV content changes.
+
+Build ahead of time (e.g. during deployment) from lib/server:
+
+    python tfidf_index.py
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+ARTIFACT_VERSION = 3
+
+# TfidfVectorizer settings; part of the artifact so a change forces a rebuild
+VECTORIZER_PARAMS = {
+    "min_df": 1,
+    "max_df": 0.9,
+    "ngram_range": (1, 2),
+    "stop_words": "english",
+}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Return the hex SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(artifact_dir):
+    """Return an artifact's manifest, or None if it is missing or from another version or vectorizer."""
+    manifest_path = os.path.join(artifact_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    expected = {**VECTORIZER_PARAMS, "ngram_range": list(VECTORIZER_PARAMS["ngram_range"])}
+    if manifest.get("version") != ARTIFACT_VERSION or manifest.get("vectorizer") != expected:
+        return None
+    return manifest
+
+
+class HandbookRow:
+    """Content and metadata of one handbook row, with its citation pre-rendered."""
+
+    __slots__ = ("content", "title", "chapter", "article", "section", "page", "citation")
+
+    def __init__(self, content, title=None, chapter=None, article=None, section=None, page=None, citation=None):
+        self.content = content
+        self.title = title
+        self.chapter = chapter
+        self.article = article
+        self.section = section
+        self.page = page
+        self.citation = citation  # "Chapter ..., Article ..., Section ..." or None
+
+
+def _present(value):
+    """CSV values are stored as str(value); missing cells read as "nan"."""
+    return value if value and value != "nan" else None
+
+
+def build_row_records(columns, rows, content_column):
+    """Precompute a HandbookRow per CSV row from the column values."""
+    title_column = next((col for col in columns if 'title' in col.lower()), None)
+    page_column = next((col for col in columns if 'page' in col.lower()), None)
+
+    records = []
+    for i, content in enumerate(rows[content_column]):
+        section = ""
+        article = ""
+        chapter = ""
+
+        # Section falls back to the title; the first matching column wins
+        for col in columns:
+            if 'section' in col.lower() and not section:
+                section = rows[col][i]
+            elif 'article' in col.lower() and not article:
+                article = rows[col][i]
+            elif 'chapter' in col.lower() and not chapter:
+                chapter = rows[col][i]
+            elif 'title' in col.lower() and not section:
+                section = rows[col][i]
+
+        citation = None
+        if chapter or article or section:
+            section_text = ""
+            if _present(chapter):
+                section_text += f"Chapter {chapter}"
+            if _present(article):
+                section_text += f", Article {article}"
+            if _present(section):
+                section_text += f", Section {section}"
+            citation = section_text.strip(", ") or None
+
+        records.append(HandbookRow(
+            content=content,
+            title=_present(rows[title_column][i]) if title_column else None,
+            chapter=_present(chapter),
+            article=_present(article),
+            section=_present(section),
+            page=_present(rows[page_column][i]) if page_column else None,
+            citation=citation,
+        ))
+    return records
+
+
+class InvertedIndex:
+    """Term -> rows postings over a TF-IDF matrix for top-k cosine search.
+
+    Posting weights are divided by their row's L2 norm up front, so a row's
+    cosine similarity to an L2-normalized query is the sum of its posting
+    weights times the query weights. Only rows sharing a term with the query
+    are scored, so latency depends on the query's posting lists rather than
+    the number of rows.
+
+    The arrays are saved with the artifact and may be memory-mapped.
+    """
+
+    # Artifact file for each array
+    FILES = {
+        "indptr": "postings_indptr.npy",
+        "rows": "postings_rows.npy",
+        "weights": "postings_weights.npy",
+        "max_weights": "postings_max_weights.npy",
+    }
+
+    def __init__(self, num_rows, indptr, rows, weights, max_weights):
+        self.num_rows = num_rows
+        self.indptr = indptr  # Term -> start of its postings in rows and weights
+        self.rows = rows
+        self.weights = weights
+        self.max_weights = max_weights  # Largest weight per term, an upper bound on its contribution
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """Build the postings of a TF-IDF matrix."""
+        matrix = sp.csr_matrix(matrix)
+        row_norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float64).ravel())
+        row_norms[row_norms == 0] = 1.0
+
+        postings = matrix.tocsc()
+        postings.sort_indices()
+        weights = (postings.data / row_norms[postings.indices]).astype(np.float32)
+
+        max_weights = np.zeros(matrix.shape[1], dtype=np.float32)
+        nonempty = np.flatnonzero(np.diff(postings.indptr))
+        if len(nonempty):
+            max_weights[nonempty] = np.maximum.reduceat(weights, postings.indptr[nonempty])
+        return cls(matrix.shape[0], postings.indptr, postings.indices, weights, max_weights)
+
+    def save(self, directory):
+        """Write the postings arrays to directory."""
+        for name, filename in self.FILES.items():
+            np.save(os.path.join(directory, filename), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, num_rows, mmap_mode=None):
+        """Load postings written by save."""
+        arrays = {name: np.load(os.path.join(directory, filename), mmap_mode=mmap_mode)
+                  for name, filename in cls.FILES.items()}
+        return cls(num_rows, **arrays)
+
+    def search(self, query_vector, top_k, min_score=0.0):
+        """Return up to top_k (row, score) pairs with score > min_score, best first.
+
+        Returns immediately if the per-term upper bounds show no row can beat
+        min_score.
+        """
+        query_vector = sp.csr_matrix(query_vector)
+        terms = query_vector.indices
+        query_weights = query_vector.data.astype(np.float64)
+        query_norm = np.sqrt(np.dot(query_weights, query_weights))
+        if not len(terms) or query_norm == 0:
+            return []
+        query_weights = query_weights / query_norm
+
+        if np.dot(query_weights, self.max_weights[terms]) <= min_score:
+            return []
+
+        starts = self.indptr[terms]
+        ends = self.indptr[terms + 1]
+        rows = np.concatenate([self.rows[start:end] for start, end in zip(starts, ends)])
+        contributions = np.concatenate([self.weights[start:end] * weight
+                                        for start, end, weight in zip(starts, ends, query_weights)])
+
+        candidates, positions = np.unique(rows, return_inverse=True)
+        scores = np.bincount(positions, weights=contributions, minlength=len(candidates))
+
+        relevant = scores > min_score
+        candidates, scores = candidates[relevant], scores[relevant]
+        if len(candidates) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates, scores = candidates[best], scores[best]
+
+        order = np.lexsort((candidates, -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+
+class TfidfIndex:
+    """A fitted TF-IDF vectorizer, its document matrix and a HandbookRow per source row."""
+
+    def __init__(self, vectorizer, matrix, records, csv_sha256, postings=None):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.records = records  # HandbookRow per CSV row; the CSV columns themselves are not kept
+        self.csv_sha256 = csv_sha256
+        self.postings = postings if postings is not None else InvertedIndex.from_matrix(matrix)
+
+    def search(self, query_vector, top_k, min_score=0.0):
+        """Return up to top_k (row, cosine similarity) pairs above min_score, best first."""
+        return self.postings.search(query_vector, top_k, min_score)
+
+    @classmethod
+    def build(cls, texts, columns, rows, content_column, csv_sha256):
+        """Fit the vectorizer on preprocessed texts and reduce the CSV rows to their records."""
+        vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+        matrix = vectorizer.fit_transform(texts).astype(np.float32)
+        return cls(vectorizer, matrix.tocsr(), build_row_records(columns, rows, content_column), csv_sha256)
+
+    def save(self, index_dir):
+        """Write the artifact to index_dir/<csv sha256>/ and drop older artifacts.
+
+        The files are written to a temporary directory that is renamed into
+        place, so concurrent readers never see a partial artifact.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        final_dir = os.path.join(index_dir, self.csv_sha256)
+        tmp_dir = os.path.join(index_dir, f".{self.csv_sha256}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        terms = [None] * len(self.vectorizer.vocabulary_)
+        for term, column in self.vectorizer.vocabulary_.items():
+            terms[column] = term
+
+        with open(os.path.join(tmp_dir, "vocabulary.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "records.json"), "w", encoding="utf-8") as f:
+            fields = HandbookRow.__slots__
+            json.dump({"fields": fields, "values": [[getattr(record, field) for field in fields]
+                                                    for record in self.records]}, f, ensure_ascii=False)
+        np.save(os.path.join(tmp_dir, "idf.npy"), self.vectorizer.idf_)
+        np.save(os.path.join(tmp_dir, "data.npy"), self.matrix.data.astype(np.float32))
+        np.save(os.path.join(tmp_dir, "indices.npy"), self.matrix.indices)
+        np.save(os.path.join(tmp_dir, "indptr.npy"), self.matrix.indptr)
+        self.postings.save(tmp_dir)
+
+        # The manifest is written last and marks the artifact as complete
+        manifest = {
+            "version": ARTIFACT_VERSION,
+            "csv_sha256": self.csv_sha256,
+            "shape": list(self.matrix.shape),
+            "vectorizer": {**VECTORIZER_PARAMS, "ngram_range": list(VECTORIZER_PARAMS["ngram_range"])},
+            "created": time.time(),
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.exists(final_dir) and read_manifest(final_dir) is None:
+            # Written by an older version of this module for the same CSV
+            shutil.rmtree(final_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            # Another process already published the same artifact
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        for name in os.listdir(index_dir):
+            if name != self.csv_sha256 and not name.startswith("."):
+                shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+        return final_dir
+
+    @classmethod
+    def load(cls, index_dir, csv_sha256, mmap=True):
+        """Load the artifact for a CSV hash, or return None if there is none usable."""
+        artifact_dir = os.path.join(index_dir, csv_sha256)
+        manifest = read_manifest(artifact_dir)
+        if manifest is None:
+            return None
+
+        with open(os.path.join(artifact_dir, "vocabulary.json"), encoding="utf-8") as f:
+            terms = json.load(f)
+        with open(os.path.join(artifact_dir, "records.json"), encoding="utf-8") as f:
+            stored = json.load(f)
+        records = [HandbookRow(**dict(zip(stored["fields"], values))) for values in stored["values"]]
+
+        mmap_mode = "r" if mmap else None
+        data = np.load(os.path.join(artifact_dir, "data.npy"), mmap_mode=mmap_mode)
+        indices = np.load(os.path.join(artifact_dir, "indices.npy"), mmap_mode=mmap_mode)
+        indptr = np.load(os.path.join(artifact_dir, "indptr.npy"), mmap_mode=mmap_mode)
+        matrix = sp.csr_matrix((data, indices, indptr), shape=tuple(manifest["shape"]), copy=False)
+        postings = InvertedIndex.load(artifact_dir, matrix.shape[0], mmap_mode=mmap_mode)
+
+        vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS, vocabulary={term: i for i, term in enumerate(terms)})
+        vectorizer.idf_ = np.load(os.path.join(artifact_dir, "idf.npy"))
+
+        return cls(vectorizer, matrix, records, csv_sha256, postings=postings)
+
+
+if __name__ == "__main__":
+    # Importing the app loads the index, building and saving it if the CSV changed
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+
+    sys.exit(0 if app.index_manager.ready else 1)
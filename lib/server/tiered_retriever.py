@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from chunk_store import CHUNKS_FILE, ChunkStore, convert_langchain_index
+
+
+# One retrieved passage. chunk_id is the handbook row index for lexical hits
+# and "dense:<chunk id>" for chunks of the FAISS index.
+RetrievedChunk = namedtuple("RetrievedChunk", ["chunk_id", "content", "citation", "score"])
+
+
+class TierStats:
+    """Call count and recent latencies of one retrieval tier."""
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total_seconds = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self._recent.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total = self.count, self.total_seconds
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            "count": count,
+            "avg_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+        }
+
+
+class DenseIndex:
+    """FAISS index of the handbook PDF chunks built by rag_backend/process_documents.py.
+
+    The embedding model and index are loaded on first use, so servers whose
+    queries never escalate never load them. Chunk texts come from the
+    memory-mapped chunks.bin next to index.faiss; an index that only has
+    LangChain's index.pkl is converted once. Queries are embedded with
+    sentence-transformers directly, as LangChain's HuggingFaceEmbeddings does
+    for the indexed chunks. If the index or the faiss/sentence-transformers
+    packages (see requirements.txt) are missing, the index reports itself
+    unavailable and retrieval stays lexical.
+    """
+
+    def __init__(self, path="rag_backend/faiss_index", model_name="sentence-transformers/all-MiniLM-L6-v2",
+                 max_distance=1.4, cache_size=256):
+        self.path = path
+        self.model_name = model_name
+        self.max_distance = max_distance  # Squared L2 distance; 1.4 is cosine 0.3 for unit vectors
+        self.cache_size = cache_size
+        self._index = None
+        self._chunks = None
+        self._embeddings = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create an index configured from DENSE_* environment variables."""
+        return cls(
+            path=os.getenv("DENSE_INDEX_PATH", "rag_backend/faiss_index"),
+            model_name=os.getenv("DENSE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+            max_distance=float(os.getenv("DENSE_MAX_DISTANCE", "1.4")),
+            cache_size=int(os.getenv("DENSE_CHUNK_CACHE_SIZE", "256")),
+        )
+
+    def is_available(self):
+        return self._error is None and os.path.exists(os.path.join(self.path, "index.faiss")) and (
+            ChunkStore.exists(self.path) or os.path.exists(os.path.join(self.path, "index.pkl"))
+        )
+
+    def _ensure_loaded(self):
+        if self._index is not None:
+            return True
+
+        with self._lock:
+            if self._index is not None:
+                return True
+            if not self.is_available():
+                return False
+
+            try:
+                import faiss
+                from sentence_transformers import SentenceTransformer
+
+                print(f"Loading dense index from {self.path}...")
+                start_time = time.time()
+                pickle_path = os.path.join(self.path, "index.pkl")
+                if not ChunkStore.exists(self.path) or (
+                    os.path.exists(pickle_path)
+                    and os.path.getmtime(pickle_path) > os.path.getmtime(os.path.join(self.path, CHUNKS_FILE))
+                ):
+                    print(f"Converting {pickle_path} to {CHUNKS_FILE}...")
+                    convert_langchain_index(self.path)
+
+                # Read-only mmap; faiss versions without IO_FLAG_MMAP_IFC read flat indexes into memory
+                flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+                index = faiss.read_index(os.path.join(self.path, "index.faiss"), flags)
+                chunks = ChunkStore(self.path, cache_size=self.cache_size)
+                if len(chunks) != index.ntotal:
+                    raise ValueError(f"{CHUNKS_FILE} has {len(chunks)} chunks for {index.ntotal} vectors")
+
+                self._embeddings = SentenceTransformer(self.model_name)
+                self._chunks = chunks
+                self._index = index
+                print(f"Dense index loaded in {time.time() - start_time:.2f} seconds")
+                return True
+            except Exception as e:
+                self._error = str(e)
+                print(f"Warning: dense retrieval disabled: {e}")
+                return False
+
+    def search(self, query, k):
+        """Return up to k chunks within max_distance of the query, nearest first."""
+        if not self._ensure_loaded():
+            return []
+
+        # HuggingFaceEmbeddings replaces newlines before encoding
+        query_vector = np.asarray(self._embeddings.encode([query.replace("\n", " ")]), dtype=np.float32)
+        distances, rows = self._index.search(query_vector, k)
+
+        chunks = []
+        for distance, row in zip(distances[0], rows[0]):
+            if row < 0 or distance > self.max_distance:
+                continue
+            content, metadata = self._chunks.get(int(row))
+            page = metadata.get("page")
+            citation = metadata.get("section") or (f"Page {int(page) + 1}" if page is not None else None)
+            chunks.append(RetrievedChunk(f"dense:{metadata.get('chunk_id')}", content, citation, float(distance)))
+        return chunks
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "available": self.is_available(),
+            "loaded": self._index is not None,
+            "error": self._error,
+            "chunks": self._chunks.stats() if self._chunks is not None else None,
+        }
+
+
+def reciprocal_rank_fusion(rankings, top_k, k=60):
+    """Merge ranked chunk lists by summing 1 / (k + rank) per chunk."""
+    scores = {}
+    chunks = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            scores[chunk.chunk_id] = scores.get(chunk.chunk_id, 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(chunk.chunk_id, chunk)
+
+    best = sorted(scores, key=lambda chunk_id: -scores[chunk_id])[:top_k]
+    return [chunks[chunk_id]._replace(score=scores[chunk_id]) for chunk_id in best]
+
+
+class TieredRetriever:
+    """Answers from the TF-IDF index, escalating to dense search when unsure.
+
+    Lexical results are used on their own when the top score is at least
+    `high_score`, or at least `min_score` and ahead of the runner-up by
+    `min_margin`. Otherwise the dense index is searched too and both rankings
+    are merged with reciprocal-rank fusion. Per-tier counts and latencies are
+    available from `stats()`.
+    """
+
+    def __init__(self, dense_index=None, min_score=0.15, min_margin=0.02, high_score=0.3, rrf_k=60):
+        self.dense_index = dense_index
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.high_score = high_score
+        self.rrf_k = rrf_k
+
+        self.queries = 0
+        self.lexical_answers = 0
+        self.escalations = 0
+        self.dense_errors = 0
+        self.lexical_latency = TierStats()
+        self.dense_latency = TierStats()
+        self.total_latency = TierStats()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a retriever configured from TIER_* and DENSE_* environment variables."""
+        return cls(
+            dense_index=DenseIndex.from_env(),
+            min_score=float(os.getenv("TIER_MIN_SCORE", "0.15")),
+            min_margin=float(os.getenv("TIER_MIN_MARGIN", "0.02")),
+            high_score=float(os.getenv("TIER_HIGH_SCORE", "0.3")),
+        )
+
+    def is_confident(self, hits):
+        """Whether lexical (row, score) hits are good enough on their own."""
+        if not hits:
+            return False
+        top = hits[0][1]
+        runner_up = hits[1][1] if len(hits) > 1 else 0.0
+        return top >= self.high_score or (top >= self.min_score and top - runner_up >= self.min_margin)
+
+    def retrieve(self, index, query, query_vector, top_k, min_score):
+        """Retrieve up to top_k chunks for a query.
+
+        Returns (chunks, tier) where tier is "lexical" or "fused".
+        """
+        start_time = time.perf_counter()
+        hits = index.search(query_vector, top_k, min_score)
+        lexical = [RetrievedChunk(row, index.records[row].content, index.records[row].citation, score)
+                   for row, score in hits]
+        lexical_done = time.perf_counter()
+        self.lexical_latency.record(lexical_done - start_time)
+
+        chunks, tier = lexical, "lexical"
+        if not self.is_confident(hits) and self.dense_index is not None and self.dense_index.is_available():
+            try:
+                dense = self.dense_index.search(query, top_k)
+                self.dense_latency.record(time.perf_counter() - lexical_done)
+                chunks, tier = reciprocal_rank_fusion([lexical, dense], top_k, self.rrf_k), "fused"
+            except Exception as e:
+                print(f"Error in dense retrieval: {e}")
+                with self._lock:
+                    self.dense_errors += 1
+
+        with self._lock:
+            self.queries += 1
+            if tier == "lexical":
+                self.lexical_answers += 1
+            else:
+                self.escalations += 1
+        self.total_latency.record(time.perf_counter() - start_time)
+        return chunks, tier
+
+    def stats(self):
+        """Return per-tier hit rates and latencies."""
+        with self._lock:
+            queries = self.queries
+            counts = {
+                "queries": queries,
+                "lexical_answers": self.lexical_answers,
+                "escalations": self.escalations,
+                "dense_errors": self.dense_errors,
+                "lexical_hit_rate": self.lexical_answers / queries if queries else 0.0,
+                "escalation_rate": self.escalations / queries if queries else 0.0,
+            }
+        return {
+            **counts,
+            "thresholds": {"min_score": self.min_score, "min_margin": self.min_margin, "high_score": self.high_score},
+            "latency": {
+                "lexical": self.lexical_latency.snapshot(),
+                "dense": self.dense_latency.snapshot(),
+                "total": self.total_latency.snapshot(),
+            },
+            "dense_index": self.dense_index.stats() if self.dense_index is not None else None,
+        }